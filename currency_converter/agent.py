@@ -1,18 +1,15 @@
 from google.genai import types
 
 from google.adk.agents import LlmAgent
-from google.adk.models.google_llm import Gemini
+from shared.governor import GovernedGemini
 from google.adk.runners import InMemoryRunner
 from google.adk.sessions import InMemorySessionService
 from google.adk.tools import google_search, AgentTool, ToolContext
-from google.adk.code_executors import BuiltInCodeExecutor
 
-retry_config = types.HttpRetryOptions(
-    attempts = 5,
-    exp_base = 7,
-    initial_delay = 1,
-    http_status_codes = [429, 500, 503, 504],
-)
+from .conversion import convert, convert_many, to_decimal
+from .rates import RateEngine
+
+rate_engine = RateEngine()
 
 def get_fee_for_payment_method(method: str) -> dict:
     """Looks up the transaction fee percentage for a given payment method.
@@ -55,69 +52,128 @@ def get_exchange_rate(base_currency: str, target_currency: str) -> dict:
     Returns:
         Dictionary with status and rate information.
         Success: {"status": "success", "rate": 0.93}
+        Cross rate: {"status": "success", "rate": 0.00590476190476, "triangulated_via": "USD"}
         Error: {"status": "error", "error_message": "Unsupported currency pair"}"""
-    
-    rate_database = {
-        "usd": {
-            "eur": 0.93,
-            "jpy": 157.50,
-            "inr": 83.58,
-        }
-    }
 
-    base = base_currency.lower()
-    target = target_currency.lower()
-
-    rate = rate_database.get(base, {}).get(target)
-    if rate is not None:
-        return {"status": "success", "rate": rate}
-    else: 
+    try:
+        rate, pivot = rate_engine.rate(base_currency, target_currency)
+    except KeyError:
         return {
             "status": "error",
             "error_message": f"Unsupported currency pair: {base_currency}/{target_currency}",
         }
-    
-calculation_agent = LlmAgent(
-    name = 'CalculationAgent',
-    model = Gemini(
-        model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config
-    ),
-    instruction = """You are a specialized calculator that ONLY responds with Python code. You are forbidden from providing any text, explanations, or conversational responses.
- 
-     Your task is to take a request for a calculation and translate it into a single block of Python code that calculates the answer.
-     
-     **RULES:**
-    1.  Your output MUST be ONLY a Python code block.
-    2.  Do NOT write any text before or after the code block.
-    3.  The Python code MUST calculate the result.
-    4.  The Python code MUST print the final result to stdout.
-    5.  You are PROHIBITED from performing the calculation yourself. Your only job is to generate the code that will perform the calculation.
-   
-    Failure to follow these rules will result in an error.""",
-    code_executor = BuiltInCodeExecutor(),
-)
+    # Significant digits, not decimal places: inverse and cross rates such as
+    # JPY/USD are small, and float noise from triangulation is far below 1e-12.
+    result = {"status": "success", "rate": float(f"{rate:.12g}")}
+    if pivot:
+        result["triangulated_via"] = pivot
+    return result
+
+def _conversion_inputs(base_currency: str, target_currency: str, payment_method: str):
+    fee = get_fee_for_payment_method(payment_method)
+    if fee["status"] != "success":
+        return fee, None
+    rate = get_exchange_rate(base_currency, target_currency)
+    if rate["status"] != "success":
+        return rate, None
+    return fee, rate
+
+def convert_currency(
+        amount: float, base_currency: str, target_currency: str, payment_method: str
+) -> dict:
+    """Converts an amount between currencies after deducting the payment method fee.
+
+    Looks up the fee and the exchange rate, then computes the result with exact
+    decimal arithmetic, rounded to the minor unit of each currency (ISO 4217).
+
+    Args:
+        amount: Amount in the base currency, e.g. 1250.
+        base_currency: ISO 4217 code of the currency converted from, e.g. "USD".
+        target_currency: ISO 4217 code of the currency converted to, e.g. "EUR".
+        payment_method: Name of the payment method, e.g. "platinum credit card".
+
+    Returns:
+        Dictionary with status and the full breakdown.
+        Success: {"status": "success", "amount": "1250.00", "fee_percentage": 0.02,
+                  "fee_amount": "25.00", "amount_after_fee": "1225.00", "rate": 0.93,
+                  "converted_amount": "1139.25", ...}
+        Error: {"status": "error", "error_message": "..."}"""
+    fee, rate = _conversion_inputs(base_currency, target_currency, payment_method)
+    if rate is None:
+        return fee
+    try:
+        breakdown = convert(
+            amount, fee["fee_percentage"], rate["rate"], base_currency, target_currency
+        )
+    except ValueError as e:
+        return {"status": "error", "error_message": str(e)}
+    return {
+        "status": "success",
+        "base_currency": base_currency.upper(),
+        "target_currency": target_currency.upper(),
+        "payment_method": payment_method,
+        "fee_percentage": fee["fee_percentage"],
+        "rate": rate["rate"],
+        **breakdown,
+    }
+
+def convert_currency_batch(
+        amounts: list[float], base_currency: str, target_currency: str, payment_method: str
+) -> dict:
+    """Converts many amounts at once with the same currencies and payment method.
+
+    Args:
+        amounts: Amounts in the base currency.
+        base_currency: ISO 4217 code of the currency converted from, e.g. "USD".
+        target_currency: ISO 4217 code of the currency converted to, e.g. "EUR".
+        payment_method: Name of the payment method, e.g. "bank transfer".
+
+    Returns:
+        Dictionary with status, fee percentage, rate, totals and one breakdown
+        per amount in "conversions".
+        Error: {"status": "error", "error_message": "..."}"""
+    fee, rate = _conversion_inputs(base_currency, target_currency, payment_method)
+    if rate is None:
+        return fee
+    try:
+        conversions = convert_many(
+            amounts, fee["fee_percentage"], rate["rate"], base_currency, target_currency
+        )
+    except ValueError as e:
+        return {"status": "error", "error_message": str(e)}
+    return {
+        "status": "success",
+        "base_currency": base_currency.upper(),
+        "target_currency": target_currency.upper(),
+        "payment_method": payment_method,
+        "fee_percentage": fee["fee_percentage"],
+        "rate": rate["rate"],
+        "count": len(conversions),
+        "total_amount": str(sum(to_decimal(c["amount"]) for c in conversions)),
+        "total_fees": str(sum(to_decimal(c["fee_amount"]) for c in conversions)),
+        "total_converted": str(sum(to_decimal(c["converted_amount"]) for c in conversions)),
+        "conversions": conversions,
+    }
 
 root_agent = LlmAgent(
     name = 'currency_agent',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config
     ),
     instruction = """You are a smart currency conversion assistant. You must strictly follow these steps and use the available tools.
 
   For any currency conversion request:
 
-   1. Get Transaction Fee: Use the get_fee_for_payment_method() tool to determine the transaction fee.
-   2. Get Exchange Rate: Use the get_exchange_rate() tool to get the currency conversion rate.
-   3. Error Check: After each tool call, you must check the "status" field in the response. If the status is "error", you must stop and clearly explain the issue to the user.
-   4. Calculate Final Amount (CRITICAL): You are strictly prohibited from performing any arithmetic calculations yourself. You must use the calculation_agent tool to generate Python code that calculates the final converted amount. This 
-      code will use the fee information from step 1 and the exchange rate from step 2.
-   5. Provide Detailed Breakdown: In your summary, you must:
+   1. Convert (CRITICAL): You are strictly prohibited from performing any arithmetic calculations yourself. Use the convert_currency() tool with the amount,
+      both currencies and the payment method. It looks up the transaction fee and the exchange rate and calculates the final amount. To convert several
+      amounts with the same currencies and payment method, use convert_currency_batch() once instead.
+   2. Error Check: After each tool call, you must check the "status" field in the response. If the status is "error", you must stop and clearly explain the issue to the user.
+   3. Use get_fee_for_payment_method() or get_exchange_rate() only when the user asks for a fee or a rate without a conversion.
+   4. Provide Detailed Breakdown: In your summary, you must:
        * State the final converted amount.
        * Explain how the result was calculated, including:
            * The fee percentage and the fee amount in the original currency.
            * The amount remaining after deducting the fee.
            * The exchange rate applied.""",
-    tools = [get_exchange_rate, get_fee_for_payment_method, AgentTool(agent = calculation_agent)],
+    tools = [convert_currency, convert_currency_batch, get_exchange_rate, get_fee_for_payment_method],
 )
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""Exact currency conversion with ISO 4217 rounding.
+
+Amounts, fees and rates are converted to `Decimal` through their string form,
+so `0.93` is exactly 0.93 rather than the nearest binary float. Each money
+amount is rounded half-up to the minor unit of its currency, e.g. 2 decimals
+for USD, 0 for JPY and 3 for KWD.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Union
+
+Number = Union[int, float, str, Decimal]
+
+# ISO 4217 minor units for currencies that do not use 2 decimals.
+MINOR_UNITS = {
+    'BIF': 0, 'CLP': 0, 'DJF': 0, 'GNF': 0, 'ISK': 0, 'JPY': 0, 'KMF': 0,
+    'KRW': 0, 'PYG': 0, 'RWF': 0, 'UGX': 0, 'UYI': 0, 'VND': 0, 'VUV': 0,
+    'XAF': 0, 'XOF': 0, 'XPF': 0,
+    'BHD': 3, 'IQD': 3, 'JOD': 3, 'KWD': 3, 'LYD': 3, 'OMR': 3, 'TND': 3,
+    'CLF': 4, 'UYW': 4,
+}
+DEFAULT_MINOR_UNITS = 2
+
+
+def to_decimal(value: Number) -> Decimal:
+    """Converts a number to Decimal without binary floating point artifacts.
+
+    Raises:
+        ValueError: If the value is not a number, or is NaN or infinite.
+    """
+    if isinstance(value, Decimal):
+        result = value
+    else:
+        try:
+            result = Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError(f"Not a number: {value!r}")
+    if not result.is_finite():
+        raise ValueError(f"Not a finite number: {value!r}")
+    return result
+
+
+def quantize(amount: Decimal, currency: str) -> Decimal:
+    """Rounds half-up to the ISO 4217 minor unit of `currency`."""
+    exponent = Decimal(1).scaleb(-MINOR_UNITS.get(currency.upper(), DEFAULT_MINOR_UNITS))
+    return amount.quantize(exponent, rounding = ROUND_HALF_UP)
+
+
+def _conversion(amount: Decimal, fee: Decimal, rate: Decimal,
+                base: str, target: str) -> Dict[str, str]:
+    amount = quantize(amount, base)
+    fee_amount = quantize(amount * fee, base)
+    net = amount - fee_amount
+    return {
+        'amount': str(amount),
+        'fee_amount': str(fee_amount),
+        'amount_after_fee': str(net),
+        'converted_amount': str(quantize(net * rate, target)),
+    }
+
+
+def convert(amount: Number, fee_percentage: Number, rate: Number,
+            base_currency: str, target_currency: str) -> Dict[str, str]:
+    """Converts one amount, returning the fee, net and converted amounts.
+
+    Raises:
+        ValueError: If an input is not a number or the amount is negative.
+    """
+    value = to_decimal(amount)
+    if value < 0:
+        raise ValueError(f"Amount must not be negative: {amount}")
+    return _conversion(value, to_decimal(fee_percentage), to_decimal(rate),
+                       base_currency, target_currency)
+
+
+def convert_many(amounts: Iterable[Number], fee_percentage: Number, rate: Number,
+                 base_currency: str, target_currency: str) -> List[Dict[str, str]]:
+    """Converts many amounts with one fee and rate; see `convert`."""
+    fee = to_decimal(fee_percentage)
+    exact_rate = to_decimal(rate)
+    conversions = []
+    for amount in amounts:
+        value = to_decimal(amount)
+        if value < 0:
+            raise ValueError(f"Amount must not be negative: {amount}")
+        conversions.append(_conversion(value, fee, exact_rate, base_currency, target_currency))
+    return conversions
@@ -0,0 +1,274 @@
+"""Cross-rate engine backed by a memory-mapped rate file.
+
+The rate file is a compact binary table of quoted pairs:
+
+    header   '<4sHHd'  magic b'FXR1', version, number of currencies, as_of
+    codes    n x 'S3'  ISO 4217 codes
+    quotes   '<u2, <u2, <f8' records of (base index, quote index, rate)
+             until the end of the file
+
+`RateTable.load` maps the file and expands the quotes into a full N x N NumPy
+matrix: direct quotes, their inverses, and missing pairs triangulated through
+the pivot currencies in order. Any pair is then a single O(1) lookup.
+
+`RateEngine` serves lookups from an immutable `RateTable` snapshot. At most
+once per `check_interval` a lookup stats the file; when it has changed, a new
+table is built on a background thread and swapped in by a single reference
+assignment, so a refresh never blocks or tears an in-flight conversion.
+Publish new rates with `write_rates`, which replaces the file atomically.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_HEADER = struct.Struct('<4sHHd')
+_MAGIC = b'FXR1'
+_VERSION = 1
+_QUOTE = np.dtype([('base', '<u2'), ('quote', '<u2'), ('rate', '<f8')])
+
+DEFAULT_RATES_PATH = 'fx_rates.bin'
+
+# Currencies tried, in order, as the middle leg of a triangulated rate.
+PIVOTS = ('USD', 'EUR', 'GBP', 'JPY')
+
+# Seed quotes written when no rate file exists yet.
+DEFAULT_QUOTES = [
+    ('USD', 'EUR', 0.93),
+    ('USD', 'JPY', 157.50),
+    ('USD', 'INR', 83.58),
+    ('USD', 'GBP', 0.79),
+    ('USD', 'CHF', 0.90),
+    ('USD', 'CAD', 1.37),
+    ('USD', 'AUD', 1.51),
+    ('USD', 'CNY', 7.24),
+    ('USD', 'MXN', 17.05),
+    ('USD', 'BRL', 5.12),
+    ('USD', 'KES', 129.50),
+    ('USD', 'KWD', 0.307),
+    ('EUR', 'SEK', 11.52),
+    ('EUR', 'NOK', 11.68),
+    ('EUR', 'DKK', 7.46),
+    ('EUR', 'PLN', 4.31),
+    ('GBP', 'ZAR', 23.35),
+]
+
+Quote = Tuple[str, str, float]
+
+
+def write_rates(path: str, quotes: Iterable[Quote], as_of: Optional[float] = None) -> None:
+    """Writes `quotes` as a rate file, atomically replacing any existing one."""
+    quotes = [(base.upper(), quote.upper(), float(rate)) for base, quote, rate in quotes]
+    codes = sorted({code for base, quote, _ in quotes for code in (base, quote)})
+    index = {code: i for i, code in enumerate(codes)}
+    records = np.array(
+        [(index[base], index[quote], rate) for base, quote, rate in quotes], dtype = _QUOTE
+    )
+    payload = (
+        _HEADER.pack(_MAGIC, _VERSION, len(codes), time.time() if as_of is None else as_of)
+        + np.array(codes, dtype = 'S3').tobytes()
+        + records.tobytes()
+    )
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir = directory, prefix = '.fx_rates.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@dataclass(frozen = True)
+class RateTable:
+    """Immutable cross-rate matrix built from one version of the rate file.
+
+    Attributes:
+        codes: Currency codes in matrix order.
+        index: Position of each code.
+        matrix: rate[i, j] converts one unit of codes[i] into codes[j]; NaN
+            where no route exists.
+        via: Pivot index used to triangulate rate[i, j], or -1 if quoted.
+        as_of: Timestamp stored in the file.
+        signature: (mtime_ns, size) of the file the table was built from.
+    """
+    codes: Tuple[str, ...]
+    index: Dict[str, int]
+    matrix: Any
+    via: Any
+    as_of: float
+    signature: Tuple[int, int]
+
+    @classmethod
+    def load(cls, path: str) -> 'RateTable':
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as mapped:
+                magic, version, n, as_of = _HEADER.unpack_from(mapped, 0)
+                if magic != _MAGIC or version != _VERSION:
+                    raise ValueError(f"{path} is not a version {_VERSION} rate file")
+                codes_end = _HEADER.size + 3 * n
+                codes = tuple(
+                    code.decode('ascii')
+                    for code in np.frombuffer(mapped, dtype = 'S3', count = n, offset = _HEADER.size)
+                )
+                quotes = np.frombuffer(mapped, dtype = _QUOTE, offset = codes_end).copy()
+        matrix, via = _cross_rates(len(codes), quotes, [codes.index(p) for p in PIVOTS if p in codes])
+        return cls(
+            codes = codes,
+            index = {code: i for i, code in enumerate(codes)},
+            matrix = matrix,
+            via = via,
+            as_of = as_of,
+            signature = (stat.st_mtime_ns, stat.st_size),
+        )
+
+    def rate(self, base: str, target: str) -> Tuple[float, Optional[str]]:
+        """Returns the rate and the pivot it was triangulated through.
+
+        Raises:
+            KeyError: If either currency is unknown or no route exists.
+        """
+        i = self.index[base.upper()]
+        j = self.index[target.upper()]
+        rate = self.matrix[i, j]
+        if rate != rate:
+            raise KeyError(f"{base}/{target}")
+        pivot = self.via[i, j]
+        return float(rate), self.codes[pivot] if pivot >= 0 else None
+
+
+def _cross_rates(n: int, quotes: Any, pivots: Sequence[int]) -> Tuple[Any, Any]:
+    matrix = np.full((n, n), np.nan)
+    via = np.full((n, n), -1, dtype = np.int16)
+    np.fill_diagonal(matrix, 1.0)
+    base, quote, rate = quotes['base'], quotes['quote'], quotes['rate']
+    matrix[base, quote] = rate
+    inverse = np.isnan(matrix[quote, base])
+    matrix[quote[inverse], base[inverse]] = 1.0 / rate[inverse]
+    # Each pass fills pairs reachable through one more pivot.
+    for _ in range(2):
+        for pivot in pivots:
+            missing = np.isnan(matrix)
+            if not missing.any():
+                return matrix, via
+            candidate = np.outer(matrix[:, pivot], matrix[pivot, :])
+            fill = missing & ~np.isnan(candidate)
+            matrix[fill] = candidate[fill]
+            via[fill] = pivot
+    return matrix, via
+
+
+class RateEngine:
+    """Serves O(1) cross-rate lookups and hot-reloads the rate file.
+
+    The file is opened, and created from `seed` if it does not exist, on the
+    first lookup rather than at construction.
+
+    Args:
+        path: Rate file; it is created from `seed` if it does not exist.
+        check_interval: Minimum seconds between checks for a changed file.
+        seed: Quotes written when the file is missing.
+    """
+
+    def __init__(self, path: str = DEFAULT_RATES_PATH, check_interval: float = 1.0,
+                 seed: Optional[List[Quote]] = None):
+        self.path = path
+        self.check_interval = check_interval
+        self.seed = seed
+        self._table: Optional[RateTable] = None
+        self._next_check = 0.0
+        self._reloading = threading.Lock()
+        self.stats = {'lookups': 0, 'reloads': 0, 'reload_errors': 0}
+
+    @property
+    def table(self) -> RateTable:
+        if self._table is None:
+            self._open()
+        else:
+            self._maybe_reload()
+        return self._table
+
+    def _open(self) -> None:
+        with self._reloading:
+            if self._table is not None:
+                return
+            if not os.path.exists(self.path):
+                write_rates(self.path, DEFAULT_QUOTES if self.seed is None else self.seed)
+            self._table = RateTable.load(self.path)
+            self._next_check = time.monotonic() + self.check_interval
+
+    def rate(self, base: str, target: str) -> Tuple[float, Optional[str]]:
+        """Returns (rate, pivot) for a pair; see `RateTable.rate`."""
+        self.stats['lookups'] += 1
+        return self.table.rate(base, target)
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if (stat.st_mtime_ns, stat.st_size) == self._table.signature:
+            return
+        if self._reloading.acquire(blocking = False):
+            threading.Thread(target = self._reload, daemon = True).start()
+
+    def _reload(self) -> None:
+        try:
+            self._table = RateTable.load(self.path)
+            self.stats['reloads'] += 1
+        except (OSError, ValueError):
+            self.stats['reload_errors'] += 1
+        finally:
+            self._reloading.release()
+
+    def reload(self) -> None:
+        """Rebuilds the table now, on the calling thread."""
+        with self._reloading:
+            self._table = RateTable.load(self.path)
+            self.stats['reloads'] += 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Rate file lookup and reload timings')
+    parser.add_argument('--path', default = DEFAULT_RATES_PATH)
+    parser.add_argument('--lookups', type = int, default = 100_000)
+    args = parser.parse_args()
+
+    engine = RateEngine(args.path)
+    table = engine.table
+    started = time.perf_counter()
+    reloaded = RateTable.load(args.path)
+    load_ms = (time.perf_counter() - started) * 1000
+    pairs = [(a, b) for a in table.codes for b in table.codes]
+    started = time.perf_counter()
+    for k in range(args.lookups):
+        engine.rate(*pairs[k % len(pairs)])
+    lookup_us = (time.perf_counter() - started) / args.lookups * 1e6
+    print({
+        'currencies': len(reloaded.codes),
+        'routable_pairs': int((~np.isnan(reloaded.matrix)).sum()),
+        'triangulated_pairs': int((reloaded.via >= 0).sum()),
+        'load_ms': round(load_ms, 3),
+        'lookup_us': round(lookup_us, 3),
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,20 @@
 import uuid
+from contextlib import aclosing
 from google.genai import types
 
 from google.adk.agents import LlmAgent, Agent
-from google.adk.models.google_llm import Gemini
+from shared.governor import GovernedGemini
 
 from google.adk.tools.tool_context import ToolContext
 from google.adk.tools.function_tool import FunctionTool
 
 from google.adk.apps.app import App, ResumabilityConfig
 
-from google.adk.sessions import InMemorySessionService
+from shared.session_store import SqliteSessionService
 
 from google.adk.runners import Runner
 
-retry_config = types.HttpRetryOptions(
-    attempts = 5,
-    exp_base = 7,
-    initial_delay = 1,
-    http_status_codes = [429, 500, 503, 504]
-)
+from .approvals import ApprovalStore
 
 LARGER_ORDER_THRESHOLD = 5
 
@@ -69,9 +65,8 @@ def place_shipping_order(
 
 shipping_agent = LlmAgent(
     name = 'shipping_agent',
-    model = Gemini(
-        model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config),
+    model = GovernedGemini(
+        model = 'gemini-2.5-flash-lite'),
     instruction = """You are a shipping coordinator assistant.
   
   When users request to ship containers:
@@ -91,13 +86,30 @@ shipping_app = App(
     resumability_config = ResumabilityConfig(is_resumable=True),
 )
 
-session_service = InMemorySessionService()
+# Paused invocations can only be resumed while their sessions exist, so both
+# the sessions and the pending-approval index are kept on disk.
+session_service = SqliteSessionService(db_path = 'shipping_sessions.db')
+
+approval_store = ApprovalStore(db_path = 'shipping_approvals.db')
 
 shipping_runner = Runner(
     app = shipping_app,
     session_service = session_service,
 )
 
+def approval_request(event):
+    """Return approval details if this event requests confirmation, else None."""
+    if event.content and event.content.parts:
+        for part in event.content.parts:
+            if(
+                part.function_call and part.function_call.name == "adk_request_confirmation"
+            ):
+                return{
+                    "approval_id": part.function_call.id,
+                    "invocation_id": event.invocation_id,
+                }
+    return None
+
 def check_for_approval(events):
     """Check if events contain an approval request.
 
@@ -105,15 +117,9 @@ def check_for_approval(events):
         dict with approval details or None
     """
     for event in events:
-        if event.content and event.content.parts:
-            for part in event.content.parts:
-                if(
-                    part.function_call and part.function_call.name == "adk_request_confirmation"
-                ):
-                    return{
-                        "approval_id": part.function_call.id,
-                        "invocation_id": event.invocation_id,
-                    }
+        approval_info = approval_request(event)
+        if approval_info:
+            return approval_info
     return None
 def print_agent_response(events):
     """Print agent's text responses from events."""
@@ -152,14 +158,17 @@ async def run_shipping_workflow(query: str, auto_approve: bool = True):
     )
 
     query_content = types.Content(role="user", parts=[types.Part(text=query)])
-    events = []
+    approval_info = None
 
-    async for event in shipping_runner.run_async(
+    # Stream the turn and hand control back as soon as approval is requested.
+    async with aclosing(shipping_runner.run_async(
         user_id="test_user", session_id=session_id, new_message=query_content
-    ):
-        events.append(event)
-
-    approval_info = check_for_approval(events)
+    )) as events:
+        async for event in events:
+            approval_info = approval_request(event)
+            if approval_info:
+                break
+            print_agent_response([event])
 
     if approval_info:
         print(f"⏸️  Pausing for approval...")
@@ -175,13 +184,6 @@ async def run_shipping_workflow(query: str, auto_approve: bool = True):
                 "invocation_id"
             ], 
         ):
-            if event.content and event.content.parts:
-                for part in event.content.parts:
-                    if part.text:
-                        print(f"Agent > {part.text}")
-
-    else:
-        print_agent_response(events)
+            print_agent_response([event])
 
     print(f"{'='*60}\n")
-    
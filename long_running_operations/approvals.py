@@ -0,0 +1,278 @@
+"""Durable index of shipping orders paused for human approval.
+
+A resumable invocation can only be resumed if its session and the
+`adk_request_confirmation` call are still known. `shipping_runner` keeps the
+sessions in SQLite, and `ApprovalStore` records every pending confirmation,
+keyed by approval_id and indexed by invocation_id. Pending approvals
+therefore survive restarts and can be listed and filtered before a bulk
+decision.
+
+Approvals are claimed atomically before they are resumed, so two approvers
+clearing the same queue never resume an invocation twice. A claim is a lease
+held by one store (`claimed_by`) for `lease` seconds. A failed resume
+returns the approval to 'pending' with the error recorded. A claim whose
+holder died mid-resume can be taken over once its lease has expired. Until
+then, no other process can claim it, list it as pending, or requeue it.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from google.adk.events.event import Event
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS approvals (
+    approval_id TEXT PRIMARY KEY,
+    invocation_id TEXT NOT NULL,
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    tool_name TEXT,
+    hint TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    created_at REAL NOT NULL,
+    decided_at REAL,
+    last_error TEXT,
+    claimed_at REAL,
+    claimed_by TEXT
+);
+CREATE INDEX IF NOT EXISTS approvals_by_status ON approvals (status, created_at);
+CREATE INDEX IF NOT EXISTS approvals_by_invocation ON approvals (invocation_id);
+"""
+
+_COLUMNS = (
+    'approval_id, invocation_id, app_name, user_id, session_id, tool_name, hint,'
+    ' payload, status, created_at, decided_at, last_error, claimed_at, claimed_by'
+)
+
+# Claimed approvals whose lease has run out; takes the expiry cutoff.
+_EXPIRED = "(status IN ('approving', 'rejecting') AND claimed_at < ?)"
+
+
+@dataclass
+class PendingApproval:
+    """One confirmation request of a paused invocation."""
+    approval_id: str
+    invocation_id: str
+    app_name: str
+    user_id: str
+    session_id: str
+    tool_name: Optional[str]
+    hint: Optional[str]
+    payload: Dict[str, Any]
+    status: str
+    created_at: float
+    decided_at: Optional[float] = None
+    last_error: Optional[str] = None
+    claimed_at: Optional[float] = None
+    claimed_by: Optional[str] = None
+
+    @classmethod
+    def _from_row(cls, row: Sequence[Any]) -> 'PendingApproval':
+        values = list(row)
+        values[7] = json.loads(values[7])
+        return cls(*values)
+
+
+class ApprovalStore:
+    """SQLite-backed pending-approval index.
+
+    Args:
+        db_path: SQLite file holding the index.
+        lease: Seconds a claim is held before another store may take it over.
+            It must exceed the longest resume.
+        owner: Name this store claims under; unique per instance by default.
+    """
+
+    def __init__(self, db_path: str = 'shipping_approvals.db', lease: float = 600.0,
+                 owner: Optional[str] = None):
+        self.lease = lease
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread = False, isolation_level = None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(approvals)')}
+        for column, kind in (('claimed_at', 'REAL'), ('claimed_by', 'TEXT')):
+            if column not in columns:
+                self._conn.execute(f'ALTER TABLE approvals ADD COLUMN {column} {kind}')
+
+    def record(self, event: Event, *, app_name: str, user_id: str, session_id: str) -> List[str]:
+        """Stores every confirmation request in `event`.
+
+        Returns:
+            The approval ids recorded.
+        """
+        rows = []
+        for call in event.get_function_calls():
+            if call.name != 'adk_request_confirmation':
+                continue
+            args = call.args or {}
+            confirmation = args.get('toolConfirmation', {})
+            rows.append((
+                call.id, event.invocation_id, app_name, user_id, session_id,
+                args.get('originalFunctionCall', {}).get('name'),
+                confirmation.get('hint'),
+                json.dumps(confirmation.get('payload') or {}),
+                time.time(),
+            ))
+        if rows:
+            with self._lock:
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO approvals (approval_id, invocation_id, app_name,'
+                    ' user_id, session_id, tool_name, hint, payload, created_at)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows,
+                )
+        return [row[0] for row in rows]
+
+    def get(self, approval_id: str) -> Optional[PendingApproval]:
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {_COLUMNS} FROM approvals WHERE approval_id = ?', (approval_id,)
+            ).fetchone()
+        return PendingApproval._from_row(row) if row else None
+
+    def for_invocation(self, invocation_id: str) -> List[PendingApproval]:
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {_COLUMNS} FROM approvals WHERE invocation_id = ?', (invocation_id,)
+            ).fetchall()
+        return [PendingApproval._from_row(row) for row in rows]
+
+    def list_pending(
+            self,
+            *,
+            user_id: Optional[str] = None,
+            destination: Optional[str] = None,
+            min_containers: Optional[int] = None,
+            max_containers: Optional[int] = None,
+            created_before: Optional[float] = None,
+            limit: Optional[int] = None,
+    ) -> List[PendingApproval]:
+        """Lists pending approvals, oldest first, matching every given filter.
+
+        Claims whose lease has expired are listed as well, since `claim`
+        takes them over.
+        """
+        clauses, params = [f"(status = 'pending' OR {_EXPIRED})"], [time.time() - self.lease]
+        if user_id is not None:
+            clauses.append('user_id = ?')
+            params.append(user_id)
+        if destination is not None:
+            clauses.append("json_extract(payload, '$.destination') = ?")
+            params.append(destination)
+        if min_containers is not None:
+            clauses.append("json_extract(payload, '$.num_containers') >= ?")
+            params.append(min_containers)
+        if max_containers is not None:
+            clauses.append("json_extract(payload, '$.num_containers') <= ?")
+            params.append(max_containers)
+        if created_before is not None:
+            clauses.append('created_at < ?')
+            params.append(created_before)
+        sql = f'SELECT {_COLUMNS} FROM approvals WHERE {" AND ".join(clauses)} ORDER BY created_at'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [PendingApproval._from_row(row) for row in rows]
+
+    def claim(self, approval_ids: Sequence[str], approved: bool) -> List[PendingApproval]:
+        """Atomically moves pending approvals to 'approving' or 'rejecting'.
+
+        Approvals claimed by another store whose lease has expired are taken
+        over.
+
+        Returns:
+            The approvals this caller now owns; ids that are unknown or no
+            longer pending are left out.
+        """
+        if not approval_ids:
+            return []
+        status = 'approving' if approved else 'rejecting'
+        placeholders = ', '.join('?' * len(approval_ids))
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    f'SELECT {_COLUMNS} FROM approvals WHERE approval_id IN ({placeholders})'
+                    f" AND (status = 'pending' OR {_EXPIRED})",
+                    [*approval_ids, now - self.lease],
+                ).fetchall()
+                self._conn.executemany(
+                    'UPDATE approvals SET status = ?, claimed_at = ?, claimed_by = ?'
+                    ' WHERE approval_id = ?',
+                    [(status, now, self.owner, row[0]) for row in rows],
+                )
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        claimed = [PendingApproval._from_row(row) for row in rows]
+        for approval in claimed:
+            approval.status = status
+            approval.claimed_at = now
+            approval.claimed_by = self.owner
+        return claimed
+
+    def finish(self, approval_id: str, approved: bool) -> bool:
+        """Marks an approval this store claimed as resumed with the given decision.
+
+        Returns:
+            False if the claim was lost, e.g. taken over after its lease expired.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE approvals SET status = ?, decided_at = ?, last_error = NULL,'
+                ' claimed_at = NULL, claimed_by = NULL WHERE approval_id = ? AND claimed_by = ?',
+                ('approved' if approved else 'rejected', time.time(), approval_id, self.owner),
+            )
+        return cursor.rowcount > 0
+
+    def release(self, approval_id: str, error: str) -> bool:
+        """Returns an approval this store claimed to 'pending' after a failed resume."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE approvals SET status = 'pending', last_error = ?, claimed_at = NULL,"
+                ' claimed_by = NULL WHERE approval_id = ? AND claimed_by = ?',
+                (error, approval_id, self.owner),
+            )
+        return cursor.rowcount > 0
+
+    def requeue_claimed(self) -> int:
+        """Returns claims whose lease has expired to 'pending'.
+
+        Claims within their lease are left alone, so this is safe to call
+        while other processes are resuming approvals.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE approvals SET status = 'pending', claimed_at = NULL, claimed_by = NULL"
+                f' WHERE {_EXPIRED}',
+                (time.time() - self.lease,),
+            )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Number of approvals per status."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT status, COUNT(*) FROM approvals GROUP BY status'
+            ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
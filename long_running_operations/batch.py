@@ -0,0 +1,262 @@
+"""Streaming and concurrent batch execution of shipping orders.
+
+`stream_shipping_order` consumes the runner's events as they arrive and stops
+as soon as `adk_request_confirmation` is seen, so a paused order hands control
+back without waiting for the rest of the turn to be buffered.
+`run_shipping_batch` runs many orders concurrently against `shipping_runner`
+under a bounded semaphore and reports per-order latency, time-to-pause and
+throughput. Paused orders are recorded in the durable `approval_store`, and
+`resume_approvals` resumes a bulk approve or reject decision concurrently.
+
+Measure it offline with:
+
+    python -m long_running_operations.batch --orders 500 --concurrency 64 --resume
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from google.genai import types
+
+from google.adk.runners import Runner
+
+from shared.benchmark import percentile
+from shared.fake_llm import FakeTurn, use_fake_model
+
+from .agent import approval_request, approval_store, create_approval_response, shipping_runner
+from .approvals import ApprovalStore, PendingApproval
+
+USER_ID = 'test_user'
+
+
+@dataclass
+class OrderResult:
+    """Outcome of one order run up to completion or its approval pause.
+
+    Attributes:
+        query: The user's shipping request.
+        session_id: Session the order ran in.
+        status: 'completed', 'paused' (waiting for approval) or 'failed'.
+        approval: approval_id and invocation_id when paused.
+        latency_s: Time until the turn completed or paused.
+        time_to_pause_s: Time until the approval request was seen, if any.
+        responses: Text replies of the agent.
+        error: Error message when the order failed.
+    """
+    query: str
+    session_id: str
+    status: str = 'completed'
+    approval: Optional[Dict[str, str]] = None
+    latency_s: float = 0.0
+    time_to_pause_s: Optional[float] = None
+    responses: List[str] = field(default_factory = list)
+    error: Optional[str] = None
+
+
+async def stream_shipping_order(
+        query: str,
+        *,
+        runner: Runner = shipping_runner,
+        user_id: str = USER_ID,
+        session_id: Optional[str] = None,
+        approvals: Optional[ApprovalStore] = approval_store,
+) -> OrderResult:
+    """Runs one order, returning as soon as it completes or pauses for approval.
+
+    A paused order is recorded in `approvals` unless it is None.
+    """
+    session_id = session_id or f"order_{uuid.uuid4().hex[:8]}"
+    result = OrderResult(query = query, session_id = session_id)
+    started = time.perf_counter()
+    try:
+        await runner.session_service.create_session(
+            app_name = runner.app_name, user_id = user_id, session_id = session_id
+        )
+        message = types.Content(role = "user", parts = [types.Part(text = query)])
+        async with aclosing(runner.run_async(
+            user_id = user_id, session_id = session_id, new_message = message
+        )) as events:
+            async for event in events:
+                approval = approval_request(event)
+                if approval:
+                    result.status = 'paused'
+                    result.approval = approval
+                    result.time_to_pause_s = time.perf_counter() - started
+                    if approvals is not None:
+                        approvals.record(
+                            event, app_name = runner.app_name, user_id = user_id,
+                            session_id = session_id,
+                        )
+                    break
+                if event.content and event.content.parts:
+                    result.responses.extend(part.text for part in event.content.parts if part.text)
+    except Exception as e:
+        result.status = 'failed'
+        result.error = f"{type(e).__name__}: {e}"
+    result.latency_s = time.perf_counter() - started
+    return result
+
+
+def summarize(results: List[OrderResult], wall_s: float) -> Dict[str, Any]:
+    """Aggregates per-order results into latency, pause and throughput figures."""
+    latencies = [r.latency_s * 1000 for r in results if r.status != 'failed']
+    pauses = [r.time_to_pause_s * 1000 for r in results if r.time_to_pause_s is not None]
+    return {
+        'orders': len(results),
+        'completed': sum(r.status == 'completed' for r in results),
+        'paused': sum(r.status == 'paused' for r in results),
+        'failed': sum(r.status == 'failed' for r in results),
+        'wall_s': round(wall_s, 3),
+        'orders_per_s': round(len(results) / wall_s, 2) if wall_s else 0.0,
+        'latency_p50_ms': round(percentile(latencies, 50), 2),
+        'latency_p95_ms': round(percentile(latencies, 95), 2),
+        'latency_p99_ms': round(percentile(latencies, 99), 2),
+        'time_to_pause_p50_ms': round(percentile(pauses, 50), 2),
+        'time_to_pause_p95_ms': round(percentile(pauses, 95), 2),
+    }
+
+
+async def run_shipping_batch(
+        queries: Iterable[str],
+        *,
+        concurrency: int = 32,
+        runner: Runner = shipping_runner,
+        user_id: str = USER_ID,
+        approvals: Optional[ApprovalStore] = approval_store,
+) -> Dict[str, Any]:
+    """Runs every order concurrently, at most `concurrency` at a time.
+
+    Returns:
+        The `summarize` report plus the per-order `results`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(query: str) -> OrderResult:
+        async with semaphore:
+            return await stream_shipping_order(
+                query, runner = runner, user_id = user_id, approvals = approvals
+            )
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_one(query) for query in queries))
+    report = summarize(results, time.perf_counter() - started)
+    report['results'] = results
+    return report
+
+
+async def _resume(
+        approval: PendingApproval, approved: bool, runner: Runner, approvals: ApprovalStore
+) -> OrderResult:
+    result = OrderResult(query = approval.hint or '', session_id = approval.session_id)
+    started = time.perf_counter()
+    message = create_approval_response(
+        {"approval_id": approval.approval_id, "invocation_id": approval.invocation_id}, approved
+    )
+    try:
+        async for event in runner.run_async(
+            user_id = approval.user_id,
+            session_id = approval.session_id,
+            new_message = message,
+            invocation_id = approval.invocation_id,
+        ):
+            if event.content and event.content.parts:
+                result.responses.extend(part.text for part in event.content.parts if part.text)
+        approvals.finish(approval.approval_id, approved)
+    except Exception as e:
+        result.status = 'failed'
+        result.error = f"{type(e).__name__}: {e}"
+        approvals.release(approval.approval_id, result.error)
+    result.latency_s = time.perf_counter() - started
+    return result
+
+
+async def resume_approvals(
+        approval_ids: Iterable[str],
+        approved: bool,
+        *,
+        concurrency: int = 32,
+        runner: Runner = shipping_runner,
+        approvals: ApprovalStore = approval_store,
+) -> Dict[str, Any]:
+    """Approves or rejects many paused orders and resumes them concurrently.
+
+    Ids that are no longer pending, e.g. already decided by another approver,
+    are counted as skipped.
+
+    Returns:
+        The `summarize` report plus `skipped` and the per-order `results`.
+    """
+    approval_ids = list(approval_ids)
+    claimed = approvals.claim(approval_ids, approved)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def resume_one(approval: PendingApproval) -> OrderResult:
+        async with semaphore:
+            return await _resume(approval, approved, runner, approvals)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(resume_one(approval) for approval in claimed))
+    report = summarize(results, time.perf_counter() - started)
+    report['skipped'] = len(approval_ids) - len(claimed)
+    report['results'] = results
+    return report
+
+
+_ORDER_RE = re.compile(r'(\d+) containers to (\w+)')
+
+
+def _order_responder(llm_request) -> Optional[FakeTurn]:
+    """Calls place_shipping_order with the size and port named in the query."""
+    last = llm_request.contents[-1] if llm_request.contents else None
+    text = ' '.join(part.text for part in (last.parts or []) if part.text) if last else ''
+    match = _ORDER_RE.search(text)
+    if last is None or last.role != 'user' or not match:
+        return None
+    return FakeTurn(function_calls = [(
+        'place_shipping_order',
+        {'num_containers': int(match.group(1)), 'destination': match.group(2)},
+    )])
+
+
+async def _benchmark(
+        orders: int, concurrency: int, latency: float, resume: bool
+) -> Dict[str, Any]:
+    ports = ['Rotterdam', 'Singapore', 'Mombasa', 'Santos', 'Busan']
+    queries = [
+        f"Ship {random.randint(1, 10)} containers to {random.choice(ports)}"
+        for _ in range(orders)
+    ]
+    with use_fake_model(shipping_runner.agent, responder = _order_responder, latency = latency):
+        report = await run_shipping_batch(queries, concurrency = concurrency)
+        paused = [r.approval['approval_id'] for r in report.pop('results') if r.approval]
+        if resume:
+            resumed = await resume_approvals(paused, True, concurrency = concurrency)
+            resumed.pop('results')
+            report['resume'] = resumed
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Concurrent shipping order benchmark')
+    parser.add_argument('--orders', type = int, default = 200)
+    parser.add_argument('--concurrency', type = int, default = 32)
+    parser.add_argument('--latency', type = float, default = 0.05,
+                        help = 'Simulated model latency in seconds')
+    parser.add_argument('--resume', action = 'store_true',
+                        help = 'Bulk-approve and resume the paused orders afterwards')
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_benchmark(
+        args.orders, args.concurrency, args.latency, args.resume,
+    )), indent = 2))
+
+
+if __name__ == '__main__':
+    main()
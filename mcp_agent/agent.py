@@ -1,7 +1,9 @@
+import os
+
 from google.genai import types
 
 from google.adk.agents import LlmAgent, Agent
-from google.adk.models.google_llm import Gemini
+from shared.governor import GovernedGemini
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 
@@ -14,15 +16,14 @@ from google.adk.runners import InMemoryRunner
 from google.adk.apps.app import App, ResumabilityConfig
 from google.adk.tools.function_tool import FunctionTool
 
-retry_config = types.HttpRetryOptions(
-    attempts = 5,
-    exp_base = 7,
-    initial_delay = 1,
-    http_status_codes = [429, 500, 503, 504]
-)
+from shared.artifact_store import ArtifactOffloadPlugin, BlobStore, ContentAddressedArtifactService
+from shared.mcp_pool import PooledMcpToolset, stub_server_params
 
-mcp_image_server = McpToolset(
-    connection_params = StdioConnectionParams(
+# MCP_IMAGE_SERVER=stub swaps in the offline stand-in server.
+if os.environ.get('MCP_IMAGE_SERVER') == 'stub':
+    image_server_params = stub_server_params()
+else:
+    image_server_params = StdioConnectionParams(
         server_params = StdioServerParameters(
             command = 'npx',
             args = [
@@ -31,18 +32,31 @@ mcp_image_server = McpToolset(
             ],
         ),
         timeout = 30,
-    ),
+    )
+
+# Server processes start at import, not on the first request.
+mcp_image_server = PooledMcpToolset(
+    connection_params = image_server_params,
+    pool_size = 2,
     tool_filter = ['getTinyImage'],
 )
 
 image_agent = LlmAgent(
     name = 'image_agent',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config,
     ),
     instruction = "Use the MCP Tool to generate images for user queries",
     tools = [mcp_image_server],
 )
 
-runner = InMemoryRunner(agent = image_agent)
\ No newline at end of file
+# Images are stored once by SHA-256; events and prompts carry a reference.
+blob_store = BlobStore()
+
+runner = Runner(
+    app_name = 'mcp_agent',
+    agent = image_agent,
+    session_service = InMemorySessionService(),
+    artifact_service = ContentAddressedArtifactService(store = blob_store),
+    plugins = [ArtifactOffloadPlugin(store = blob_store)],
+)
\ No newline at end of file
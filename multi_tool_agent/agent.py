@@ -1,4 +1,5 @@
 from google.adk.agents import Agent
+from shared.governor import GovernedGemini
 from zoneinfo import ZoneInfo
 import datetime
 
@@ -52,7 +53,7 @@ def get_location(city: str) -> dict:
 
 
 root_agent = Agent(
-    model='gemini-2.5-flash',
+    model=GovernedGemini(model='gemini-2.5-flash'),
     name='driving_class_agent',
     description='A helpful assistant to answer questions about driving school classes',
     instruction='You are a helpful agent who can answer questions to help people decide which driving school class to take. Take their vehicle type and location then use tools given to output a one sentence string recommending their class and school from options given.',
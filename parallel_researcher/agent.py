@@ -1,55 +1,48 @@
 from google.adk.agents import Agent, SequentialAgent, ParallelAgent, LoopAgent
 from google.genai import types
-from google.adk.models.google_llm import Gemini
+from shared.governor import GovernedGemini
 from google.adk.runners import InMemoryRunner
-from google.adk.plugins.logging_plugin import (LoggingPlugin,)
-from google.adk.tools import AgentTool, FunctionTool, google_search
+from google.adk.tools import AgentTool, FunctionTool
 
-retry_config = types.HttpRetryOptions(
-    attempts = 5,
-    exp_base = 7,
-    initial_delay = 1,
-    http_status_codes = [429, 500, 503, 504]
-)
+from shared.deadline_parallel import DeadlineParallelAgent
+from shared.local_search import search_tool
+from shared.response_cache import ResponseCachePlugin
+from shared.tracing import TracingPlugin
 
 tech_researcher = Agent(
     name = 'TechResearcher',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config
     ),
     instruction = """ Research the latest AI/ML trends. Include 3 key developments, the main companies involved, and the potential impact. Keep the report very concise (100 words).""",
-    tools = [google_search],
+    tools = [search_tool()],
     output_key = 'tech_research',
 )
 
 health_researcher = Agent(
     name = 'HealthResearcher',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config
     ),
     instruction = """ Research recent medical breakthroughs. Include 3 significant advances, their practical applications, and estimated timelines. Keep the report concise (100 words).""",
-    tools = [google_search],
+    tools = [search_tool()],
     output_key = 'health_research',
 )
 
 finance_researcher = Agent(
     name = 'FinanceResearcher',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash',
-        retry_options = retry_config
     ),
-    instruction = """ """,
-    tools = [google_search],
+    instruction = """ Research current fintech trends. Include 3 key trends, their market implications, and the future outlook. Keep the report concise (100 words).""",
+    tools = [search_tool()],
     output_key = 'finance_research',
 )
 
 aggregator_agent = Agent(
     name = 'AggregatorAgent',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash',
-        retry_options = retry_config
     ),
     instruction = """ Combine these three research findings into a single executive summary:
 
@@ -62,13 +55,21 @@ aggregator_agent = Agent(
     **Finance Innovations:**
     {finance_research}
     
-    Your summary should highlight common themes, surprising connections, and the most important key takeaways from all three reports. The final summary should be around 200 words. """,
+    Your summary should highlight common themes, surprising connections, and the most important key takeaways from all three reports. If a report is marked as unavailable, say so in one line and summarize the others. The final summary should be around 200 words. """,
     output_key = 'executive_summary',
 )
 
-parallel_researcher = ParallelAgent(
+# Aggregation starts once two reports are in, waiting up to 10s for the third.
+# A finance report running past its p95 is hedged on the lighter model.
+parallel_researcher = DeadlineParallelAgent(
     name = 'ParallelResearcher',
     sub_agents = [tech_researcher, health_researcher, finance_researcher],
+    deadline = 60.0,
+    quorum = 2,
+    quorum_grace = 10.0,
+    hedge_models = {
+        'FinanceResearcher': GovernedGemini(model = 'gemini-2.5-flash-lite'),
+    },
 )
 
 root_agent = SequentialAgent(
@@ -76,7 +77,10 @@ root_agent = SequentialAgent(
     sub_agents = [parallel_researcher, aggregator_agent],
 )
 
+# With SEARCH_BACKEND=live the researchers are grounded and bypassed; the aggregator is cached.
+response_cache = ResponseCachePlugin(agent_ttls = {'AggregatorAgent': 3600})
+
 runner = InMemoryRunner(
     agent = root_agent,
-    plugins = [LoggingPlugin()]
+    plugins = [TracingPlugin(path = 'parallel_researcher_traces.jsonl'), response_cache]
 )
\ No newline at end of file
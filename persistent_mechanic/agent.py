@@ -1,19 +1,13 @@
 from google.adk.agents import LlmAgent
-from google.adk.models.google_llm import Gemini
+from shared.governor import GovernedGemini
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
-from google.adk.memory import InMemoryMemoryService
 from google.adk.tools import load_memory, preload_memory
 from google.genai import types
 
-retry_config = types.HttpRetryOptions(
-    attempts = 5,
-    exp_base = 7,
-    initial_delay = 1,
-    http_status_codes = [429, 500, 503, 504],
-)
+from .memory_store import IncrementalMemoryService, IndexedMemoryService
 
-memory_service = (InMemoryMemoryService())
+memory_service = IndexedMemoryService()
 
 session_service = InMemorySessionService()
 
@@ -21,15 +15,18 @@ APP_NAME = 'MemoryDemoApp'
 USER_ID = 'demo_user'
 
 async def auto_save_to_memory(callback_context):
-    """Automatically save session to memory after each agent turn."""
-    await callback_context._invocation_context.memory_service.add_session_to_memory(
-        callback_context._invocation_context.session
-    )   
+    """Automatically save the turn's new events to memory after each agent turn."""
+    service = callback_context._invocation_context.memory_service
+    session = callback_context._invocation_context.session
+    if isinstance(service, IncrementalMemoryService):
+        # Ingestion happens in a background flush, off the turn's critical path.
+        service.enqueue_session(session)
+    else:
+        await service.add_session_to_memory(session)
 
 root_agent = LlmAgent(
-    model=Gemini(
+    model=GovernedGemini(
         model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config,
     ),
     name='PersistentMechanic',
     description='A helpful assistant for user questions.',
@@ -1,7 +1,9 @@
 from google.adk.agents import Agent
 
+from shared.governor import GovernedGemini
+
 root_agent = Agent(
-    model='gemini-2.5-flash',
+    model=GovernedGemini(model='gemini-2.5-flash'),
     name='question_agent',
     description='A helpful assistant for user questions.',
     instruction='Answer user questions to the best of your knowledge',
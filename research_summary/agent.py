@@ -1,34 +1,28 @@
 from google.adk.agents import Agent, SequentialAgent, ParallelAgent, LoopAgent
 from google.genai import types
-from google.adk.models.google_llm import Gemini
+from shared.governor import GovernedGemini
 from google.adk.runners import InMemoryRunner
-from google.adk.tools import AgentTool, FunctionTool, google_search
+from google.adk.tools import AgentTool, FunctionTool
 
-retry_config = types.HttpRetryOptions(
-    attempts = 5,
-    exp_base = 7,
-    initial_delay = 1,
-    http_status_codes = [429, 500, 503, 504]
-)
+from shared.local_search import search_tool
+from shared.response_cache import ResponseCachePlugin
 
 research_agent = Agent(
     name = 'ResearchAgent',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config
     ),
     instruction = """
 You are a specialized research agent. Your only job is to use the google_search tool to find 2-3 pieces of relevant information on the given topic and present the findings with citations.
 """,
-    tools = [google_search],
+    tools = [search_tool()],
     output_key = 'research_findings',
 )
 
 summarrizer_agent = Agent(
     name = 'SummarizerAgent',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config
     ),
     instruction = """
 Read the provided research findings: {research_findings} Create a concise summary as a bulleted list with 3-5 key points.""",
@@ -38,9 +32,8 @@ Read the provided research findings: {research_findings} Create a concise summar
 
 root_agent = Agent(
     name='ResearchCoordinator',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config
     ),
     description='A helpful assistant for user questions.',
     instruction="""You are a research coordinator. Your goal is to answer the user's query by orchestrating a workflow.
@@ -49,3 +42,11 @@ root_agent = Agent(
     3. Finally, present the final summary clearly to the user as your response.""",
     tools = [AgentTool(research_agent), AgentTool(summarrizer_agent)]
 )
+
+# With SEARCH_BACKEND=live, ResearchAgent is grounded and bypassed by the cache.
+response_cache = ResponseCachePlugin()
+
+runner = InMemoryRunner(
+    agent = root_agent,
+    plugins = [response_cache]
+)
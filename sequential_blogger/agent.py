@@ -1,21 +1,16 @@
 from google.adk.agents import Agent, SequentialAgent, ParallelAgent, LoopAgent
 from google.genai import types
-from google.adk.models.google_llm import Gemini
+from shared.governor import GovernedGemini
 from google.adk.runners import InMemoryRunner
 from google.adk.tools import AgentTool, FunctionTool, google_search
 
-retry_config = types.HttpRetryOptions(
-    attempts = 5,
-    exp_base = 7,
-    initial_delay = 1,
-    http_status_codes = [429, 500, 503, 504]
-)
+from shared.response_cache import ResponseCachePlugin
+from shared.streaming_pipeline import StreamingPipelineAgent
 
 outline_agent = Agent(
     name = 'OutlineAgent',
-    model = Gemini(
+    model = GovernedGemini(
         model='gemini-2.5-flash-lite',
-        retry_options = retry_config
     ),
     instruction = """
     Create a blog outline for the given topic with:
@@ -29,9 +24,8 @@ outline_agent = Agent(
 
 writer_agent = Agent(
     name = 'WriterAgent',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config
     ),
     instruction = """
     Following this outline strictly: {blog_outline} 
@@ -42,18 +36,32 @@ writer_agent = Agent(
 
 editor_agent = Agent(
     name = 'EditorAgent',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config
     ),
     instruction = """
     Edit this draft: {blog_draft}
+    The draft is one paragraph or heading of a longer blog post; the rest is edited separately.
     Your task is to polish the text by fixing any grammatical errors, improving the flow and sentence structure, and enhancing overall clarity.
+    Output only the edited text.
     """,
+    # The paragraph comes in through {blog_draft}; the session history would
+    # show the editor the whole draft again with every paragraph.
+    include_contents = 'none',
     output_key = 'final_blog',
 )
 
-root_agent = Agent(
-    name='BlogPipeline',
-    sub_agents = [outline_agent, writer_agent, editor_agent]
+# Stages run in a fixed order; paragraphs of the streamed draft are edited
+# while the writer is still producing the rest.
+root_agent = StreamingPipelineAgent(
+    name = 'BlogPipeline',
+    sub_agents = [outline_agent, writer_agent, editor_agent],
+    chunk_key = 'blog_draft',
+)
+
+response_cache = ResponseCachePlugin()
+
+runner = InMemoryRunner(
+    agent = root_agent,
+    plugins = [response_cache]
 )
@@ -0,0 +1,304 @@
+"""Content-addressed storage for binary tool outputs.
+
+MCP tools return images and other binary content as base64 inside their
+function response. That payload is then stored in every session event, sent
+again with every later model request in the session, and copied again with
+every session copy. `ArtifactOffloadPlugin` moves binary items out of tool
+results before they become events:
+
+- the decoded bytes are written once to a `BlobStore`, named by their SHA-256,
+  so identical payloads from any session share one file;
+- the tool result keeps a small reference (`artifact`, `sha256`, `mimeType`,
+  `size`) in place of the data;
+- the reference is also saved as a session artifact when the runner has an
+  artifact service, so clients can list and load it.
+
+`ContentAddressedArtifactService` is an in-memory artifact service that keeps
+only digests in its version index and resolves them from the `BlobStore` when
+loaded. Blobs are read through read-only mmaps, and `BlobStore.get` returns a
+memoryview over the mapping without copying. `load_artifact` returns a
+`types.Part`, which needs `bytes`, so it makes one copy.
+
+Compare session and prompt sizes with and without offloading with:
+
+    python -m shared.artifact_store --sessions 20 --turns 5
+"""
+
+import argparse
+import asyncio
+import base64
+import binascii
+import hashlib
+import mimetypes
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.genai import types
+from pydantic import ConfigDict, Field
+from typing_extensions import override
+
+from google.adk.artifacts.in_memory_artifact_service import InMemoryArtifactService
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+DEFAULT_BLOB_ROOT = 'artifact_blobs'
+URI_SCHEME = 'sha256:'
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class BlobStore:
+    """Files named by the SHA-256 of their content, under `root/ab/cdef...`.
+
+    Args:
+        root: Directory the blobs are stored in.
+        max_open: Read-only mappings kept open for repeated reads.
+    """
+
+    def __init__(self, root: str = DEFAULT_BLOB_ROOT, max_open: int = 256):
+        self.root = root
+        self.max_open = max_open
+        self._maps: 'OrderedDict[str, mmap.mmap]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'puts': 0, 'stored': 0, 'deduplicated': 0, 'bytes_stored': 0,
+                      'bytes_deduplicated': 0, 'reads': 0}
+
+    def path(self, digest: str) -> str:
+        if not _DIGEST_RE.match(digest):
+            raise ValueError(f'Not a SHA-256 digest: {digest!r}')
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def __contains__(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put(self, data: bytes) -> str:
+        """Stores `data` unless an identical blob exists; returns its digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        self.stats['puts'] += 1
+        if os.path.exists(path):
+            self.stats['deduplicated'] += 1
+            self.stats['bytes_deduplicated'] += len(data)
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        # Write then rename, so readers never see a partial blob.
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.stats['stored'] += 1
+        self.stats['bytes_stored'] += len(data)
+        return digest
+
+    def get(self, digest: str) -> memoryview:
+        """Read-only view of a blob, backed by a shared mmap of its file."""
+        self.stats['reads'] += 1
+        with self._lock:
+            mapped = self._maps.get(digest)
+            if mapped is None:
+                with open(self.path(digest), 'rb') as f:
+                    if os.fstat(f.fileno()).st_size == 0:
+                        return memoryview(b'')
+                    mapped = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+                self._maps[digest] = mapped
+                # Evicted maps close once the last view into them is released.
+                while len(self._maps) > self.max_open:
+                    self._maps.popitem(last = False)
+            else:
+                self._maps.move_to_end(digest)
+        return memoryview(mapped)
+
+
+def digest_of(uri: Optional[str]) -> Optional[str]:
+    """Digest named by a `sha256:` URI, or None for any other URI."""
+    if uri and uri.startswith(URI_SCHEME):
+        digest = uri[len(URI_SCHEME):]
+        if _DIGEST_RE.match(digest):
+            return digest
+    return None
+
+
+class ContentAddressedArtifactService(InMemoryArtifactService):
+    """In-memory artifact index whose inline bytes live once in a `BlobStore`."""
+
+    model_config = ConfigDict(arbitrary_types_allowed = True)
+
+    store: BlobStore = Field(default_factory = BlobStore)
+
+    @override
+    async def save_artifact(self, *, app_name: str, user_id: str, filename: str,
+                            artifact: types.Part, session_id: Optional[str] = None,
+                            custom_metadata: Optional[Dict[str, Any]] = None) -> int:
+        if artifact.inline_data is not None and artifact.inline_data.data:
+            digest = self.store.put(artifact.inline_data.data)
+            artifact = types.Part(file_data = types.FileData(
+                file_uri = URI_SCHEME + digest, mime_type = artifact.inline_data.mime_type,
+            ))
+        return await super().save_artifact(
+            app_name = app_name, user_id = user_id, filename = filename, artifact = artifact,
+            session_id = session_id, custom_metadata = custom_metadata,
+        )
+
+    @override
+    async def load_artifact(self, *, app_name: str, user_id: str, filename: str,
+                            session_id: Optional[str] = None,
+                            version: Optional[int] = None) -> Optional[types.Part]:
+        part = await super().load_artifact(app_name = app_name, user_id = user_id,
+                                           filename = filename, session_id = session_id,
+                                           version = version)
+        digest = digest_of(part.file_data.file_uri) if part and part.file_data else None
+        if digest is None:
+            return part
+        return types.Part(inline_data = types.Blob(
+            data = bytes(self.store.get(digest)), mime_type = part.file_data.mime_type,
+        ))
+
+
+def _decode(data: Any) -> Optional[bytes]:
+    if not isinstance(data, str):
+        return None
+    try:
+        return base64.b64decode(data, validate = True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+class ArtifactOffloadPlugin(BasePlugin):
+    """Replaces binary items in tool results with content-addressed references.
+
+    Handles MCP `image` and `audio` content and embedded `resource` blobs.
+
+    Example:
+        >>> runner = InMemoryRunner(agent = root_agent, plugins = [ArtifactOffloadPlugin()])
+
+    Args:
+        store: Where the bytes go; shared with a ContentAddressedArtifactService
+            so loads resolve without a second copy on disk.
+        min_bytes: Payloads smaller than this stay inline.
+    """
+
+    def __init__(self, name: str = 'artifact_offload', store: Optional[BlobStore] = None,
+                 min_bytes: int = 256):
+        super().__init__(name)
+        self.store = store or BlobStore()
+        self.min_bytes = min_bytes
+        self.stats = {'offloaded': 0, 'inline_bytes_removed': 0}
+
+    def _offload(self, item: Dict[str, Any], data_key: str,
+                 offloaded: List[Tuple[str, str, str]]) -> Optional[Dict[str, Any]]:
+        data = _decode(item.get(data_key))
+        if data is None or len(data) < self.min_bytes:
+            return None
+        mime_type = item.get('mimeType') or 'application/octet-stream'
+        digest = self.store.put(data)
+        filename = digest + (mimetypes.guess_extension(mime_type) or '')
+        offloaded.append((filename, digest, mime_type))
+        self.stats['offloaded'] += 1
+        self.stats['inline_bytes_removed'] += len(item[data_key])
+        reference = {k: v for k, v in item.items() if k != data_key}
+        reference.update(artifact = filename, sha256 = digest, size = len(data))
+        return reference
+
+    def _offload_content(self, content: List[Any]) -> Tuple[List[Any], List[Tuple[str, str, str]]]:
+        offloaded: List[Tuple[str, str, str]] = []
+        items = []
+        for item in content:
+            replaced = None
+            if isinstance(item, dict):
+                if item.get('type') in ('image', 'audio'):
+                    replaced = self._offload(item, 'data', offloaded)
+                elif item.get('type') == 'resource' and isinstance(item.get('resource'), dict):
+                    resource = self._offload(item['resource'], 'blob', offloaded)
+                    replaced = {**item, 'resource': resource} if resource else None
+            items.append(replaced or item)
+        return items, offloaded
+
+    async def after_tool_callback(self, *, tool: BaseTool, tool_args: Dict[str, Any],
+                                  tool_context: ToolContext, result: Dict) -> Optional[Dict]:
+        content = result.get('content') if isinstance(result, dict) else None
+        if not isinstance(content, list):
+            return None
+        # Decoding, hashing and writing blobs would otherwise block the event loop.
+        items, offloaded = await asyncio.to_thread(self._offload_content, content)
+        if not offloaded:
+            return None
+        for filename, digest, mime_type in offloaded:
+            try:
+                await tool_context.save_artifact(filename, types.Part(file_data = types.FileData(
+                    file_uri = URI_SCHEME + digest, mime_type = mime_type,
+                )))
+            except ValueError:
+                # The runner has no artifact service; the reference stays in the result.
+                break
+        return {**result, 'content': items}
+
+
+async def _measure(offload: bool, sessions: int, turns: int, root: str) -> Dict[str, Any]:
+    from google.adk.agents import LlmAgent
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    from shared.fake_llm import FakeGemini
+    from shared.mcp_pool import PooledMcpToolset, stub_server_params
+
+    prompt_bytes = []
+
+    def count_prompt(callback_context: Any, llm_request: Any) -> None:
+        prompt_bytes.append(sum(len(c.model_dump_json(exclude_none = True))
+                                for c in llm_request.contents))
+
+    toolset = PooledMcpToolset(connection_params = stub_server_params(), pool_size = 1,
+                               tool_filter = ['getTinyImage'])
+    agent = LlmAgent(name = 'image_agent', model = FakeGemini(model = 'gemini-2.5-flash-lite'),
+                     instruction = 'Use the MCP Tool to generate images for user queries',
+                     tools = [toolset], before_model_callback = count_prompt)
+    store = BlobStore(root)
+    plugins = [ArtifactOffloadPlugin(store = store)] if offload else []
+    session_service = InMemorySessionService()
+    runner = Runner(app_name = 'mcp_agent', agent = agent, session_service = session_service,
+                    artifact_service = ContentAddressedArtifactService(store = store),
+                    plugins = plugins)
+    session_bytes = 0
+    for _ in range(sessions):
+        session = await session_service.create_session(app_name = 'mcp_agent', user_id = 'bench')
+        for _ in range(turns):
+            message = types.Content(role = 'user', parts = [types.Part(text = 'Show me an image')])
+            async for _ in runner.run_async(user_id = 'bench', session_id = session.id,
+                                            new_message = message):
+                pass
+        stored = await session_service.get_session(app_name = 'mcp_agent', user_id = 'bench',
+                                                   session_id = session.id)
+        session_bytes += len(stored.model_dump_json())
+    toolset.pool.close()
+    return {
+        'session_kib': round(session_bytes / sessions / 1024, 1),
+        'mean_prompt_kib': round(sum(prompt_bytes) / len(prompt_bytes) / 1024, 1),
+        'max_prompt_kib': round(max(prompt_bytes) / 1024, 1),
+        'blob_files': store.stats['stored'],
+        'blob_kib': round(store.stats['bytes_stored'] / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Session and prompt size with artifact offload')
+    parser.add_argument('--sessions', type = int, default = 20)
+    parser.add_argument('--turns', type = int, default = 5, help = 'Image requests per session')
+    args = parser.parse_args()
+
+    for offload in (False, True):
+        root = tempfile.mkdtemp(prefix = 'blobs.')
+        try:
+            result = asyncio.run(_measure(offload, args.sessions, args.turns, root))
+        finally:
+            shutil.rmtree(root)
+        print({'offload': offload, **result})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""End-to-end latency benchmark for the agent packages using `FakeGemini`.
+
+Every package's `root_agent` is run through an `InMemoryRunner` with its models
+swapped for the offline fake, so the numbers measure framework and tool
+overhead only. Run from the repository root:
+
+    python -m shared.benchmark currency_converter parallel_researcher -n 50
+    python -m shared.benchmark --json bench.json --baseline baseline.json
+
+With `--baseline` the command exits non-zero when any package's p95 latency
+regresses by more than `--tolerance`.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from google.genai import types
+
+from google.adk.runners import InMemoryRunner
+
+from .fake_llm import use_fake_model
+from .registry import registry
+
+PACKAGES = [
+    'currency_converter',
+    'due_diligence',
+    'long_running_operations',
+    'loop_story_refiner',
+    'mcp_agent',
+    'multi_tool_agent',
+    'parallel_researcher',
+    'persistent_mechanic',
+    'question_agent',
+    'research_summary',
+    'sequential_blogger',
+    'stateful_agent',
+    'weekend_planner',
+]
+
+# Realistic arguments for the fake model's tool calls, keyed by function name.
+DEFAULT_TOOL_ARGS = {
+    'get_fee_for_payment_method': {'method': 'platinum credit card'},
+    'get_exchange_rate': {'base_currency': 'USD', 'target_currency': 'EUR'},
+    'convert_currency': {
+        'amount': 1250, 'base_currency': 'USD', 'target_currency': 'EUR',
+        'payment_method': 'platinum credit card',
+    },
+    'convert_currency_batch': {
+        'amounts': [19.99, 250, 1250], 'base_currency': 'USD', 'target_currency': 'JPY',
+        'payment_method': 'bank transfer',
+    },
+    'place_shipping_order': {'num_containers': 3, 'destination': 'Rotterdam'},
+    'get_category': {'vehicle': 'car'},
+    'get_location': {'city': 'nairobi'},
+    'google_search': {'query': 'weekend events in Nairobi'},
+    'save_userinfo': {'user_name': 'Sam', 'country': 'Kenya'},
+    'retrieve_user_preferences': {'user_id': 'default_user'},
+    'save_user_preferences': {
+        'user_id': 'default_user', 'preferences': {'budget_preference': 'mid-range'},
+    },
+    'filter_by_budget': {
+        'activities': [{'Activity Name': 'Museum', 'Price': '$35'}],
+        'budget_preference': 'low budget',
+    },
+    'EventSourcingAgent': {
+        'location': 'Nairobi', 'start_date': '2026-10-24', 'end_date': '2026-10-25',
+    },
+    'rank_activities': {
+        'activities': [
+            {'Activity Name': 'Museum', 'Price': '$35', 'Time': 'Sat 10:00 AM'},
+            {'Activity Name': 'Jazz night', 'Price': 'Free', 'Time': 'Sat 8:00 PM'},
+        ],
+        'user_preferences': {'budget_preference': 'low budget', 'interests': ['jazz']},
+        'top_k': 5,
+    },
+}
+
+USER_ID = 'bench_user'
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of `values` for `q` in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def load_root_agent(package: str):
+    """Root agent of `package`, built on first use by the shared registry."""
+    return registry.get(package)
+
+
+async def _invoke(runner: InMemoryRunner, query: str) -> int:
+    session = await runner.session_service.create_session(
+        app_name = runner.app_name, user_id = USER_ID
+    )
+    message = types.Content(role = 'user', parts = [types.Part(text = query)])
+    events = 0
+    async for _ in runner.run_async(
+        user_id = USER_ID, session_id = session.id, new_message = message
+    ):
+        events += 1
+    return events
+
+
+async def benchmark_package(
+        package: str,
+        iterations: int = 20,
+        warmup: int = 2,
+        memory_iterations: int = 5,
+        latency: float = 0.0,
+        query: str = 'Hello',
+) -> Dict[str, Any]:
+    """Benchmarks one package's root_agent against the fake model.
+
+    Args:
+        package: Name of the agent package, e.g. "currency_converter".
+        iterations: Timed invocations.
+        warmup: Untimed invocations run first.
+        memory_iterations: Invocations traced with tracemalloc. Each one
+            reports the memory it leaves allocated (blocks and bytes still
+            held afterwards) and its peak allocation (the highest traced
+            memory during the run, above the level it started at). They run
+            separately so tracing does not skew latency.
+        latency: Simulated model latency in seconds per call.
+        query: User message sent on each invocation.
+
+    Returns:
+        Dictionary with latency percentiles (ms), events per second, model
+        calls, and retained and peak memory per invocation.
+    """
+    root_agent = load_root_agent(package)
+    with use_fake_model(
+        root_agent, latency = latency, tool_args = DEFAULT_TOOL_ARGS
+    ) as fakes:
+        runner = InMemoryRunner(agent = root_agent, app_name = package)
+
+        for _ in range(warmup):
+            await _invoke(runner, query)
+
+        calls_before = sum(fake.calls for fake in fakes.values())
+        latencies = []
+        total_events = 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            total_events += await _invoke(runner, query)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        elapsed = time.perf_counter() - started
+        model_calls = sum(fake.calls for fake in fakes.values()) - calls_before
+
+        blocks, retained_bytes, peak_bytes = 0, 0, 0
+        if memory_iterations:
+            tracemalloc.start()
+            try:
+                for _ in range(memory_iterations):
+                    before = tracemalloc.take_snapshot()
+                    tracemalloc.reset_peak()
+                    start_bytes = tracemalloc.get_traced_memory()[0]
+                    await _invoke(runner, query)
+                    peak_bytes += tracemalloc.get_traced_memory()[1] - start_bytes
+                    after = tracemalloc.take_snapshot()
+                    for stat in after.compare_to(before, 'filename'):
+                        if stat.count_diff > 0:
+                            blocks += stat.count_diff
+                            retained_bytes += stat.size_diff
+            finally:
+                tracemalloc.stop()
+
+    return {
+        'package': package,
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'events_per_invocation': total_events / iterations if iterations else 0,
+        'events_per_sec': round(total_events / elapsed, 1) if elapsed else 0.0,
+        'model_calls_per_invocation': model_calls / iterations if iterations else 0,
+        'retained_blocks_per_invocation': blocks // memory_iterations if memory_iterations else 0,
+        'retained_kib_per_invocation': (
+            round(retained_bytes / memory_iterations / 1024, 1) if memory_iterations else 0.0
+        ),
+        'peak_kib_per_invocation': (
+            round(peak_bytes / memory_iterations / 1024, 1) if memory_iterations else 0.0
+        ),
+    }
+
+
+def compare_to_baseline(
+        results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Returns a message for every package whose p95 regressed past tolerance."""
+    previous = {entry['package']: entry for entry in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        base = previous.get(result['package'])
+        if not base or 'p95_ms' not in result or 'p95_ms' not in base:
+            continue
+        limit = base['p95_ms'] * (1 + tolerance)
+        if result['p95_ms'] > limit:
+            regressions.append(
+                f"{result['package']}: p95 {result['p95_ms']:.2f}ms > "
+                f"{limit:.2f}ms (baseline {base['p95_ms']:.2f}ms)"
+            )
+    return regressions
+
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    header = f"{'package':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ev/s':>9}{'calls':>7}{'retained':>9}{'KiB':>9}{'peak KiB':>10}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        if 'error' in r:
+            print(f"{r['package']:<26}  error: {r['error']}")
+            continue
+        print(
+            f"{r['package']:<26}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+            f"{r['events_per_sec']:>9.0f}{r['model_calls_per_invocation']:>7.1f}"
+            f"{r['retained_blocks_per_invocation']:>9}{r['retained_kib_per_invocation']:>9.1f}"
+            f"{r['peak_kib_per_invocation']:>10.1f}"
+        )
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results = []
+    for package in args.packages or PACKAGES:
+        try:
+            results.append(await benchmark_package(
+                package,
+                iterations = args.iterations,
+                warmup = args.warmup,
+                memory_iterations = args.memory_iterations,
+                latency = args.latency,
+                query = args.query,
+            ))
+        except Exception as e:
+            results.append({'package': package, 'error': f'{type(e).__name__}: {e}'})
+    return {'latency_s': args.latency, 'results': results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('packages', nargs = '*', help = 'Packages to run (default: all)')
+    parser.add_argument('-n', '--iterations', type = int, default = 20)
+    parser.add_argument('--warmup', type = int, default = 2)
+    parser.add_argument('--memory-iterations', type = int, default = 5,
+                        help = 'Traced invocations for retained and peak memory (0 to skip)')
+    parser.add_argument('--latency', type = float, default = 0.0,
+                        help = 'Simulated model latency in seconds')
+    parser.add_argument('--query', default = 'Hello')
+    parser.add_argument('--json', help = 'Write the report to this file')
+    parser.add_argument('--baseline', help = 'Report to compare p95 latency against')
+    parser.add_argument('--tolerance', type = float, default = 0.2,
+                        help = 'Allowed relative p95 regression (default 0.2)')
+    args = parser.parse_args(argv)
+
+    # Offline runs use the local MCP stand-in instead of npx.
+    os.environ.setdefault('MCP_IMAGE_SERVER', 'stub')
+    report = asyncio.run(run(args))
+    _print_table(report['results'])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent = 2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report['results'], json.load(f), args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
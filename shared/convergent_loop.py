@@ -0,0 +1,208 @@
+"""LoopAgent variant that decides termination locally between sub-agents.
+
+A critic/refiner loop normally exits when the refiner makes a model call only
+to invoke an exit tool after the critic approved. `ConvergentLoopAgent`
+checks the state after every sub-agent instead, and exits before the next
+sub-agent runs when
+
+- the value under `approval_key` is exactly `approval_text` (quotes,
+  whitespace and a trailing period are ignored), or
+- the new value under `draft_key` is at least `similarity_threshold` similar
+  (difflib ratio) to the draft it replaced.
+
+Iterations, exit reasons, skipped sub-agent runs and the time they would have
+taken (estimated from each sub-agent's mean run time) are kept in `stats`.
+
+Compare it with a plain LoopAgent offline with:
+
+    python -m shared.convergent_loop --stories 50
+"""
+
+import argparse
+import asyncio
+import difflib
+import logging
+import random
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from google.genai import types
+from pydantic import PrivateAttr
+from typing_extensions import override
+
+from google.adk.agents import LlmAgent, LoopAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.utils.context_utils import Aclosing
+
+logger = logging.getLogger(__name__)
+
+
+def similarity(a: str, b: str) -> float:
+    """Similarity ratio of two drafts in [0, 1], compared word by word."""
+    return difflib.SequenceMatcher(None, a.split(), b.split(), autojunk = False).ratio()
+
+
+class ConvergentLoopAgent(LoopAgent):
+    """Runs sub-agents in a loop until approved, converged or out of iterations.
+
+    Attributes:
+        approval_key: State key holding the critique; None disables the check.
+        approval_text: Critique that ends the loop.
+        draft_key: State key holding the draft; None disables the check.
+        similarity_threshold: Draft similarity at or above which the loop ends.
+    """
+
+    approval_key: Optional[str] = None
+    approval_text: str = 'APPROVED'
+    draft_key: Optional[str] = None
+    similarity_threshold: float = 0.97
+
+    _durations: Dict[str, List[float]] = PrivateAttr(default_factory = dict)
+    _stats: Dict[str, Any] = PrivateAttr(default_factory = dict)
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        # Total seconds and runs per sub-agent, for the time-saved estimate.
+        self._durations = {sub_agent.name: [0.0, 0] for sub_agent in self.sub_agents}
+        self._stats = {'runs': 0, 'iterations': 0, 'approved': 0, 'converged': 0,
+                       'escalated': 0, 'max_iterations': 0, 'skipped_agent_runs': 0,
+                       'time_saved_s': 0.0}
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return self._stats
+
+    def _approved(self, value: Any) -> bool:
+        return str(value or '').strip().strip('"\'*').strip().rstrip('.') == self.approval_text
+
+    def _mean_duration(self, name: str) -> float:
+        total, runs = self._durations[name]
+        return total / runs if runs else 0.0
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        if not self.sub_agents:
+            return
+        self._stats['runs'] += 1
+        times_looped = 0
+        reason = None
+        while reason is None and (not self.max_iterations or times_looped < self.max_iterations):
+            for i, sub_agent in enumerate(self.sub_agents):
+                previous_draft = ctx.session.state.get(self.draft_key) if self.draft_key else None
+                started = time.perf_counter()
+                async with Aclosing(sub_agent.run_async(ctx)) as agen:
+                    async for event in agen:
+                        yield event
+                        if event.actions.escalate:
+                            reason = 'escalated'
+                timing = self._durations[sub_agent.name]
+                timing[0] += time.perf_counter() - started
+                timing[1] += 1
+
+                output_key = getattr(sub_agent, 'output_key', None)
+                if reason is None and output_key and output_key == self.approval_key:
+                    if self._approved(ctx.session.state.get(output_key)):
+                        reason = 'approved'
+                if reason is None and output_key and output_key == self.draft_key:
+                    draft = ctx.session.state.get(output_key)
+                    if (isinstance(previous_draft, str) and isinstance(draft, str)
+                            and similarity(previous_draft, draft) >= self.similarity_threshold):
+                        reason = 'converged'
+                if reason is not None:
+                    skipped = self.sub_agents[i + 1:]
+                    self._stats['skipped_agent_runs'] += len(skipped)
+                    self._stats['time_saved_s'] += sum(
+                        self._mean_duration(agent.name) for agent in skipped
+                    )
+                    break
+            times_looped += 1
+            ctx.reset_sub_agent_states(self.name)
+        self._stats['iterations'] += times_looped
+        self._stats[reason or 'max_iterations'] += 1
+        logger.debug('%s finished after %d iterations: %s', self.name, times_looped,
+                     reason or 'max_iterations')
+
+
+def _story_pipeline(loop_cls: type, approve_rate: float, **loop_kwargs: Any) -> Any:
+    """Writer, critic and refiner on fake models; the critic approves at random."""
+    from shared.fake_llm import FakeGemini, FakeTurn
+
+    def critic(llm_request: Any) -> FakeTurn:
+        if random.random() < approve_rate:
+            return FakeTurn(text = 'APPROVED')
+        return FakeTurn(text = 'Tighten the middle; give the ending more weight.')
+
+    story = ' '.join(['The fox crossed the frozen river at dawn.'] * 15)
+
+    def refiner(llm_request: Any) -> FakeTurn:
+        last = llm_request.contents[-1].parts or [] if llm_request.contents else []
+        if any(part.function_response for part in last):
+            return FakeTurn(text = 'Story approved.')
+        if 'APPROVED' in str(llm_request.config.system_instruction):
+            return FakeTurn(function_calls = [('exit_loop', {})])
+        # Revisions after the first change only a word or two.
+        return FakeTurn(text = f'{story} It ended {random.choice(["well", "quietly"])}.')
+
+    def exit_loop(tool_context: Any) -> Dict[str, str]:
+        """Call this function ONLY when the critique is 'APPROVED'."""
+        tool_context.actions.escalate = True
+        return {'status': 'approved'}
+
+    writer = LlmAgent(name = 'InitialWriterAgent', output_key = 'current_story',
+                      model = FakeGemini(model = 'gemini-2.5-flash-lite', latency = 0.05),
+                      instruction = 'Write a story.')
+    critic_agent = LlmAgent(name = 'CriticAgent', output_key = 'critique',
+                            model = FakeGemini(model = 'gemini-2.5-flash-lite', latency = 0.05,
+                                               responder = critic),
+                            instruction = 'Critique: {current_story}')
+    refiner_agent = LlmAgent(name = 'RefinerAgent', output_key = 'current_story',
+                             model = FakeGemini(model = 'gemini-2.5-flash', latency = 0.15,
+                                                responder = refiner),
+                             instruction = 'Critique: {critique}\nStory: {current_story}',
+                             tools = [exit_loop] if loop_cls is LoopAgent else [])
+    loop = loop_cls(name = 'StoryRefinementLoop', sub_agents = [critic_agent, refiner_agent],
+                    **loop_kwargs)
+    return SequentialAgent(name = 'StoryPipeline', sub_agents = [writer, loop]), loop
+
+
+async def _measure(pipeline: Any, stories: int) -> Dict[str, Any]:
+    from google.adk.runners import InMemoryRunner
+    from shared.fake_llm import iter_llm_agents
+
+    runner = InMemoryRunner(agent = pipeline, app_name = 'loop_story_refiner')
+    started = time.perf_counter()
+    for _ in range(stories):
+        session = await runner.session_service.create_session(
+            app_name = 'loop_story_refiner', user_id = 'bench'
+        )
+        message = types.Content(role = 'user', parts = [types.Part(text = 'A story about a fox')])
+        async for _ in runner.run_async(user_id = 'bench', session_id = session.id,
+                                        new_message = message):
+            pass
+    elapsed = time.perf_counter() - started
+    calls = {agent.name: agent.model.calls for agent in iter_llm_agents(pipeline)}
+    return {'mean_s': round(elapsed / stories, 3), 'model_calls': calls}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'LoopAgent versus ConvergentLoopAgent')
+    parser.add_argument('--stories', type = int, default = 50)
+    parser.add_argument('--max-iterations', type = int, default = 3)
+    parser.add_argument('--approve-rate', type = float, default = 0.5)
+    parser.add_argument('--seed', type = int, default = 7)
+    args = parser.parse_args()
+
+    for loop_cls, kwargs in (
+            (LoopAgent, {}),
+            (ConvergentLoopAgent, {'approval_key': 'critique', 'draft_key': 'current_story'}),
+    ):
+        random.seed(args.seed)
+        pipeline, loop = _story_pipeline(loop_cls, args.approve_rate,
+                                         max_iterations = args.max_iterations, **kwargs)
+        result = asyncio.run(_measure(pipeline, args.stories))
+        print({'loop': loop_cls.__name__, **result, **getattr(loop, 'stats', {})})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+"""ParallelAgent variant with deadlines, a quorum and hedged requests.
+
+`ParallelAgent` waits for its slowest branch. `DeadlineParallelAgent` runs the
+same isolated branches but
+
+- gives up on a branch once its deadline passes,
+- continues once `quorum` branches have finished, after waiting at most
+  `quorum_grace` seconds for the rest,
+- sends a hedged duplicate of a branch to a faster model (`hedge_models`)
+  once the branch has run longer than its p95 latency, keeping whichever
+  attempt finishes first,
+- writes a placeholder to the `output_key` of every branch without a result,
+  so templates such as `{finance_research}` in the next agent still resolve.
+
+Compare it with a plain ParallelAgent offline with:
+
+    python -m shared.deadline_parallel --runs 200
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Deque, Dict, List, Optional, Union
+
+from google.genai import types
+from pydantic import PrivateAttr
+from typing_extensions import override
+
+from google.adk.agents import BaseAgent, LlmAgent, ParallelAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.models.base_llm import BaseLlm
+from google.adk.utils.context_utils import Aclosing
+
+from shared.benchmark import percentile
+from shared.governor import invocation_deadline
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = '[No result: {agent} did not finish in time, so {key} is unavailable.]'
+
+# Latency samples kept per branch for the hedging threshold.
+_LATENCY_WINDOW = 200
+
+_DONE = object()
+
+
+class DeadlineParallelAgent(ParallelAgent):
+    """Runs sub-agents in parallel, bounded by deadlines and a quorum.
+
+    Attributes:
+        quorum: Branches that must finish before the agent moves on; all of
+            them when None.
+        quorum_grace: Seconds to wait for the remaining branches once the
+            quorum is reached.
+        deadline: Seconds each branch may run; None for no limit.
+        branch_deadlines: Per-branch deadlines by agent name.
+        hedge_models: Faster model per branch name for hedged requests.
+        hedge_after: Seconds before hedging; the branch's p95 when None.
+        hedge_min_samples: Runs of a branch needed before its p95 is used.
+        placeholder: Template for missing outputs, with {agent} and {key}.
+    """
+
+    quorum: Optional[int] = None
+    quorum_grace: float = 0.0
+    deadline: Optional[float] = None
+    branch_deadlines: Dict[str, float] = {}
+    hedge_models: Dict[str, Union[str, BaseLlm]] = {}
+    hedge_after: Optional[float] = None
+    hedge_min_samples: int = 20
+    placeholder: str = PLACEHOLDER
+
+    _hedge_agents: Dict[str, LlmAgent] = PrivateAttr(default_factory = dict)
+    _latencies: Dict[str, Deque[float]] = PrivateAttr(default_factory = dict)
+    _stats: Dict[str, int] = PrivateAttr(default_factory = dict)
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        for sub_agent in self.sub_agents:
+            model = self.hedge_models.get(sub_agent.name)
+            if model is not None and isinstance(sub_agent, LlmAgent):
+                self._hedge_agents[sub_agent.name] = sub_agent.clone(
+                    update = {'name': f'{sub_agent.name}Hedge', 'model': model}
+                )
+            self._latencies[sub_agent.name] = deque(maxlen = _LATENCY_WINDOW)
+        self._stats = {'runs': 0, 'hedges': 0, 'hedge_wins': 0, 'timeouts': 0,
+                      'dropped': 0, 'failures': 0}
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return self._stats
+
+    @property
+    def hedge_agents(self) -> List[LlmAgent]:
+        """Clones that serve hedged requests, one per hedged branch."""
+        return list(self._hedge_agents.values())
+
+    def _hedge_threshold(self, name: str) -> Optional[float]:
+        if name not in self._hedge_agents:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        samples = self._latencies[name]
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return percentile(list(samples), 95)
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        if not self.sub_agents:
+            return
+        self.stats['runs'] += 1
+        queue: asyncio.Queue = asyncio.Queue()
+        started = time.monotonic()
+
+        async def attempt(name: str, kind: str, agent: BaseAgent) -> None:
+            # Model calls still queued in the governor give up with the branch.
+            limit = deadlines[name] - time.monotonic() if name in deadlines else None
+            try:
+                with invocation_deadline(limit) if limit is not None else contextlib.nullcontext():
+                    async with Aclosing(agent.run_async(contexts[name])) as agen:
+                        async for event in agen:
+                            resume = asyncio.Event()
+                            await queue.put((name, kind, event, resume))
+                            # Wait until the runner has processed the event.
+                            await resume.wait()
+                await queue.put((name, kind, _DONE, None))
+            except Exception as e:
+                await queue.put((name, kind, e, None))
+
+        branches = {sub_agent.name: sub_agent for sub_agent in self.sub_agents}
+        # Same branch naming as ParallelAgent, so events stay isolated per branch.
+        prefix = f'{ctx.branch}.{self.name}' if ctx.branch else self.name
+        contexts = {
+            name: ctx.model_copy(update = {'branch': f'{prefix}.{name}'})
+            for name in branches
+        }
+        deadlines = {
+            name: started + limit for name in branches
+            if (limit := self.branch_deadlines.get(name, self.deadline)) is not None
+        }
+        # Attempts per branch: 'primary' and, once hedged, 'hedge'.
+        running: Dict[str, Dict[str, asyncio.Task]] = {
+            name: {'primary': asyncio.create_task(attempt(name, 'primary', sub_agent))}
+            for name, sub_agent in branches.items()
+        }
+        hedge_at = {
+            name: started + threshold for name in branches
+            if (threshold := self._hedge_threshold(name)) is not None
+        }
+        quorum = min(self.quorum or len(branches), len(branches))
+        finished: List[str] = []
+        quorum_at: Optional[float] = None
+
+        def stop(name: str) -> None:
+            for task in running.pop(name, {}).values():
+                task.cancel()
+
+        try:
+            while running:
+                if quorum_at is None and len(finished) >= quorum:
+                    quorum_at = time.monotonic() + self.quorum_grace
+                wake = min(
+                    [deadlines[name] for name in running if name in deadlines]
+                    + [hedge_at[name] for name in running if name in hedge_at]
+                    + ([quorum_at] if quorum_at is not None else []),
+                    default = None,
+                )
+                try:
+                    timeout = None if wake is None else max(0.0, wake - time.monotonic())
+                    name, kind, payload, resume = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    now = time.monotonic()
+                    for name in list(running):
+                        if name in deadlines and now >= deadlines[name]:
+                            logger.warning('%s: branch %s missed its deadline', self.name, name)
+                            self.stats['timeouts'] += 1
+                            self._latencies[name].append(now - started)
+                            stop(name)
+                        elif name in hedge_at and now >= hedge_at[name]:
+                            del hedge_at[name]
+                            self.stats['hedges'] += 1
+                            running[name]['hedge'] = asyncio.create_task(
+                                attempt(name, 'hedge', self._hedge_agents[name])
+                            )
+                    if quorum_at is not None and now >= quorum_at:
+                        self.stats['dropped'] += len(running)
+                        for name in list(running):
+                            stop(name)
+                    continue
+
+                if kind not in running.get(name, {}):
+                    # Left over from an attempt that was already stopped.
+                    if resume is not None:
+                        resume.set()
+                    continue
+                if payload is _DONE:
+                    if kind == 'hedge':
+                        self.stats['hedge_wins'] += 1
+                    # After a hedge win the primary would have taken at least
+                    # this long; keeping the sample stops hedges from hiding
+                    # the tail they are triggered by.
+                    self._latencies[name].append(time.monotonic() - started)
+                    finished.append(name)
+                    stop(name)
+                elif isinstance(payload, Exception):
+                    del running[name][kind]
+                    if not running[name]:
+                        logger.warning('%s: branch %s failed: %s', self.name, name, payload)
+                        self.stats['failures'] += 1
+                        del running[name]
+                else:
+                    yield payload
+                    resume.set()
+        finally:
+            tasks = [task for attempts in running.values() for task in attempts.values()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions = True)
+
+        state_delta = {
+            sub_agent.output_key: self.placeholder.format(agent = name, key = sub_agent.output_key)
+            for name, sub_agent in branches.items()
+            if name not in finished and isinstance(sub_agent, LlmAgent) and sub_agent.output_key
+        }
+        if state_delta:
+            yield Event(
+                invocation_id = ctx.invocation_id,
+                author = self.name,
+                branch = ctx.branch,
+                actions = EventActions(state_delta = state_delta),
+            )
+
+
+def _research_system(parallel: BaseAgent) -> BaseAgent:
+    from shared.fake_llm import FakeGemini
+
+    aggregator = LlmAgent(
+        name = 'AggregatorAgent', model = FakeGemini(model = 'gemini-2.5-flash'),
+        instruction = '{tech_research}\n{health_research}\n{finance_research}',
+    )
+    return SequentialAgent(name = 'ResearchSystem', sub_agents = [parallel, aggregator])
+
+
+def _researchers(stall_rate: float) -> List[LlmAgent]:
+    """Fake researchers: lite branches take 50-150ms, the finance branch
+    100-300ms and, in `stall_rate` of its runs, up to 2s."""
+    from shared.fake_llm import FakeGemini, FakeTurn
+
+    def finance(llm_request: Any) -> FakeTurn:
+        delay = random.uniform(0.1, 0.3)
+        if random.random() < stall_rate:
+            delay += random.uniform(0.5, 1.7)
+        return FakeTurn(text = 'Finance report', delay = delay)
+
+    lite = {'latency': 0.05, 'jitter': 0.1}
+    return [
+        LlmAgent(name = 'TechResearcher', instruction = 'Research.', output_key = 'tech_research',
+                 model = FakeGemini(model = 'gemini-2.5-flash-lite', **lite)),
+        LlmAgent(name = 'HealthResearcher', instruction = 'Research.',
+                 output_key = 'health_research',
+                 model = FakeGemini(model = 'gemini-2.5-flash-lite', **lite)),
+        LlmAgent(name = 'FinanceResearcher', instruction = 'Research.',
+                 output_key = 'finance_research',
+                 model = FakeGemini(model = 'gemini-2.5-flash', responder = finance)),
+    ]
+
+
+async def _measure(agent: BaseAgent, runs: int) -> Dict[str, float]:
+    from google.adk.runners import InMemoryRunner
+
+    runner = InMemoryRunner(agent = agent, app_name = 'parallel_researcher')
+    durations = []
+    for _ in range(runs):
+        session = await runner.session_service.create_session(
+            app_name = 'parallel_researcher', user_id = 'bench'
+        )
+        message = types.Content(role = 'user', parts = [types.Part(text = 'Research')])
+        t0 = time.perf_counter()
+        async for _ in runner.run_async(user_id = 'bench', session_id = session.id,
+                                        new_message = message):
+            pass
+        durations.append(time.perf_counter() - t0)
+    return {
+        'p50_s': round(percentile(durations, 50), 3),
+        'p95_s': round(percentile(durations, 95), 3),
+        'p99_s': round(percentile(durations, 99), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'ParallelAgent versus DeadlineParallelAgent')
+    parser.add_argument('--runs', type = int, default = 200)
+    parser.add_argument('--stall-rate', type = float, default = 0.03)
+    parser.add_argument('--deadline', type = float, default = 1.0)
+    parser.add_argument('--quorum', type = int, default = None)
+    parser.add_argument('--seed', type = int, default = 7)
+    args = parser.parse_args()
+
+    from shared.fake_llm import FakeGemini
+
+    baseline = ParallelAgent(name = 'ParallelResearcher', sub_agents = _researchers(args.stall_rate))
+    deadline = DeadlineParallelAgent(
+        name = 'ParallelResearcher',
+        sub_agents = _researchers(args.stall_rate),
+        deadline = args.deadline,
+        quorum = args.quorum,
+        hedge_models = {
+            'FinanceResearcher': FakeGemini(model = 'gemini-2.5-flash-lite', latency = 0.05,
+                                            jitter = 0.1),
+        },
+        hedge_min_samples = 10,
+    )
+    for parallel in (baseline, deadline):
+        random.seed(args.seed)
+        result = asyncio.run(_measure(_research_system(parallel), args.runs))
+        print({'agent': type(parallel).__name__, **result, **getattr(parallel, 'stats', {})})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""Concurrent runner for `*.evalset.json` files with latency reporting.
+
+`adk eval` replays an evalset one case at a time against the live model. This
+runner loads an evalset with ADK's `EvalSet` model and runs its cases, each
+`--repeat` times, on a bounded pool of `--workers` concurrent sessions. The
+backend is either the package's configured models ('live') or `FakeGemini`
+('stub'). Every run records per-turn latency, tokens and tool calls per case.
+A `TracingPlugin` collects the per-agent breakdown, which also covers agents
+run through AgentTools.
+
+    python -m shared.eval_runner parallel_researcher/ResearchTest.evalset.json \\
+        --backend stub --workers 8 --repeat 20 --json eval.json
+
+The report uses the benchmark's `results` layout, so `--baseline` gates on
+the same p95 regression check as `shared.benchmark`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from google.adk.evaluation.eval_case import EvalCase
+from google.adk.evaluation.eval_set import EvalSet
+from google.adk.runners import InMemoryRunner
+
+from .benchmark import DEFAULT_TOOL_ARGS, compare_to_baseline, load_root_agent, percentile
+from .fake_llm import use_fake_model
+from .tracing import TracingPlugin, summarize
+
+BACKENDS = ('stub', 'live')
+
+
+def load_evalset(path: str) -> EvalSet:
+    with open(path, encoding = 'utf-8') as f:
+        return EvalSet.model_validate_json(f.read())
+
+
+def package_of(path: str) -> str:
+    """Agent package an evalset belongs to: the directory that holds it."""
+    return os.path.basename(os.path.dirname(os.path.abspath(path)))
+
+
+async def run_case(runner: InMemoryRunner, case: EvalCase, repeat: int) -> Dict[str, Any]:
+    """Replays every turn of one case in a fresh session."""
+    session_input = case.session_input
+    user_id = session_input.user_id if session_input else 'eval_user'
+    session = await runner.session_service.create_session(
+        app_name = runner.app_name,
+        user_id = user_id,
+        state = dict(session_input.state) if session_input else None,
+    )
+    result = {
+        'eval_id': case.eval_id, 'repeat': repeat, 'turn_ms': [], 'model_calls': 0,
+        'tool_calls': 0, 'prompt_tokens': 0, 'output_tokens': 0, 'empty_responses': 0,
+    }
+    try:
+        for invocation in case.conversation or []:
+            final_text = ''
+            started = time.perf_counter()
+            async for event in runner.run_async(
+                user_id = user_id, session_id = session.id, new_message = invocation.user_content
+            ):
+                if event.usage_metadata:
+                    result['model_calls'] += 1
+                    result['prompt_tokens'] += event.usage_metadata.prompt_token_count or 0
+                    result['output_tokens'] += event.usage_metadata.candidates_token_count or 0
+                result['tool_calls'] += len(event.get_function_calls())
+                if event.is_final_response() and event.content and event.content.parts:
+                    final_text = ''.join(part.text or '' for part in event.content.parts)
+            result['turn_ms'].append(round((time.perf_counter() - started) * 1000, 3))
+            result['empty_responses'] += not final_text.strip()
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    return result
+
+
+async def run_evalset(
+        path: str,
+        backend: str = 'stub',
+        workers: int = 8,
+        repeat: int = 1,
+        latency: float = 0.0,
+        package: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Runs every case of an evalset `repeat` times on `workers` sessions."""
+    evalset = load_evalset(path)
+    package = package or package_of(path)
+    if backend == 'stub':
+        # Offline runs use the local MCP stand-in instead of npx.
+        os.environ.setdefault('MCP_IMAGE_SERVER', 'stub')
+    root_agent = load_root_agent(package)
+    trace_dir = tempfile.mkdtemp(prefix = 'evalrun.')
+    tracing = TracingPlugin(path = os.path.join(trace_dir, 'traces.jsonl'))
+    runner = InMemoryRunner(agent = root_agent, app_name = package, plugins = [tracing])
+    semaphore = asyncio.Semaphore(workers)
+
+    async def bounded(case: EvalCase, k: int) -> Dict[str, Any]:
+        async with semaphore:
+            return await run_case(runner, case, k)
+
+    jobs = [bounded(case, k) for k in range(repeat) for case in evalset.eval_cases]
+    started = time.perf_counter()
+    if backend == 'stub':
+        with use_fake_model(root_agent, latency = latency, tool_args = DEFAULT_TOOL_ARGS):
+            cases = await asyncio.gather(*jobs)
+    else:
+        cases = await asyncio.gather(*jobs)
+    wall = time.perf_counter() - started
+
+    tracing.close()
+    with open(tracing.path, encoding = 'utf-8') as f:
+        spans = [json.loads(line) for line in f if line.strip()]
+    os.remove(tracing.path)
+    os.rmdir(trace_dir)
+
+    turns = [ms for case in cases for ms in case['turn_ms']]
+    agents = summarize(spans)
+    name = evalset.eval_set_id
+    results = [{
+        'package': name,
+        'turns': len(turns),
+        'p50_ms': round(percentile(turns, 50), 3),
+        'p95_ms': round(percentile(turns, 95), 3),
+        'p99_ms': round(percentile(turns, 99), 3),
+    }]
+    # Per-agent rows reuse the benchmark layout so the baseline check covers them.
+    results += [
+        {'package': f'{name}:{agent}', 'p50_ms': row['p50_ms'], 'p95_ms': row['p95_ms']}
+        for agent, row in agents.items()
+    ]
+    return {
+        'evalset': name,
+        'package': package,
+        'backend': backend,
+        'latency_s': latency if backend == 'stub' else None,
+        'workers': workers,
+        'repeat': repeat,
+        'wall_s': round(wall, 3),
+        'cases_per_s': round(len(cases) / wall, 2) if wall else 0.0,
+        'errors': sum('error' in case for case in cases),
+        'results': results,
+        'agents': agents,
+        'cases': cases,
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    overall = report['results'][0]
+    print(
+        f"{report['evalset']} ({report['backend']}): {len(report['cases'])} runs in "
+        f"{report['wall_s']:.2f}s, {report['cases_per_s']} runs/s, {report['errors']} errors; "
+        f"turn p50 {overall['p50_ms']:.1f}ms p95 {overall['p95_ms']:.1f}ms p99 {overall['p99_ms']:.1f}ms"
+    )
+    header = f"{'agent':<28}{'runs':>7}{'p50 ms':>10}{'p95 ms':>10}{'calls':>7}{'tools':>7}{'tokens in':>11}{'out':>8}"
+    print(header)
+    print('-' * len(header))
+    for agent, row in report['agents'].items():
+        print(
+            f"{agent:<28}{row['runs']:>7}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+            f"{row['model_calls']:>7}{row['tool_calls']:>7}{row['prompt_tokens']:>11}"
+            f"{row['output_tokens']:>8}"
+        )
+    for case in report['cases']:
+        if 'error' in case:
+            print(f"{case['eval_id']}#{case['repeat']}  error: {case['error']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description = 'Run an evalset concurrently and report latency')
+    parser.add_argument('evalset', help = 'Path to a *.evalset.json file')
+    parser.add_argument('--package', help = 'Agent package (default: the evalset directory)')
+    parser.add_argument('--backend', choices = BACKENDS, default = 'stub')
+    parser.add_argument('--workers', type = int, default = 8)
+    parser.add_argument('--repeat', type = int, default = 1, help = 'Runs per case')
+    parser.add_argument('--latency', type = float, default = 0.0,
+                        help = 'Simulated model latency in seconds for the stub backend')
+    parser.add_argument('--json', help = 'Write the report to this file')
+    parser.add_argument('--baseline', help = 'Report to compare p95 latency against')
+    parser.add_argument('--tolerance', type = float, default = 0.2,
+                        help = 'Allowed relative p95 regression (default 0.2)')
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_evalset(
+        args.evalset, backend = args.backend, workers = args.workers, repeat = args.repeat,
+        latency = args.latency, package = args.package,
+    ))
+    _print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent = 2)
+
+    status = 1 if report['errors'] else 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report['results'], json.load(f), args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""Offline stand-in for Gemini used to benchmark agents without the live API.
+
+`FakeGemini` keeps the model name of the client it replaces, so built-in tools
+such as `google_search` still configure the request as they would for the real
+model, but it never leaves the process. Replies come from a script of
+`FakeTurn`s, a responder callable, or the default tool-calling behaviour.
+"""
+
+import asyncio
+import contextlib
+import random
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Callable, Dict, Iterator, List, Optional, Union
+
+from google.genai import types
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools import AgentTool
+
+# Placeholder argument per JSON schema type when a tool is called without
+# canned arguments.
+_PLACEHOLDERS = {
+    types.Type.STRING: 'test',
+    types.Type.INTEGER: 1,
+    types.Type.NUMBER: 1.0,
+    types.Type.BOOLEAN: True,
+    types.Type.ARRAY: [],
+    types.Type.OBJECT: {},
+}
+
+# Needs a real agent name, so it is only called when `tool_args` provides one.
+_TRANSFER_TOOL = 'transfer_to_agent'
+
+
+@dataclass
+class FakeTurn:
+    """One scripted model reply.
+
+    Attributes:
+        text: Text part of the reply, if any.
+        function_calls: (name, args) pairs to emit as function calls.
+        delay: Seconds to sleep before replying; overrides the model latency.
+    """
+    text: Optional[str] = None
+    function_calls: List[tuple] = field(default_factory=list)
+    delay: Optional[float] = None
+
+
+Responder = Callable[[LlmRequest], Optional[FakeTurn]]
+
+
+def _placeholder_args(declaration: types.FunctionDeclaration) -> Dict[str, Any]:
+    schema = declaration.parameters
+    if schema is None or not schema.properties:
+        return {}
+    return {
+        name: _PLACEHOLDERS.get(prop.type, 'test')
+        for name, prop in schema.properties.items()
+    }
+
+
+def _declarations(llm_request: LlmRequest) -> List[types.FunctionDeclaration]:
+    declarations = []
+    for tool in (llm_request.config.tools or []) if llm_request.config else []:
+        if isinstance(tool, types.Tool) and tool.function_declarations:
+            declarations.extend(tool.function_declarations)
+    return declarations
+
+
+def _called_this_turn(llm_request: LlmRequest) -> set:
+    """Names of functions already called since the last user text message."""
+    called = set()
+    for content in reversed(llm_request.contents):
+        parts = content.parts or []
+        if content.role == 'user' and any(part.text for part in parts):
+            break
+        for part in parts:
+            if part.function_call:
+                called.add(part.function_call.name)
+    return called
+
+
+def _estimate_tokens(contents: List[types.Content]) -> int:
+    chars = 0
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            elif part.function_call or part.function_response:
+                chars += len(str(part.function_call or part.function_response))
+    return max(1, chars // 4)
+
+
+class FakeGemini(BaseLlm):
+    """Scriptable local model that mimics a Gemini client.
+
+    Without a script or responder the model calls every declared function once
+    per user turn (using `tool_args` or schema placeholders) and then answers
+    with a short text, which exercises the tool-calling path of each agent.
+    `transfer_to_agent` is only called when `tool_args` names the target.
+
+    Attributes:
+        script: Replies returned in order; the default behaviour resumes once
+            the script is exhausted.
+        responder: Callable returning the reply for a request. Takes precedence
+            over the script when it returns a turn.
+        latency: Base delay in seconds applied to every reply.
+        jitter: Extra uniform random delay in seconds on top of `latency`.
+        tool_args: Canned arguments per function name for the default
+            behaviour.
+        parallel_tool_calls: Emit all pending function calls in one reply.
+        stream_chunks: Partial responses a text reply is split into when the
+            request streams; the delay is spread evenly across them.
+        reply_text: Text of the final default reply.
+        calls: Number of requests served so far.
+    """
+
+    script: List[FakeTurn] = []
+    responder: Optional[Responder] = None
+    latency: float = 0.0
+    jitter: float = 0.0
+    tool_args: Dict[str, Dict[str, Any]] = {}
+    parallel_tool_calls: bool = False
+    stream_chunks: int = 1
+    reply_text: str = 'OK'
+    calls: int = 0
+
+    def _next_turn(self, llm_request: LlmRequest) -> FakeTurn:
+        if self.responder is not None:
+            turn = self.responder(llm_request)
+            if turn is not None:
+                return turn
+        if self.calls < len(self.script):
+            return self.script[self.calls]
+
+        called = _called_this_turn(llm_request)
+        pending = [
+            (decl.name, self.tool_args.get(decl.name, _placeholder_args(decl)))
+            for decl in _declarations(llm_request)
+            if decl.name not in called
+            and (decl.name != _TRANSFER_TOOL or decl.name in self.tool_args)
+        ]
+        if pending:
+            return FakeTurn(
+                function_calls = pending if self.parallel_tool_calls else pending[:1]
+            )
+        return FakeTurn(text = self.reply_text)
+
+    async def generate_content_async(
+            self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        turn = self._next_turn(llm_request)
+        self.calls += 1
+
+        delay = turn.delay if turn.delay is not None else self.latency
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+
+        if stream and turn.text and not turn.function_calls and self.stream_chunks > 1:
+            words = turn.text.split(' ')
+            size = -(-len(words) // self.stream_chunks)
+            for start in range(0, len(words), size):
+                await asyncio.sleep(delay * size / len(words))
+                chunk = ' '.join(words[start:start + size])
+                if start + size < len(words):
+                    chunk += ' '
+                yield LlmResponse(
+                    content = types.Content(role = 'model', parts = [types.Part(text = chunk)]),
+                    partial = True,
+                )
+            delay = 0.0
+        await asyncio.sleep(delay)
+
+        parts = []
+        if turn.text is not None:
+            parts.append(types.Part(text = turn.text))
+        for name, args in turn.function_calls:
+            parts.append(types.Part(
+                function_call = types.FunctionCall(name = name, args = dict(args))
+            ))
+
+        prompt_tokens = _estimate_tokens(llm_request.contents)
+        output_tokens = max(1, len(turn.text or '') // 4)
+        yield LlmResponse(
+            content = types.Content(role = 'model', parts = parts),
+            usage_metadata = types.GenerateContentResponseUsageMetadata(
+                prompt_token_count = prompt_tokens,
+                candidates_token_count = output_tokens,
+                total_token_count = prompt_tokens + output_tokens,
+            ),
+            turn_complete = True,
+        )
+
+
+def iter_llm_agents(agent: BaseAgent) -> Iterator[LlmAgent]:
+    """Yields every LlmAgent reachable from `agent`, including AgentTool targets."""
+    seen = set()
+    stack = [agent]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        stack.extend(current.sub_agents)
+        # Standby clones, e.g. DeadlineParallelAgent's hedge agents.
+        stack.extend(getattr(current, 'hedge_agents', []))
+        if isinstance(current, LlmAgent):
+            yield current
+            stack.extend(
+                tool.agent for tool in current.tools if isinstance(tool, AgentTool)
+            )
+
+
+@contextlib.contextmanager
+def use_fake_model(
+        agent: BaseAgent,
+        scripts: Optional[Dict[str, List[FakeTurn]]] = None,
+        **fake_kwargs: Any,
+) -> Iterator[Dict[str, FakeGemini]]:
+    """Temporarily swaps every model in an agent graph for a `FakeGemini`.
+
+    Args:
+        agent: Root of the agent graph, e.g. a package's `root_agent`.
+        scripts: Optional scripted replies keyed by agent name.
+        **fake_kwargs: Extra `FakeGemini` fields applied to every fake.
+
+    Yields:
+        Dictionary mapping agent name to the fake model serving it. Agents
+        that share a name get their own fakes, keyed `name#2`, `name#3`, ...
+    """
+    # Keyed by identity, since distinct agents may share a name.
+    originals: Dict[int, tuple] = {}
+    fakes: Dict[str, FakeGemini] = {}
+    for llm_agent in iter_llm_agents(agent):
+        model: Union[str, BaseLlm] = llm_agent.model
+        model_name = model if isinstance(model, str) else model.model
+        fake = FakeGemini(
+            model = model_name or 'gemini-2.5-flash-lite',
+            script = list((scripts or {}).get(llm_agent.name, [])),
+            **fake_kwargs,
+        )
+        originals[id(llm_agent)] = (llm_agent, model)
+        key, n = llm_agent.name, 1
+        while key in fakes:
+            n += 1
+            key = f'{llm_agent.name}#{n}'
+        fakes[key] = fake
+        llm_agent.model = fake
+    try:
+        yield fakes
+    finally:
+        for llm_agent, model in originals.values():
+            llm_agent.model = model
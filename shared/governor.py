@@ -0,0 +1,395 @@
+"""Process-wide rate limiter and retry governor for Gemini calls.
+
+Each agent used to carry its own `HttpRetryOptions(attempts=5, exp_base=7)`,
+so one bad minute could park a request for 1+7+49+343 seconds while every
+client retried on its own. `GovernedGemini` turns SDK retries off and routes
+all calls through the shared `governor`, which
+
+- caps the number of in-flight model calls across the process,
+- sends requests without a client-side rate limit until the API answers 429,
+  then paces that model at half its recent request rate and lifts the limit
+  again as calls succeed; a model can also be given a fixed requests per
+  minute budget, which the adaptive rate never exceeds,
+- retries 429/5xx with full-jitter exponential backoff, bounded by a deadline
+  when one is set,
+- records queue wait time separately from model time.
+
+Usage:
+
+    model = GovernedGemini(model = 'gemini-2.5-flash-lite')
+
+    with invocation_deadline(30):
+        async for event in runner.run_async(...):
+            ...
+
+    governor.metrics()
+
+`DeadlineParallelAgent` sets an `invocation_deadline` for each branch with a
+deadline, so its queued calls give up when the branch does.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import os
+import random
+import time
+import weakref
+from collections import deque
+from typing import Any, AsyncGenerator, Callable, Deque, Dict, Iterator, Optional
+
+from google.genai import errors, types
+
+from google.adk.models.google_llm import Gemini
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+# Fixed requests-per-minute budgets per model. There are none by default, so
+# models run at whatever rate the API accepts. Set them per deployment with
+# e.g. GEMINI_MODEL_RPM='gemini-2.5-flash=10,gemini-2.5-flash-lite=15' (the
+# free-tier quotas), or for every other model with GEMINI_DEFAULT_RPM.
+MODEL_RPM: Dict[str, float] = {}
+DEFAULT_RPM: Optional[float] = (
+    float(os.environ['GEMINI_DEFAULT_RPM']) if os.environ.get('GEMINI_DEFAULT_RPM') else None
+)
+
+
+def _rpm_overrides(spec: str) -> Dict[str, float]:
+    """Parses 'model=rpm,model=rpm' into a dict."""
+    overrides = {}
+    for item in spec.split(','):
+        if item.strip():
+            model, _, rpm = item.partition('=')
+            overrides[model.strip()] = float(rpm)
+    return overrides
+
+
+MODEL_RPM.update(_rpm_overrides(os.environ.get('GEMINI_MODEL_RPM', '')))
+
+RETRYABLE_STATUS_CODES = (429, 500, 503, 504)
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    'governor_deadline', default = None
+)
+
+# Metrics of the current model call, installed by a tracer such as
+# shared.tracing.TracingPlugin; the governor adds queue wait and attempts.
+current_call: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    'governor_current_call', default = None
+)
+
+
+@contextlib.contextmanager
+def invocation_deadline(seconds: float) -> Iterator[None]:
+    """Bounds queueing and retries of every model call made inside the block.
+
+    Tasks spawned inside the block (e.g. ParallelAgent branches) inherit it.
+    """
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a model call cannot be admitted or retried before its deadline."""
+
+
+class _TokenBucket:
+    """Token bucket whose refill rate is halved on 429s and regrown on success.
+
+    With no `rpm` the bucket starts unlimited. The first 429 limits it to
+    half the request rate of the last minute. Each success then raises the
+    rate by a quarter, and the limit is lifted once the rate is back above
+    the rate that drew the 429. With an `rpm`, the rate never exceeds it.
+    """
+
+    # Multiplicative increase per successful call after a 429.
+    RECOVERY = 1.25
+    # Lowest rate a 429 can push the bucket to, in requests per second.
+    MIN_RATE = 1 / 60
+
+    def __init__(self, rpm: Optional[float]):
+        self.max_rate = rpm / 60.0 if rpm else None
+        self.rate = self.max_rate
+        self.ceiling = self.max_rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.last_throttle = 0.0
+        # Admission times of the last minute, to measure the unlimited rate.
+        self.recent: Deque[float] = deque()
+
+    @property
+    def capacity(self) -> float:
+        # About ten seconds of burst at the current rate.
+        return max(1.0, (self.rate or 0.0) * 10)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Takes a token and returns how long the caller must wait for it."""
+        now = time.monotonic()
+        self.recent.append(now)
+        while self.recent[0] < now - 60:
+            self.recent.popleft()
+        if self.rate is None:
+            return 0.0
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def throttle(self) -> None:
+        # A burst of 429s from concurrent calls counts as one congestion signal.
+        now = time.monotonic()
+        if now - self.last_throttle < 1.0:
+            return
+        self.last_throttle = now
+        if self.rate is None:
+            # Requests of the last minute, spread over the time they took.
+            span = max(1.0, now - self.recent[0]) if self.recent else 60.0
+            self.ceiling = len(self.recent) / span
+            self.rate = self.ceiling
+            self.tokens = 0.0
+            self.updated = now
+        self._refill(now)
+        self.rate = max(self.MIN_RATE, self.rate / 2)
+        # Queued reservations keep their place; only the burst allowance shrinks.
+        self.tokens = min(self.tokens, self.capacity)
+
+    def recover(self) -> None:
+        if self.rate is None:
+            return
+        self._refill(time.monotonic())
+        self.rate *= self.RECOVERY
+        if self.max_rate is not None:
+            self.rate = min(self.max_rate, self.rate)
+        elif self.rate >= self.ceiling:
+            self.rate = None
+
+
+class _ModelStats:
+
+    def __init__(self, window: int = 1024):
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.queue_wait: Deque[float] = deque(maxlen = window)
+        self.model_time: Deque[float] = deque(maxlen = window)
+        self.backoff_time = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        def pct(values, q):
+            if not values:
+                return 0.0
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+        return {
+            'requests': self.requests,
+            'attempts': self.attempts,
+            'retries': self.retries,
+            'throttled_429': self.throttled,
+            'failures': self.failures,
+            'queue_wait_p50_s': round(pct(self.queue_wait, 50), 4),
+            'queue_wait_p95_s': round(pct(self.queue_wait, 95), 4),
+            'model_time_p50_s': round(pct(self.model_time, 50), 4),
+            'model_time_p95_s': round(pct(self.model_time, 95), 4),
+            'backoff_total_s': round(self.backoff_time, 3),
+        }
+
+
+class RetryGovernor:
+    """Shares rate limits, concurrency and retry budget across all models.
+
+    Args:
+        max_concurrency: Maximum model calls in flight in the process.
+        max_attempts: Attempts per call, including the first one.
+        base_delay: First backoff ceiling in seconds; doubles per retry.
+        max_delay: Upper bound for a single backoff sleep.
+        default_deadline: Seconds a call may spend queueing and retrying when
+            no `invocation_deadline` is active; None for no limit.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = 8,
+            max_attempts: int = 5,
+            base_delay: float = 1.0,
+            max_delay: float = 20.0,
+            default_deadline: Optional[float] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.default_deadline = default_deadline
+        self._rpm = dict(MODEL_RPM)
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._stats: Dict[str, _ModelStats] = {}
+        # asyncio primitives are bound to the loop they are first used on.
+        self._semaphores: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def configure(self, model: str, rpm: Optional[float]) -> None:
+        """Sets the requests-per-minute budget for a model; None for no cap."""
+        self._rpm[model] = rpm
+        self._buckets.pop(model, None)
+
+    def _bucket(self, model: str) -> _TokenBucket:
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            bucket = self._buckets[model] = _TokenBucket(self._rpm.get(model, DEFAULT_RPM))
+        return bucket
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def stats(self, model: str) -> _ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = _ModelStats()
+        return stats
+
+    def deadline(self) -> Optional[float]:
+        deadline = _deadline.get()
+        if deadline is None and self.default_deadline is not None:
+            deadline = time.monotonic() + self.default_deadline
+        return deadline
+
+    @contextlib.asynccontextmanager
+    async def admit(self, model: str,
+                    deadline: Optional[float]) -> AsyncGenerator[Callable[[], None], None]:
+        """Waits for a rate token and a concurrency slot, then holds the slot.
+
+        Yields a function that releases the slot early. Callers must release
+        it before handing control back to the framework: ADK runs tools, and
+        the nested model calls of AgentTools, while the model generator is
+        suspended, so a slot held across a yield can deadlock the process.
+        """
+        started = time.monotonic()
+        bucket = self._bucket(model)
+        wait = bucket.reserve()
+        if deadline is not None and started + wait > deadline:
+            bucket.tokens += 1
+            self.stats(model).failures += 1
+            raise DeadlineExceeded(f'Rate limit wait for {model} exceeds the deadline')
+        if wait:
+            await asyncio.sleep(wait)
+        semaphore = self._semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(),
+                                   None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.stats(model).failures += 1
+            raise DeadlineExceeded(f'No free model slot for {model} before the deadline')
+        waited = time.monotonic() - started
+        self.stats(model).queue_wait.append(waited)
+        call = current_call.get()
+        if call is not None:
+            call['queue_wait_s'] = call.get('queue_wait_s', 0.0) + waited
+            call['attempts'] = call.get('attempts', 0) + 1
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                semaphore.release()
+
+        try:
+            yield release
+        finally:
+            release()
+
+    def backoff(self, attempt: int, deadline: Optional[float]) -> Optional[float]:
+        """Full-jitter delay before retry `attempt`, or None if out of budget."""
+        if attempt + 1 >= self.max_attempts:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def record_success(self, model: str, elapsed: float) -> None:
+        self.stats(model).model_time.append(elapsed)
+        self._bucket(model).recover()
+
+    def record_error(self, model: str, code: Optional[int]) -> None:
+        stats = self.stats(model)
+        if code == 429:
+            stats.throttled += 1
+            self._bucket(model).throttle()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-model counters plus queue wait versus model time percentiles."""
+        return {
+            model: {
+                **stats.summary(),
+                'current_rpm': (None if self._bucket(model).rate is None
+                                else round(self._bucket(model).rate * 60, 2)),
+            }
+            for model, stats in self._stats.items()
+        }
+
+
+governor = RetryGovernor(
+    max_concurrency = int(os.environ.get('GEMINI_MAX_CONCURRENCY', 8)),
+)
+
+
+class GovernedGemini(Gemini):
+    """Gemini client whose calls are admitted and retried by the shared governor.
+
+    SDK-level retries are disabled so a throttled request backs off once,
+    process-wide, instead of once per client.
+    """
+
+    retry_options: Optional[types.HttpRetryOptions] = types.HttpRetryOptions(attempts = 1)
+
+    async def generate_content_async(
+            self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        model = llm_request.model or self.model
+        stats = governor.stats(model)
+        stats.requests += 1
+        deadline = governor.deadline()
+        attempt = 0
+        while True:
+            async with governor.admit(model, deadline) as release:
+                stats.attempts += 1
+                started = time.monotonic()
+                elapsed = None
+                try:
+                    async for llm_response in super().generate_content_async(llm_request, stream):
+                        elapsed = time.monotonic() - started
+                        # The slot covers the request until its first response;
+                        # the rest of a stream reads from the open connection.
+                        release()
+                        yield llm_response
+                except errors.APIError as e:
+                    governor.record_error(model, e.code)
+                    retryable = e.code in RETRYABLE_STATUS_CODES and elapsed is None
+                    delay = governor.backoff(attempt, deadline) if retryable else None
+                    if delay is None:
+                        stats.failures += 1
+                        raise
+                finally:
+                    # Also runs when the caller stops consuming after a response.
+                    if elapsed is not None:
+                        governor.record_success(model, elapsed)
+                if elapsed is not None:
+                    return
+            stats.retries += 1
+            stats.backoff_time += delay
+            await asyncio.sleep(delay)
+            attempt += 1
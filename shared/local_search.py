@@ -0,0 +1,326 @@
+"""Offline full-text search backend and cached search tools.
+
+The built-in `google_search` tool is grounding performed by the model, so it
+cannot run air-gapped and its results cannot be cached. `search_tool` returns
+a drop-in tool for one of three backends, chosen by `SEARCH_BACKEND`:
+
+- 'live' (default): the built-in `google_search`, unchanged.
+- 'local': a SQLite FTS5 corpus, ranked with BM25 and returning snippets.
+- 'cached': the Custom Search JSON API (`GOOGLE_SEARCH_API_KEY` and
+  `GOOGLE_SEARCH_ENGINE_ID`) with past results served from the cache.
+
+The local and cached tools are functions named `google_search`, so
+instructions that mention the tool keep working. Both keep past query
+results in SQLite with an in-process LRU in front. The tools are coroutines
+that run index queries and API requests in worker threads, so a slow search
+does not stall the event loop.
+
+Build and query a corpus with:
+
+    python -m shared.local_search ingest corpus.jsonl
+    python -m shared.local_search search "quantum cryptography"
+    python -m shared.local_search bench --synthetic 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+DEFAULT_INDEX_PATH = 'search_index.db'
+BACKENDS = ('live', 'local', 'cached')
+CUSTOM_SEARCH_URL = 'https://www.googleapis.com/customsearch/v1'
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    title, body, url UNINDEXED, published UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS query_cache (
+    key TEXT PRIMARY KEY,
+    results TEXT NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# BM25 weight of a title match relative to a body match.
+TITLE_WEIGHT = 5.0
+
+
+def normalize_query(query: str) -> str:
+    return ' '.join(_TOKEN_RE.findall(query.lower()))
+
+
+def _match_expression(query: str) -> str:
+    """FTS5 query matching any of the terms; BM25 ranks documents with more first."""
+    return ' OR '.join(f'"{token}"' for token in normalize_query(query).split())
+
+
+class SearchIndex:
+    """FTS5 corpus plus a persistent cache of query results.
+
+    Args:
+        db_path: SQLite file, or ':memory:' for a process-local index.
+        cache_ttl: Seconds a cached result list stays valid; None never expires.
+        memory_entries: Capacity of the in-process LRU in front of the cache.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH, cache_ttl: Optional[float] = 24 * 3600,
+                 memory_entries: int = 4096):
+        self.cache_ttl = cache_ttl
+        self.memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._memory_lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread = False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.stats = {'searches': 0, 'memory_hits': 0, 'cache_hits': 0, 'misses': 0}
+
+    # ---- corpus ----
+
+    def ingest(self, documents: Iterable[Dict[str, Any]], batch_size: int = 1000) -> int:
+        """Adds documents with 'title', 'body' (or 'text'/'content'), 'url'.
+
+        Cached query results are cleared, since rankings may change.
+        """
+        count = 0
+        batch = []
+        with self._lock:
+            with self._conn:
+                for doc in documents:
+                    batch.append((
+                        str(doc.get('title') or ''),
+                        str(doc.get('body') or doc.get('text') or doc.get('content') or ''),
+                        str(doc.get('url') or ''),
+                        str(doc.get('published') or ''),
+                    ))
+                    if len(batch) >= batch_size:
+                        self._conn.executemany('INSERT INTO documents VALUES (?, ?, ?, ?)', batch)
+                        count += len(batch)
+                        batch.clear()
+                if batch:
+                    self._conn.executemany('INSERT INTO documents VALUES (?, ?, ?, ?)', batch)
+                    count += len(batch)
+                self._conn.execute('DELETE FROM query_cache')
+        with self._memory_lock:
+            self._memory.clear()
+        return count
+
+    def ingest_jsonl(self, path: str, batch_size: int = 1000) -> int:
+        """Streams a JSONL file into the corpus, one document per line."""
+        with open(path, encoding = 'utf-8') as f:
+            return self.ingest((json.loads(line) for line in f if line.strip()), batch_size)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT count(*) FROM documents').fetchone()[0]
+
+    # ---- query cache ----
+
+    def cached(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        now = time.time()
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is not None and (self.cache_ttl is None or now - entry[0] < self.cache_ttl):
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return entry[1]
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT results, created_at FROM query_cache WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None or (self.cache_ttl is not None and now - row[1] >= self.cache_ttl):
+            return None
+        results = json.loads(row[0])
+        self._remember(key, row[1], results)
+        self.stats['cache_hits'] += 1
+        return results
+
+    def store(self, key: str, results: List[Dict[str, Any]]) -> None:
+        now = time.time()
+        self._remember(key, now, results)
+        with self._lock:
+            with self._conn:
+                self._conn.execute('INSERT OR REPLACE INTO query_cache VALUES (?, ?, ?)',
+                                   (key, json.dumps(results), now))
+
+    def _remember(self, key: str, created_at: float, results: List[Dict[str, Any]]) -> None:
+        with self._memory_lock:
+            self._memory[key] = (created_at, results)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last = False)
+
+    # ---- search ----
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Best `limit` documents for `query` with highlighted snippets."""
+        self.stats['searches'] += 1
+        expression = _match_expression(query)
+        if not expression:
+            return []
+        key = f'local:{limit}:{normalize_query(query)}'
+        results = self.cached(key)
+        if results is not None:
+            return results
+        self.stats['misses'] += 1
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT title, url, snippet(documents, 1, \'**\', \'**\', \'...\', 32),'
+                f' bm25(documents, {TITLE_WEIGHT}, 1.0) AS rank'
+                ' FROM documents WHERE documents MATCH ? ORDER BY rank LIMIT ?',
+                (expression, limit),
+            ).fetchall()
+        # FTS5's bm25() is negative; larger magnitudes are better matches.
+        results = [
+            {'title': title, 'url': url, 'snippet': snippet, 'score': round(-rank, 4)}
+            for title, url, snippet, rank in rows
+        ]
+        self.store(key, results)
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def custom_search(query: str, limit: int = 5, timeout: float = 10.0) -> List[Dict[str, Any]]:
+    """Live results from the Custom Search JSON API."""
+    params = urllib.parse.urlencode({
+        'key': os.environ['GOOGLE_SEARCH_API_KEY'],
+        'cx': os.environ['GOOGLE_SEARCH_ENGINE_ID'],
+        'q': query,
+        'num': min(max(limit, 1), 10),
+    })
+    with urllib.request.urlopen(f'{CUSTOM_SEARCH_URL}?{params}', timeout = timeout) as response:
+        items = json.load(response).get('items', [])
+    return [
+        {'title': item.get('title', ''), 'url': item.get('link', ''),
+         'snippet': item.get('snippet', '')}
+        for item in items
+    ]
+
+
+def search_function(
+        index: SearchIndex, backend: str = 'local'
+) -> Callable[..., Awaitable[Dict[str, Any]]]:
+    """An async `google_search(query)` function served by the index or the cached live API."""
+
+    async def google_search(query: str, num_results: int = 5) -> Dict[str, Any]:
+        """Searches the web and returns the most relevant pages for the query.
+
+        Args:
+            query: Search query
+            num_results: Number of results to return (1-10)
+
+        Returns:
+            Dictionary with 'results', each with 'title', 'url' and 'snippet'
+        """
+        limit = min(max(int(num_results), 1), 10)
+        try:
+            if backend == 'local':
+                results = await asyncio.to_thread(index.search, query, limit)
+            else:
+                key = f'live:{limit}:{normalize_query(query)}'
+                results = await asyncio.to_thread(index.cached, key)
+                if results is None:
+                    index.stats['misses'] += 1
+                    results = await asyncio.to_thread(custom_search, query, limit)
+                    await asyncio.to_thread(index.store, key, results)
+        except Exception as e:
+            return {'status': 'error', 'error_message': f'Search failed: {e}'}
+        return {'status': 'success', 'query': query, 'results': results}
+
+    return google_search
+
+
+_indexes: Dict[str, SearchIndex] = {}
+
+
+def search_tool(backend: Optional[str] = None, index_path: Optional[str] = None) -> Any:
+    """Search tool for `backend`, or for the SEARCH_BACKEND environment variable."""
+    from google.adk.tools import FunctionTool, google_search
+
+    backend = backend or os.environ.get('SEARCH_BACKEND', 'live')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown search backend '{backend}'; expected one of {BACKENDS}")
+    if backend == 'live':
+        return google_search
+    path = index_path or os.environ.get('SEARCH_INDEX_PATH', DEFAULT_INDEX_PATH)
+    index = _indexes.get(path)
+    if index is None:
+        index = _indexes[path] = SearchIndex(path)
+    return FunctionTool(search_function(index, backend))
+
+
+def _synthetic_documents(n: int, seed: int) -> Iterable[Dict[str, Any]]:
+    rng = random.Random(seed)
+    vocabulary = [f'term{i}' for i in range(5000)]
+    for i in range(n):
+        words = rng.choices(vocabulary, k = 80)
+        yield {'title': ' '.join(words[:6]), 'body': ' '.join(words),
+               'url': f'https://example.com/{i}'}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Local FTS5 search corpus')
+    parser.add_argument('--index', default = DEFAULT_INDEX_PATH)
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    ingest = commands.add_parser('ingest', help = 'Add documents from a JSONL file')
+    ingest.add_argument('path')
+    query = commands.add_parser('search', help = 'Run one query')
+    query.add_argument('query')
+    query.add_argument('-n', '--limit', type = int, default = 5)
+    bench = commands.add_parser('bench', help = 'Query latency, cold and cached')
+    bench.add_argument('--synthetic', type = int, default = 0,
+                       help = 'Ingest this many generated documents first')
+    bench.add_argument('--queries', type = int, default = 1000)
+    bench.add_argument('--seed', type = int, default = 7)
+    args = parser.parse_args()
+
+    index = SearchIndex(args.index)
+    if args.command == 'ingest':
+        started = time.perf_counter()
+        count = index.ingest_jsonl(args.path)
+        print({'ingested': count, 'documents': len(index),
+               'seconds': round(time.perf_counter() - started, 2)})
+    elif args.command == 'search':
+        print(json.dumps(index.search(args.query, args.limit), indent = 2))
+    else:
+        from shared.benchmark import percentile
+
+        if args.synthetic:
+            started = time.perf_counter()
+            index.ingest(_synthetic_documents(args.synthetic, args.seed))
+            print({'ingested': args.synthetic,
+                   'docs_per_s': round(args.synthetic / (time.perf_counter() - started))})
+        rng = random.Random(args.seed)
+        queries = [' '.join(f'term{rng.randrange(5000)}' for _ in range(3))
+                   for _ in range(args.queries)]
+        for phase in ('cold', 'cached'):
+            timings = []
+            for q in queries:
+                started = time.perf_counter()
+                index.search(q)
+                timings.append((time.perf_counter() - started) * 1000)
+            print({'phase': phase, 'documents': len(index),
+                   'p50_ms': round(percentile(timings, 50), 3),
+                   'p95_ms': round(percentile(timings, 95), 3)})
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,431 @@
+"""Pre-warmed pool of MCP stdio sessions behind an McpToolset.
+
+`McpToolset` opens its stdio server lazily, on the first request that lists
+its tools, and then sends every call through that one session. So the first
+request after a restart pays for package resolution, server boot and the tool
+listing, and a server that handles one call at a time serializes concurrent
+calls. `PooledMcpToolset` is a drop-in replacement:
+
+- `McpSessionPool` starts `size` server processes as soon as the toolset is
+  built, on a background event loop shared by every runner in the process;
+- idle sessions are pinged every `health_interval` seconds, and a session that
+  fails a ping or a call is torn down and restarted with backoff;
+- tool calls borrow an idle session, so concurrent calls go to different
+  processes, and a call that fails on a broken session is retried once;
+- the tool listing is fetched once per pool and the filtered tools, with
+  their function declarations, are built once and reused.
+
+Measure cold start and per-call latency against the offline stand-in server
+(`shared.mcp_stub_server`) with:
+
+    python -m shared.mcp_pool --startup-delay 2 --call-delay 0.05
+"""
+
+import argparse
+import asyncio
+import atexit
+import logging
+import sys
+import threading
+import time
+from contextlib import AsyncExitStack
+from datetime import timedelta
+from typing import Any, Coroutine, Dict, List, Optional, TextIO
+
+from google.genai.types import FunctionDeclaration
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.types import CallToolResult, ListToolsResult
+from typing_extensions import override
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.auth.auth_credential import AuthCredential
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
+from google.adk.tools.mcp_tool.mcp_tool import McpTool
+from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
+from google.adk.tools.tool_context import ToolContext
+
+logger = logging.getLogger(__name__)
+
+
+class _Slot:
+    """One server process and its initialized session."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.session: Optional[ClientSession] = None
+        self.broken = asyncio.Event()
+
+    def usable(self) -> bool:
+        session = self.session
+        return (session is not None and not self.broken.is_set()
+                and not session._read_stream._closed and not session._write_stream._closed)
+
+
+class McpSessionPool:
+    """Keeps `size` initialized stdio MCP sessions ready for tool calls.
+
+    The sessions live on a private event loop in a daemon thread, so they
+    outlive the event loop of any one runner and are shared by all of them.
+
+    Args:
+        connection_params: Stdio server to start, with the per-request timeout.
+        size: Server processes to keep running.
+        health_interval: Seconds between pings of idle sessions.
+        errlog: Stream the servers' stderr is sent to.
+    """
+
+    def __init__(
+            self,
+            connection_params: StdioConnectionParams,
+            size: int = 2,
+            health_interval: float = 30.0,
+            errlog: TextIO = sys.stderr,
+    ):
+        if isinstance(connection_params, StdioServerParameters):
+            connection_params = StdioConnectionParams(server_params = connection_params)
+        if not isinstance(connection_params, StdioConnectionParams):
+            raise ValueError('McpSessionPool only supports stdio MCP servers')
+        self.connection_params = connection_params
+        self.size = size
+        self.health_interval = health_interval
+        self.errlog = errlog
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._slots: List[_Slot] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._all_ready: Optional[asyncio.Event] = None
+        self._tools: Optional[ListToolsResult] = None
+        self._tasks: List[asyncio.Task] = []
+        self._closing = False
+        self._started_at = 0.0
+        self._stats = {'sessions_started': 0, 'restarts': 0, 'start_failures': 0,
+                       'health_checks': 0, 'unhealthy': 0, 'calls': 0, 'call_retries': 0,
+                       'waited_calls': 0, 'first_ready_s': None, 'all_ready_s': None}
+        atexit.register(self.close)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats, idle = self._idle.qsize() if self._idle else 0)
+
+    @property
+    def timeout(self) -> float:
+        return self.connection_params.timeout
+
+    # ---- lifecycle ----
+
+    def start(self) -> None:
+        """Starts the server processes in the background; returns immediately."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._closing = False
+            self._started_at = time.perf_counter()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target = self._loop.run_forever, daemon = True,
+                                            name = 'mcp-pool')
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._boot(), self._loop).result()
+
+    async def _boot(self) -> None:
+        self._idle = asyncio.Queue()
+        self._ready = asyncio.Event()
+        self._all_ready = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._serve(i)) for i in range(self.size)]
+        self._tasks.append(asyncio.create_task(self._check_health()))
+
+    def wait_ready(self, timeout: Optional[float] = None, all_sessions: bool = False) -> bool:
+        """Blocks until one (or every) session is ready; False on timeout."""
+        self.start()
+        ready = self._all_ready if all_sessions else self._ready
+        future = asyncio.run_coroutine_threadsafe(ready.wait(), self._loop)
+        try:
+            future.result(timeout)
+            return True
+        except TimeoutError:
+            future.cancel()
+            return False
+
+    def close(self) -> None:
+        """Stops every server process and the background loop."""
+        with self._start_lock:
+            if self._thread is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(10)
+            except Exception as e:
+                logger.warning('MCP pool shutdown failed: %s', e)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+            self._thread = None
+            self._loop = None
+
+    async def _shutdown(self) -> None:
+        self._closing = True
+        for slot in self._slots:
+            slot.broken.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions = True)
+        self._slots.clear()
+        self._tasks.clear()
+
+    # ---- sessions ----
+
+    async def _serve(self, index: int) -> None:
+        """Keeps one server process running, restarting it when it breaks."""
+        backoff = 0.5
+        while not self._closing:
+            slot = _Slot(index)
+            self._slots.append(slot)
+            try:
+                async with AsyncExitStack() as stack:
+                    read, write = (await stack.enter_async_context(stdio_client(
+                        server = self.connection_params.server_params, errlog = self.errlog,
+                    )))[:2]
+                    slot.session = await stack.enter_async_context(ClientSession(
+                        read, write, read_timeout_seconds = timedelta(seconds = self.timeout),
+                    ))
+                    await slot.session.initialize()
+                    if self._tools is None:
+                        self._tools = await slot.session.list_tools()
+                    self._stats['sessions_started'] += 1
+                    ready_s = round(time.perf_counter() - self._started_at, 3)
+                    if self._stats['first_ready_s'] is None:
+                        self._stats['first_ready_s'] = ready_s
+                    if self._stats['sessions_started'] == self.size:
+                        self._stats['all_ready_s'] = ready_s
+                        self._all_ready.set()
+                    backoff = 0.5
+                    self._idle.put_nowait(slot)
+                    self._ready.set()
+                    await slot.broken.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats['start_failures'] += 1
+                logger.warning('MCP session %d failed: %r', index, e)
+            finally:
+                slot.broken.set()
+                self._slots.remove(slot)
+            if self._closing:
+                return
+            self._stats['restarts'] += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _check_health(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for _ in range(self._idle.qsize()):
+                slot = self._idle.get_nowait()
+                if not slot.usable():
+                    continue
+                self._stats['health_checks'] += 1
+                try:
+                    await asyncio.wait_for(slot.session.send_ping(), self.timeout)
+                except Exception as e:
+                    self._stats['unhealthy'] += 1
+                    logger.warning('MCP session %d failed its health check: %r', slot.index, e)
+                    slot.broken.set()
+                else:
+                    self._idle.put_nowait(slot)
+
+    async def _acquire(self) -> _Slot:
+        if self._idle.empty():
+            self._stats['waited_calls'] += 1
+        while True:
+            slot = await self._idle.get()
+            if slot.usable():
+                return slot
+            slot.broken.set()
+
+    async def _list_tools(self) -> ListToolsResult:
+        await asyncio.wait_for(self._ready.wait(), self.timeout)
+        return self._tools
+
+    async def _call(self, name: str, arguments: Dict[str, Any]) -> CallToolResult:
+        self._stats['calls'] += 1
+        for attempt in range(2):
+            slot = await asyncio.wait_for(self._acquire(), self.timeout)
+            try:
+                return await slot.session.call_tool(name, arguments = arguments)
+            except Exception:
+                # The process may be wedged or gone; replace it and retry once.
+                slot.broken.set()
+                if attempt:
+                    raise
+                self._stats['call_retries'] += 1
+            finally:
+                # Also runs when the caller is cancelled: the session stays
+                # usable and the late response is dropped by the client.
+                if not slot.broken.is_set():
+                    self._idle.put_nowait(slot)
+
+    def _submit(self, coro: Coroutine) -> 'asyncio.Future':
+        self.start()
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    async def list_tools(self) -> ListToolsResult:
+        """The server's tool listing, fetched once by the first session."""
+        if self._tools is not None:
+            return self._tools
+        return await self._submit(self._list_tools())
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> CallToolResult:
+        """Calls a tool on an idle session, waiting for one if all are busy."""
+        return await self._submit(self._call(name, arguments))
+
+
+class PooledMcpTool(McpTool):
+    """McpTool that calls through a session pool and caches its declaration."""
+
+    def __init__(self, *, pool: McpSessionPool, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._pool = pool
+        self._declaration: Optional[FunctionDeclaration] = None
+
+    @override
+    def _get_declaration(self) -> FunctionDeclaration:
+        if self._declaration is None:
+            self._declaration = super()._get_declaration()
+        return self._declaration
+
+    @override
+    async def _run_async_impl(self, *, args: Dict[str, Any], tool_context: ToolContext,
+                              credential: AuthCredential) -> Dict[str, Any]:
+        response = await self._pool.call_tool(self._mcp_tool.name, args)
+        return response.model_dump(exclude_none = True, mode = 'json')
+
+
+class PooledMcpToolset(McpToolset):
+    """McpToolset backed by a pre-warmed `McpSessionPool`.
+
+    Example:
+        >>> toolset = PooledMcpToolset(connection_params = params, pool_size = 2,
+        ...                            tool_filter = ['getTinyImage'])
+
+    Args:
+        pool_size: Server processes to keep running.
+        health_interval: Seconds between pings of idle sessions.
+        warm: Start the servers now rather than on the first request.
+    """
+
+    def __init__(self, *, connection_params: StdioConnectionParams, pool_size: int = 2,
+                 health_interval: float = 30.0, warm: bool = True, **kwargs: Any):
+        super().__init__(connection_params = connection_params, **kwargs)
+        self.pool = McpSessionPool(self._connection_params, size = pool_size,
+                                   health_interval = health_interval, errlog = self._errlog)
+        self._tools: Optional[List[PooledMcpTool]] = None
+        if warm:
+            self.pool.start()
+
+    @override
+    async def get_tools(self, readonly_context: Optional[ReadonlyContext] = None) -> List[BaseTool]:
+        if self._tools is None:
+            listing = await self.pool.list_tools()
+            tools = [
+                PooledMcpTool(
+                    pool = self.pool,
+                    mcp_tool = tool,
+                    mcp_session_manager = self._mcp_session_manager,
+                    auth_scheme = self._auth_scheme,
+                    auth_credential = self._auth_credential,
+                    require_confirmation = self._require_confirmation,
+                    header_provider = self._header_provider,
+                )
+                for tool in listing.tools
+            ]
+            # Name-list filters do not depend on the context, so filter once.
+            if not callable(self.tool_filter):
+                tools = [tool for tool in tools if self._is_tool_selected(tool, None)]
+            self._tools = tools
+        if callable(self.tool_filter):
+            return [tool for tool in self._tools if self._is_tool_selected(tool, readonly_context)]
+        return list(self._tools)
+
+    @override
+    async def close(self) -> None:
+        """Leaves the pool running, since every runner using the toolset shares it.
+
+        The pool stops at interpreter exit, or explicitly with `pool.close()`.
+        """
+
+
+def stub_server_params(startup_delay: float = 0.0, call_delay: float = 0.0,
+                       timeout: float = 30.0) -> StdioConnectionParams:
+    """Connection parameters for the offline stand-in server."""
+    return StdioConnectionParams(
+        server_params = StdioServerParameters(
+            command = sys.executable,
+            args = ['-m', 'shared.mcp_stub_server', '--startup-delay', str(startup_delay),
+                    '--call-delay', str(call_delay)],
+        ),
+        timeout = timeout,
+    )
+
+
+async def _measure(toolset: McpToolset, calls: int, concurrency: int) -> Dict[str, Any]:
+    from shared.benchmark import percentile
+
+    started = time.perf_counter()
+    tools = await toolset.get_tools()
+    tool = next(tool for tool in tools if tool.name == 'getTinyImage')
+    first = await tool._run_async_impl(args = {}, tool_context = None, credential = None)
+    cold_start = time.perf_counter() - started
+    assert first.get('content'), first
+
+    timings = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            t0 = time.perf_counter()
+            await tool._run_async_impl(args = {}, tool_context = None, credential = None)
+            timings.append((time.perf_counter() - t0) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    wall = time.perf_counter() - started
+    await toolset.close()
+    if isinstance(toolset, PooledMcpToolset):
+        toolset.pool.close()
+    return {
+        'cold_start_s': round(cold_start, 3),
+        'call_p50_ms': round(percentile(timings, 50), 2),
+        'call_p95_ms': round(percentile(timings, 95), 2),
+        'calls_per_s': round(calls / wall, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'McpToolset versus PooledMcpToolset')
+    parser.add_argument('--startup-delay', type = float, default = 2.0,
+                        help = 'Simulated server boot and package resolution, in seconds')
+    parser.add_argument('--call-delay', type = float, default = 0.05,
+                        help = 'Simulated blocking work per tool call, in seconds')
+    parser.add_argument('--calls', type = int, default = 200)
+    parser.add_argument('--concurrency', type = int, default = 4)
+    parser.add_argument('--pool-size', type = int, default = 4)
+    args = parser.parse_args()
+
+    params = stub_server_params(args.startup_delay, args.call_delay)
+    # The plain toolset connects on the first request, whenever that comes.
+    plain = McpToolset(connection_params = params, tool_filter = ['getTinyImage'])
+    result = asyncio.run(_measure(plain, args.calls, args.concurrency))
+    print({'toolset': 'McpToolset', **result})
+
+    pooled = PooledMcpToolset(connection_params = params, pool_size = args.pool_size,
+                              tool_filter = ['getTinyImage'])
+    # The pool boots with the process, ahead of the first request.
+    pooled.pool.wait_ready(60, all_sessions = True)
+    stats = pooled.pool.stats
+    result = asyncio.run(_measure(pooled, args.calls, args.concurrency))
+    print({'toolset': 'PooledMcpToolset', **result, 'pool_ready_s': stats['all_ready_s']})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Local stdio MCP server standing in for `@modelcontextprotocol/server-everything`.
+
+It serves the `getTinyImage`, `echo` and `add` tools with the same names and
+result shapes, without npm or network access, so MCP cold start and per-call
+latency can be measured offline:
+
+    python -m shared.mcp_stub_server --startup-delay 2 --call-delay 0.05
+
+`--startup-delay` simulates package resolution and server boot before the
+server answers `initialize`. `--call-delay` simulates synchronous work in a
+tool: it blocks the server, so one process handles one call at a time, as a
+single-threaded server doing real work would.
+"""
+
+import argparse
+import random
+import struct
+import time
+import zlib
+from typing import List, Union
+
+from mcp.server.fastmcp import FastMCP, Image
+
+def _png(width: int, height: int, seed: int) -> bytes:
+    """RGBA noise PNG; noise does not compress, so the size is predictable."""
+    rng = random.Random(seed)
+    rows = b''.join(b'\x00' + rng.randbytes(width * 4) for _ in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+# A few kilobytes, the size class of the reference server's tiny image.
+TINY_PNG = _png(32, 32, seed = 0)
+
+call_delay = 0.0
+server = FastMCP('everything-stub', log_level = 'WARNING')
+
+
+def _work() -> None:
+    if call_delay:
+        time.sleep(call_delay)
+
+
+@server.tool(name = 'getTinyImage', description = 'Returns the MCP_TINY_IMAGE',
+             structured_output = False)
+def get_tiny_image() -> List[Union[str, Image]]:
+    _work()
+    return [
+        'This is a tiny image:',
+        Image(data = TINY_PNG, format = 'png'),
+        'The image above is the MCP tiny image.',
+    ]
+
+
+@server.tool(description = 'Echoes back the input')
+def echo(message: str) -> str:
+    _work()
+    return f'Echo: {message}'
+
+
+@server.tool(description = 'Adds two numbers')
+def add(a: float, b: float) -> str:
+    _work()
+    return f'The sum of {a} and {b} is {a + b}.'
+
+
+def main() -> None:
+    global call_delay
+
+    parser = argparse.ArgumentParser(description = 'Offline stand-in for server-everything')
+    parser.add_argument('--startup-delay', type = float, default = 0.0,
+                        help = 'Seconds to wait before serving, like npx resolution')
+    parser.add_argument('--call-delay', type = float, default = 0.0,
+                        help = 'Seconds of blocking work per tool call')
+    args = parser.parse_args()
+
+    call_delay = args.call_delay
+    time.sleep(args.startup_delay)
+    server.run('stdio')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+"""Lazy registry of the agent packages, with import-time profiling.
+
+Every package builds its whole agent graph when `<package>.agent` is
+imported: model clients, AgentTools, MCP toolsets, SQLite stores. Importing
+all of them up front delays the first request by the sum of those costs.
+`AgentRegistry` finds packages by looking for `<name>/agent.py` on disk,
+without importing anything, and builds a package's root agent only on the
+first `get()`. Each load is timed in two phases:
+
+- `import_s`: importing the third-party and `shared` modules that
+  `agent.py` imports at top level (read from its source with `ast`);
+- `build_s`: running the package's own modules, which constructs the graph.
+
+`prewarm()` loads selected packages on a background thread, so they are ready
+before their first request without holding up startup; a `get()` for a
+package that is still loading waits for that load instead of starting its
+own.
+
+    python -m shared.registry list
+    python -m shared.registry load --json
+    python -m shared.registry profile weekend_planner --top 10
+
+`profile` loads each package in a fresh interpreter with `-X importtime`, so
+every package pays its full cold-start cost, and lists the slowest modules.
+"""
+
+import argparse
+import ast
+import importlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class AppEntry:
+    """A discovered agent package and the timings of its last load."""
+    name: str
+    path: str
+    state: str = 'discovered'
+    import_s: Optional[float] = None
+    build_s: Optional[float] = None
+    error: Optional[str] = None
+    agent: Any = field(default = None, repr = False)
+    lock: threading.Lock = field(default_factory = threading.Lock, repr = False)
+
+    def row(self) -> Dict[str, Any]:
+        total = None if self.import_s is None else round(self.import_s + (self.build_s or 0.0), 3)
+        return {'package': self.name, 'state': self.state, 'import_s': self.import_s,
+                'build_s': self.build_s, 'total_s': total, 'error': self.error}
+
+
+def top_level_imports(path: str) -> List[str]:
+    """Absolute modules imported at the top level of a source file."""
+    with open(path, encoding = 'utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def root_agent_of(module: Any) -> Any:
+    """`root_agent` of an agent module.
+
+    Packages without a `root_agent` fall back to the agent of the first
+    module-level `Runner`, e.g. `shipping_runner` in long_running_operations.
+    """
+    from google.adk.runners import Runner
+
+    root_agent = getattr(module, 'root_agent', None)
+    if root_agent is not None:
+        return root_agent
+    for value in vars(module).values():
+        if isinstance(value, Runner):
+            return value.agent
+    raise AttributeError(f"Package '{module.__name__.rsplit('.', 1)[0]}' does not define root_agent")
+
+
+class AgentRegistry:
+    """Discovers agent packages eagerly and builds their agents lazily.
+
+    Example:
+        >>> registry = AgentRegistry(prewarm = ['weekend_planner'])
+        >>> runner = InMemoryRunner(agent = registry.get('currency_converter'))
+
+    Args:
+        root: Directory holding the agent packages; it is added to sys.path.
+        prewarm: Packages to start loading in the background right away.
+    """
+
+    def __init__(self, root: str = REPO_ROOT, prewarm: Iterable[str] = ()):
+        self.root = root
+        self._entries: Dict[str, AppEntry] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.discover_s = 0.0
+        self.discover()
+        prewarm = list(prewarm)
+        if prewarm:
+            self.prewarm(prewarm)
+
+    def discover(self) -> List[str]:
+        """Finds `<name>/agent.py` packages under `root`; imports nothing."""
+        started = time.perf_counter()
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if (name not in self._entries and name.isidentifier()
+                    and os.path.isfile(os.path.join(path, '__init__.py'))
+                    and os.path.isfile(os.path.join(path, 'agent.py'))):
+                self._entries[name] = AppEntry(name = name, path = path)
+        self.discover_s = time.perf_counter() - started
+        return self.names()
+
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def _entry(self, name: str) -> AppEntry:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown agent package '{name}'; found {self.names()}")
+        return entry
+
+    def is_loaded(self, name: str) -> bool:
+        return self._entry(name).state == 'ready'
+
+    def get(self, name: str) -> Any:
+        """Root agent of `name`, building the package on first use."""
+        entry = self._entry(name)
+        if entry.state == 'ready':
+            return entry.agent
+        with entry.lock:
+            if entry.state != 'ready':
+                self._load(entry)
+        return entry.agent
+
+    def _load(self, entry: AppEntry) -> None:
+        if self.root not in sys.path:
+            sys.path.insert(0, self.root)
+        entry.state = 'loading'
+        entry.error = None
+        try:
+            started = time.perf_counter()
+            for module in top_level_imports(os.path.join(entry.path, 'agent.py')):
+                if module.split('.', 1)[0] == entry.name:
+                    continue
+                try:
+                    importlib.import_module(module)
+                except ImportError:
+                    # Raised again, with context, when the agent module runs.
+                    pass
+            entry.import_s = round(time.perf_counter() - started, 3)
+            started = time.perf_counter()
+            entry.agent = root_agent_of(importlib.import_module(f'{entry.name}.agent'))
+            entry.build_s = round(time.perf_counter() - started, 3)
+            entry.state = 'ready'
+        except Exception as e:
+            entry.state = 'failed'
+            entry.error = f'{type(e).__name__}: {e}'
+            raise
+
+    def prewarm(self, names: Iterable[str]) -> Dict[str, Future]:
+        """Loads `names` one by one on a background thread.
+
+        Loads run sequentially: they mostly contend for the import lock, and
+        one thread keeps the foreground responsive.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers = 1,
+                                                    thread_name_prefix = 'agent-prewarm')
+        return {name: self._executor.submit(self.get, name)
+                for name in names if self._entry(name).state != 'ready'}
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Per-package state and load timings."""
+        return [entry.row() for entry in self._entries.values()]
+
+
+registry = AgentRegistry()
+
+
+def _profile(name: str, top: int) -> Dict[str, Any]:
+    """Loads one package in a fresh interpreter under `-X importtime`."""
+    code = ('import json, sys\n'
+            'from shared.registry import registry\n'
+            f'registry.get({name!r})\n'
+            'print(json.dumps(registry.report()))\n')
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd = REPO_ROOT,
+                          capture_output = True, text = True)
+    wall = time.perf_counter() - started
+    modules = []
+    for line in proc.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            self_us, cumulative_us, module = (part.strip() for part in line[12:].split('|'))
+            if self_us.isdigit():
+                modules.append((int(cumulative_us), int(self_us), module))
+    rows = json.loads(proc.stdout.strip().splitlines()[-1]) if proc.returncode == 0 else []
+    row = next((r for r in rows if r['package'] == name), {'package': name, 'state': 'failed',
+               'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else None})
+    # Self time is exclusive, so it ranks the modules that are slow themselves.
+    slowest = sorted(modules, key = lambda m: m[1], reverse = True)[:top]
+    return {**row, 'process_s': round(wall, 3), 'modules_imported': len(modules),
+            'slowest_modules': [{'module': m, 'self_ms': round(s / 1000, 1),
+                                 'cumulative_ms': round(c / 1000, 1)} for c, s, m in slowest]}
+
+
+def _print_rows(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'package':<26}{'state':>11}{'import s':>10}{'build s':>10}{'total s':>10}")
+    for row in rows:
+        print(f"{row['package']:<26}{row['state']:>11}"
+              + ''.join(f"{'-' if row.get(k) is None else row[k]:>10}"
+                        for k in ('import_s', 'build_s', 'total_s'))
+              + (f"  {row['error']}" if row.get('error') else ''))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Agent package registry and startup profiler')
+    parser.add_argument('command', choices = ('list', 'load', 'profile'))
+    parser.add_argument('packages', nargs = '*', help = 'Packages (default: all discovered)')
+    parser.add_argument('--top', type = int, default = 5, help = 'Slowest modules to list')
+    parser.add_argument('--json', action = 'store_true', help = 'Print the report as JSON')
+    args = parser.parse_args()
+
+    names = args.packages or registry.names()
+    if args.command == 'list':
+        print({'discover_ms': round(registry.discover_s * 1000, 2), 'packages': names})
+        return
+    if args.command == 'load':
+        for name in names:
+            try:
+                registry.get(name)
+            except Exception:
+                pass
+        rows = [row for row in registry.report() if row['package'] in names]
+    else:
+        rows = [_profile(name, args.top) for name in names]
+    if args.json:
+        print(json.dumps(rows, indent = 2))
+        return
+    _print_rows(rows)
+    if args.command == 'load':
+        total = sum(row['total_s'] or 0.0 for row in rows)
+        print(f'eager startup {total:.2f}s; lazy startup {registry.discover_s * 1000:.2f}ms '
+              'until the first request')
+    else:
+        for row in rows:
+            print(f"\n{row['package']}: {row['process_s']:.2f}s cold process, "
+                  f"{row['modules_imported']} modules")
+            for module in row['slowest_modules']:
+                print(f"  {module['self_ms']:>8.1f} ms self {module['cumulative_ms']:>9.1f} ms "
+                      f"cumulative  {module['module']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""Content-addressed cache for model responses, installed as a Runner plugin.
+
+The cache key is a SHA-256 of everything that determines a model reply: model
+name, resolved system instruction, contents, tool declarations and generation
+config. Replies live in an in-process LRU tier and, optionally, a SQLite tier
+that survives restarts, so repeated eval runs and identical user queries skip
+the Gemini round trip entirely.
+
+Agents whose requests carry built-in grounding tools (`google_search`,
+`google_maps_grounding`) are not cached by default, since their answers depend
+on live results.
+
+SQLite reads and writes run in a worker thread, so a slow disk does not stall
+the event loop, and the database file is only opened on the first lookup.
+
+A plugin only applies to the Runner it is passed to. The packages attach it
+to their module-level `runner`; `adk web`, `adk run` and `adk eval` build
+their own runners from `root_agent` and do not use the cache.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from google.genai import types
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+
+DEFAULT_DB_PATH = 'llm_response_cache.db'
+
+# Config fields that never change the model output.
+_IGNORED_CONFIG_FIELDS = {'tools', 'system_instruction', 'labels', 'http_options'}
+
+
+def _dump(value: Any) -> Any:
+    if value is None:
+        return None
+    return value.model_dump(mode = 'json', exclude_none = True)
+
+
+def _uses_grounding(llm_request: LlmRequest) -> bool:
+    for tool in (llm_request.config.tools or []) if llm_request.config else []:
+        if isinstance(tool, types.Tool) and (
+            tool.google_search or tool.google_search_retrieval
+            or tool.google_maps or tool.retrieval
+        ):
+            return True
+    return False
+
+
+def _dump_content(content: types.Content) -> Dict[str, Any]:
+    data = _dump(content)
+    # Function call ids are random per invocation and must not split the key.
+    for part in data.get('parts', []):
+        part.get('function_call', {}).pop('id', None)
+        part.get('function_response', {}).pop('id', None)
+    return data
+
+
+def request_key(llm_request: LlmRequest) -> str:
+    """Returns the content-addressed cache key for a model request."""
+    config = llm_request.config or types.GenerateContentConfig()
+    declarations = []
+    for tool in config.tools or []:
+        if isinstance(tool, types.Tool):
+            declarations.append(_dump(tool))
+    generation = {
+        name: value
+        for name, value in _dump(config).items()
+        if name not in _IGNORED_CONFIG_FIELDS
+    }
+    payload = {
+        'model': llm_request.model,
+        'instruction': _dump(config.system_instruction)
+        if not isinstance(config.system_instruction, str) else config.system_instruction,
+        'contents': [_dump_content(content) for content in llm_request.contents],
+        'tools': declarations,
+        'config': generation,
+    }
+    encoded = json.dumps(payload, sort_keys = True, separators = (',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _serialize(llm_response: LlmResponse) -> bytes:
+    data = llm_response.model_dump(
+        mode = 'json', exclude_none = True,
+        include = {'content', 'usage_metadata', 'finish_reason', 'model_version'},
+    )
+    # Function call ids are assigned per invocation; replayed calls get new ones.
+    for part in data.get('content', {}).get('parts', []):
+        part.get('function_call', {}).pop('id', None)
+    return json.dumps(data, separators = (',', ':')).encode('utf-8')
+
+
+class _SqliteTier:
+    """Persistent key/value tier with expiry, shared safely across threads.
+
+    The file is opened and its table created on first use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection, opened on first use; callers hold `_lock`."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread = False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' key TEXT PRIMARY KEY, agent TEXT, expires_at REAL, payload BLOB)'
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str, now: float) -> Optional[Tuple[Optional[float], bytes]]:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT expires_at, payload FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            expires_at, payload = row
+            if expires_at is not None and expires_at <= now:
+                self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.conn.commit()
+                return None
+            return expires_at, payload
+
+    def put(self, key: str, agent: str, expires_at: Optional[float], payload: bytes) -> None:
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                (key, agent, expires_at, payload),
+            )
+            self.conn.commit()
+
+    def purge_expired(self, now: float) -> int:
+        with self._lock:
+            cursor = self.conn.execute(
+                'DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?',
+                (now,),
+            )
+            self.conn.commit()
+            return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ResponseCachePlugin(BasePlugin):
+    """Serves repeated model requests from an LRU memory tier and SQLite.
+
+    Example:
+        >>> runner = InMemoryRunner(
+        ...     agent = root_agent,
+        ...     plugins = [ResponseCachePlugin(agent_ttls = {'SummarizerAgent': 600})],
+        ... )
+
+    Args:
+        max_entries: Capacity of the in-process LRU tier.
+        db_path: SQLite file for the persistent tier, or None for memory only.
+        default_ttl: Seconds a response stays valid; None never expires.
+        agent_ttls: Per-agent TTL overrides. A TTL of 0 disables caching.
+        skip_agents: Agent names that are never cached.
+        cache_grounded: Also cache agents that use google_search or maps
+            grounding.
+    """
+
+    def __init__(
+            self,
+            name: str = 'response_cache',
+            max_entries: int = 1024,
+            db_path: Optional[str] = DEFAULT_DB_PATH,
+            default_ttl: Optional[float] = 24 * 3600,
+            agent_ttls: Optional[Dict[str, Optional[float]]] = None,
+            skip_agents: Iterable[str] = (),
+            cache_grounded: bool = False,
+    ):
+        super().__init__(name)
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.agent_ttls = dict(agent_ttls or {})
+        self.skip_agents = set(skip_agents)
+        self.cache_grounded = cache_grounded
+        self._memory: 'OrderedDict[str, Tuple[Optional[float], bytes]]' = OrderedDict()
+        self._disk = _SqliteTier(db_path) if db_path else None
+        # Key of the in-flight request, set before the model call and consumed
+        # when its final response arrives. A model call's callbacks run in the
+        # task that makes it, so concurrent calls by one agent in one
+        # invocation (e.g. parallel paragraph edits) each see their own key.
+        self._pending: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+            f'response_cache_pending_{id(self)}', default = None
+        )
+        self._stats = {
+            'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'bypassed': 0,
+            'stores': 0, 'evictions': 0, 'bytes_served': 0, 'bytes_stored': 0,
+        }
+
+    def _ttl(self, agent_name: str) -> Optional[float]:
+        return self.agent_ttls.get(agent_name, self.default_ttl)
+
+    def _remember(self, key: str, expires_at: Optional[float], payload: bytes) -> None:
+        self._memory[key] = (expires_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last = False)
+            self._stats['evictions'] += 1
+
+    async def _lookup(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, payload = entry
+            if expires_at is None or expires_at > now:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return payload
+            del self._memory[key]
+        if self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, key, now)
+            if entry is not None:
+                self._stats['disk_hits'] += 1
+                self._remember(key, *entry)
+                return entry[1]
+        return None
+
+    async def before_model_callback(
+            self, *, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> Optional[LlmResponse]:
+        self._pending.set(None)
+        agent_name = callback_context.agent_name
+        if (
+            agent_name in self.skip_agents
+            or self._ttl(agent_name) == 0
+            or (not self.cache_grounded and _uses_grounding(llm_request))
+        ):
+            self._stats['bypassed'] += 1
+            return None
+
+        key = request_key(llm_request)
+        payload = await self._lookup(key)
+        if payload is None:
+            self._stats['misses'] += 1
+            self._pending.set(key)
+            return None
+
+        self._stats['bytes_served'] += len(payload)
+        response = LlmResponse.model_validate_json(payload)
+        response.custom_metadata = {**(response.custom_metadata or {}), 'response_cache': 'hit'}
+        return response
+
+    async def after_model_callback(
+            self, *, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> Optional[LlmResponse]:
+        if llm_response.partial:
+            return None
+        key = self._pending.get()
+        self._pending.set(None)
+        if key is None or llm_response.error_code or not llm_response.content:
+            return None
+
+        ttl = self._ttl(callback_context.agent_name)
+        expires_at = time.time() + ttl if ttl is not None else None
+        payload = _serialize(llm_response)
+        self._remember(key, expires_at, payload)
+        if self._disk is not None:
+            await asyncio.to_thread(
+                self._disk.put, key, callback_context.agent_name, expires_at, payload
+            )
+        self._stats['stores'] += 1
+        self._stats['bytes_stored'] += len(payload)
+        return None
+
+    async def on_model_error_callback(
+            self, *, callback_context: CallbackContext, llm_request: LlmRequest,
+            error: Exception,
+    ) -> Optional[LlmResponse]:
+        self._pending.set(None)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss/byte counters and the current memory tier size."""
+        stats = dict(self._stats)
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        stats['memory_entries'] = len(self._memory)
+        return stats
+
+    def clear(self) -> None:
+        """Drops the memory tier and expired rows of the disk tier."""
+        self._memory.clear()
+        if self._disk is not None:
+            self._disk.purge_expired(time.time())
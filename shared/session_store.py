@@ -0,0 +1,593 @@
+"""SQLite session service tuned for many concurrent sessions.
+
+Drop-in replacement for `DatabaseSessionService(db_url='sqlite:///...')`:
+
+- WAL journal with `synchronous=NORMAL`, so readers never block the writer.
+- Events live in a `WITHOUT ROWID` table clustered on
+  `(app_name, user_id, session_id, timestamp, id)`. Session replay is a single
+  range scan of the primary key, which covers the stored event payload.
+- `append_event` updates the in-memory session immediately and hands the row
+  to a write-behind queue. A single writer thread drains the queue and
+  group-commits everything pending in one transaction, coalescing app, user
+  and session state updates per row.
+- Reads go through a small pool of connections driven by `asyncio.to_thread`,
+  and flush pending writes first, so a caller always reads its own writes.
+
+Call `flush()` to wait for durability and `close()` on shutdown. If a batch
+fails to commit, the next `flush()` or `append_event` raises
+`SessionWriteError`. Since reads flush first, so do reads.
+
+Sessions kept by another session service, e.g. a `DatabaseSessionService`
+file, are copied in with `import_sessions` or:
+
+    python -m shared.session_store sqlite:///my_agent_data.db my_agent_sessions.db --app default
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events.event import Event
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.session import Session
+from google.adk.sessions.state import State
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, timestamp, id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS app_states (
+    app_name TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS user_states (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+) WITHOUT ROWID;
+"""
+
+_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+)
+
+logger = logging.getLogger(__name__)
+
+
+
+class SessionWriteError(RuntimeError):
+    """Queued session events could not be committed and are lost."""
+
+
+SessionKey = Tuple[str, str, str]
+# (session key, timestamp, event id, serialized event, state delta)
+_PendingEvent = Tuple[SessionKey, float, str, str, Optional[Dict[str, Any]]]
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread = False, isolation_level = None)
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _split_state(state: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    deltas = {'app': {}, 'user': {}, 'session': {}}
+    for key, value in (state or {}).items():
+        if key.startswith(State.APP_PREFIX):
+            deltas['app'][key.removeprefix(State.APP_PREFIX)] = value
+        elif key.startswith(State.USER_PREFIX):
+            deltas['user'][key.removeprefix(State.USER_PREFIX)] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            deltas['session'][key] = value
+    return deltas
+
+
+def _merge_state(app_state: dict, user_state: dict, session_state: dict) -> dict:
+    merged = dict(session_state)
+    for key, value in app_state.items():
+        merged[State.APP_PREFIX + key] = value
+    for key, value in user_state.items():
+        merged[State.USER_PREFIX + key] = value
+    return merged
+
+
+def _load(conn: sqlite3.Connection, sql: str, args: tuple) -> dict:
+    row = conn.execute(sql, args).fetchone()
+    return json.loads(row[0]) if row else {}
+
+
+class _ConnectionPool:
+    """Fixed set of connections, each used by one worker thread at a time."""
+
+    def __init__(self, path: str, size: int):
+        self._idle: 'queue.Queue[sqlite3.Connection]' = queue.Queue()
+        for _ in range(size):
+            self._idle.put(_connect(path))
+
+    def _call(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        conn = self._idle.get()
+        try:
+            return fn(conn)
+        finally:
+            self._idle.put(conn)
+
+    async def run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        return await asyncio.to_thread(self._call, fn)
+
+    def close(self) -> None:
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+class SqliteSessionService(BaseSessionService):
+    """Session service backed by SQLite with WAL and group-committed appends.
+
+    Args:
+        db_path: SQLite database file.
+        pool_size: Read connections shared by concurrent requests.
+        max_batch: Maximum events written per transaction.
+        commit_interval: Seconds the writer waits for more events before
+            committing a batch that is not yet full.
+    """
+
+    def __init__(
+            self,
+            db_path: str = 'my_agent_sessions.db',
+            pool_size: int = 4,
+            max_batch: int = 512,
+            commit_interval: float = 0.005,
+    ):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.commit_interval = commit_interval
+
+        self._writer_conn = _connect(db_path)
+        self._writer_conn.executescript(_SCHEMA)
+        self._pool = _ConnectionPool(db_path, pool_size)
+
+        # Last update time per session, for the stale-session check without a read.
+        self._update_times: Dict[SessionKey, float] = {}
+        self._queue: 'queue.Queue[Optional[_PendingEvent]]' = queue.Queue()
+        self.stats = {'events_written': 0, 'transactions': 0, 'largest_batch': 0,
+                      'events_lost': 0}
+        # First commit failure not yet raised to a caller, set by the writer thread.
+        self._error: Optional[SessionWriteError] = None
+        self._writer = threading.Thread(
+            target = self._write_loop, name = 'session-writer', daemon = True
+        )
+        self._writer.start()
+
+    # ---------------------------------------------------------------- writer
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.commit_interval
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout = max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+            try:
+                self._commit(batch)
+            except Exception as e:
+                logger.exception('Failed to commit %d session events', len(batch))
+                self.stats['events_lost'] += len(batch)
+                if self._error is None:
+                    error = SessionWriteError(f'Failed to commit {len(batch)} session events: {e}')
+                    error.__cause__ = e
+                    self._error = error
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _commit(self, batch: List[_PendingEvent]) -> None:
+        app_deltas: Dict[str, dict] = {}
+        user_deltas: Dict[Tuple[str, str], dict] = {}
+        session_deltas: Dict[SessionKey, dict] = {}
+        session_times: Dict[SessionKey, float] = {}
+        rows = []
+        for key, timestamp, event_id, payload, state_delta in batch:
+            rows.append((*key, timestamp, event_id, payload))
+            session_times[key] = max(session_times.get(key, 0.0), timestamp)
+            if state_delta:
+                deltas = _split_state(state_delta)
+                if deltas['app']:
+                    app_deltas.setdefault(key[0], {}).update(deltas['app'])
+                if deltas['user']:
+                    user_deltas.setdefault(key[:2], {}).update(deltas['user'])
+                if deltas['session']:
+                    session_deltas.setdefault(key, {}).update(deltas['session'])
+
+        conn = self._writer_conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?)', rows)
+            for app_name, delta in app_deltas.items():
+                state = _load(conn, 'SELECT state FROM app_states WHERE app_name = ?', (app_name,))
+                conn.execute(
+                    'INSERT OR REPLACE INTO app_states VALUES (?, ?)',
+                    (app_name, json.dumps(state | delta)),
+                )
+            for (app_name, user_id), delta in user_deltas.items():
+                state = _load(
+                    conn, 'SELECT state FROM user_states WHERE app_name = ? AND user_id = ?',
+                    (app_name, user_id),
+                )
+                conn.execute(
+                    'INSERT OR REPLACE INTO user_states VALUES (?, ?, ?)',
+                    (app_name, user_id, json.dumps(state | delta)),
+                )
+            for key, update_time in session_times.items():
+                delta = session_deltas.get(key)
+                if delta:
+                    state = _load(
+                        conn,
+                        'SELECT state FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?',
+                        key,
+                    )
+                    conn.execute(
+                        'UPDATE sessions SET state = ?, update_time = ?'
+                        ' WHERE app_name = ? AND user_id = ? AND id = ?',
+                        (json.dumps(state | delta), update_time, *key),
+                    )
+                else:
+                    conn.execute(
+                        'UPDATE sessions SET update_time = ?'
+                        ' WHERE app_name = ? AND user_id = ? AND id = ?',
+                        (update_time, *key),
+                    )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self.stats['events_written'] += len(rows)
+        self.stats['transactions'] += 1
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(rows))
+
+    def _raise_write_error(self) -> None:
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    async def flush(self) -> None:
+        """Waits until every queued event has been committed.
+
+        Raises:
+            SessionWriteError: If a batch failed to commit since the last
+                flush or append that raised.
+        """
+        if self._queue.unfinished_tasks:
+            await asyncio.to_thread(self._queue.join)
+        self._raise_write_error()
+
+    def close(self) -> None:
+        """Commits pending events and closes all connections."""
+        self._queue.put(None)
+        self._writer.join()
+        self._writer_conn.close()
+        self._pool.close()
+
+    # --------------------------------------------------------------- service
+
+    async def create_session(
+            self,
+            *,
+            app_name: str,
+            user_id: str,
+            state: Optional[Dict[str, Any]] = None,
+            session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        deltas = _split_state(state)
+        now = time.time()
+        await self.flush()
+
+        def create(conn: sqlite3.Connection) -> Tuple[dict, dict]:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                exists = conn.execute(
+                    'SELECT 1 FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?',
+                    (app_name, user_id, session_id),
+                ).fetchone()
+                if exists:
+                    raise AlreadyExistsError(f'Session with id {session_id} already exists.')
+                app_state = _load(
+                    conn, 'SELECT state FROM app_states WHERE app_name = ?', (app_name,)
+                ) | deltas['app']
+                user_state = _load(
+                    conn, 'SELECT state FROM user_states WHERE app_name = ? AND user_id = ?',
+                    (app_name, user_id),
+                ) | deltas['user']
+                conn.execute(
+                    'INSERT OR REPLACE INTO app_states VALUES (?, ?)',
+                    (app_name, json.dumps(app_state)),
+                )
+                conn.execute(
+                    'INSERT OR REPLACE INTO user_states VALUES (?, ?, ?)',
+                    (app_name, user_id, json.dumps(user_state)),
+                )
+                conn.execute(
+                    'INSERT INTO sessions VALUES (?, ?, ?, ?, ?)',
+                    (app_name, user_id, session_id, json.dumps(deltas['session']), now),
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            return app_state, user_state
+
+        app_state, user_state = await self._pool.run(create)
+        self._update_times[(app_name, user_id, session_id)] = now
+        return Session(
+            id = session_id,
+            app_name = app_name,
+            user_id = user_id,
+            state = _merge_state(app_state, user_state, deltas['session']),
+            last_update_time = now,
+        )
+
+    async def get_session(
+            self,
+            *,
+            app_name: str,
+            user_id: str,
+            session_id: str,
+            config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        await self.flush()
+        key = (app_name, user_id, session_id)
+
+        def load(conn: sqlite3.Connection):
+            row = conn.execute(
+                'SELECT state, update_time FROM sessions'
+                ' WHERE app_name = ? AND user_id = ? AND id = ?',
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            sql = (
+                'SELECT event FROM events'
+                ' WHERE app_name = ? AND user_id = ? AND session_id = ?'
+            )
+            args: tuple = key
+            if config and config.after_timestamp:
+                sql += ' AND timestamp >= ?'
+                args += (config.after_timestamp,)
+            if config and config.num_recent_events:
+                sql += ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+                args += (config.num_recent_events,)
+                events = [r[0] for r in conn.execute(sql, args)][::-1]
+            else:
+                sql += ' ORDER BY timestamp, id'
+                events = [r[0] for r in conn.execute(sql, args)]
+            app_state = _load(conn, 'SELECT state FROM app_states WHERE app_name = ?', (app_name,))
+            user_state = _load(
+                conn, 'SELECT state FROM user_states WHERE app_name = ? AND user_id = ?',
+                (app_name, user_id),
+            )
+            return json.loads(row[0]), row[1], events, app_state, user_state
+
+        loaded = await self._pool.run(load)
+        if loaded is None:
+            return None
+        session_state, update_time, events, app_state, user_state = loaded
+        self._update_times[key] = update_time
+        return Session(
+            id = session_id,
+            app_name = app_name,
+            user_id = user_id,
+            state = _merge_state(app_state, user_state, session_state),
+            events = [Event.model_validate_json(event) for event in events],
+            last_update_time = update_time,
+        )
+
+    async def list_sessions(
+            self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        await self.flush()
+
+        def load(conn: sqlite3.Connection):
+            if user_id is None:
+                return conn.execute(
+                    'SELECT user_id, id, state, update_time FROM sessions WHERE app_name = ?',
+                    (app_name,),
+                ).fetchall()
+            return conn.execute(
+                'SELECT user_id, id, state, update_time FROM sessions'
+                ' WHERE app_name = ? AND user_id = ?',
+                (app_name, user_id),
+            ).fetchall()
+
+        rows = await self._pool.run(load)
+        return ListSessionsResponse(sessions = [
+            Session(
+                id = session_id,
+                app_name = app_name,
+                user_id = row_user_id,
+                state = json.loads(state),
+                last_update_time = update_time,
+            )
+            for row_user_id, session_id, state, update_time in rows
+        ])
+
+    async def delete_session(
+            self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        await self.flush()
+        key = (app_name, user_id, session_id)
+
+        def delete(conn: sqlite3.Connection) -> None:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?', key
+            )
+            conn.execute(
+                'DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?', key
+            )
+            conn.execute('COMMIT')
+
+        await self._pool.run(delete)
+        self._update_times.pop(key, None)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        self._raise_write_error()
+        event = self._trim_temp_delta_state(event)
+
+        key = (session.app_name, session.user_id, session.id)
+        stored = self._update_times.get(key)
+        if stored is not None and stored > session.last_update_time:
+            raise ValueError(
+                f'The last_update_time provided in the session object {session.last_update_time}'
+                f' is earlier than the stored update_time {stored}.'
+                ' Please check if it is a stale session.'
+            )
+
+        # Serialize now so later mutations of the event cannot race the writer.
+        state_delta = dict(event.actions.state_delta) if event.actions else None
+        self._queue.put((
+            key, event.timestamp, event.id,
+            event.model_dump_json(exclude_none = True), state_delta,
+        ))
+        update_time = max(event.timestamp, session.last_update_time)
+        self._update_times[key] = update_time
+        session.last_update_time = update_time
+        await super().append_event(session = session, event = event)
+        return event
+
+    async def import_sessions(self, source: BaseSessionService, app_name: str) -> int:
+        """Copies the sessions of `app_name` from another session service.
+
+        Sessions that already exist here are skipped, so an import can be
+        repeated. App and user state are merged into the state stored here.
+
+        Returns:
+            The number of sessions copied.
+        """
+        await self.flush()
+        listed = await source.list_sessions(app_name = app_name)
+        sessions = []
+        for summary in listed.sessions:
+            session = await source.get_session(
+                app_name = app_name, user_id = summary.user_id, session_id = summary.id
+            )
+            if session is not None:
+                sessions.append(session)
+
+        def copy(conn: sqlite3.Connection) -> int:
+            copied = 0
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for session in sessions:
+                    key = (app_name, session.user_id, session.id)
+                    exists = conn.execute(
+                        'SELECT 1 FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?', key
+                    ).fetchone()
+                    if exists:
+                        continue
+                    deltas = _split_state(session.state)
+                    app_state = _load(
+                        conn, 'SELECT state FROM app_states WHERE app_name = ?', (app_name,)
+                    )
+                    user_state = _load(
+                        conn, 'SELECT state FROM user_states WHERE app_name = ? AND user_id = ?',
+                        key[:2],
+                    )
+                    conn.execute(
+                        'INSERT OR REPLACE INTO app_states VALUES (?, ?)',
+                        (app_name, json.dumps(app_state | deltas['app'])),
+                    )
+                    conn.execute(
+                        'INSERT OR REPLACE INTO user_states VALUES (?, ?, ?)',
+                        (*key[:2], json.dumps(user_state | deltas['user'])),
+                    )
+                    conn.execute(
+                        'INSERT INTO sessions VALUES (?, ?, ?, ?, ?)',
+                        (*key, json.dumps(deltas['session']), session.last_update_time),
+                    )
+                    conn.executemany(
+                        'INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?)',
+                        [(*key, event.timestamp, event.id, event.model_dump_json(exclude_none = True))
+                         for event in session.events],
+                    )
+                    copied += 1
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            return copied
+
+        return await self._pool.run(copy)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description = 'Copy sessions from a DatabaseSessionService into a SqliteSessionService'
+    )
+    parser.add_argument('source_url', help = "e.g. 'sqlite:///my_agent_data.db'")
+    parser.add_argument('db_path', help = 'SqliteSessionService file')
+    parser.add_argument('--app', action = 'append', required = True,
+                        help = 'App name to copy; may be repeated')
+    args = parser.parse_args()
+
+    from google.adk.sessions import DatabaseSessionService
+
+    async def run() -> Dict[str, int]:
+        source = DatabaseSessionService(db_url = args.source_url)
+        target = SqliteSessionService(db_path = args.db_path)
+        try:
+            return {app: await target.import_sessions(source, app) for app in args.app}
+        finally:
+            target.close()
+
+    print(asyncio.run(run()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""Staged pipeline that edits streamed output chunk by chunk.
+
+A SequentialAgent starts each stage only after the previous one has finished,
+so an editor cannot touch the first paragraph until the whole draft exists.
+`StreamingPipelineAgent` runs its sub-agents in order as a fixed pipeline, and
+overlaps its last two stages:
+
+- the producer (second to last sub-agent) runs with SSE streaming, and each
+  paragraph is handed to the editor as soon as the next one begins;
+- the editor (last sub-agent) edits paragraphs concurrently, each with
+  `chunk_key` set to that paragraph, an empty event history and its own
+  invocation id (`<invocation_id>.<pipeline name>.<index>`), so plugins can
+  tell the concurrent runs of one agent apart, and edited paragraphs are
+  sent to the client in order as partial events as soon as they are ready;
+- a final event stores the joined result under the editor's `output_key`.
+
+Earlier stages run with streaming too, so their text reaches the client as it
+is generated, but a stage only starts once the previous stage has finished.
+
+Compare it with a SequentialAgent offline with:
+
+    python -m shared.streaming_pipeline
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from google.genai import types
+from typing_extensions import override
+
+from google.adk.agents import BaseAgent, LlmAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.events import Event, EventActions
+from google.adk.utils.context_utils import Aclosing
+
+
+def _text(event: Event) -> str:
+    if not event.content or not event.content.parts:
+        return ''
+    return ''.join(part.text or '' for part in event.content.parts if not part.thought)
+
+
+class StreamingPipelineAgent(BaseAgent):
+    """Runs sub-agents as stages, editing the producer's output per paragraph.
+
+    Attributes:
+        chunk_key: State key the editor's instruction reads its input from.
+        separator: Text that ends a chunk, a blank line by default.
+        max_concurrency: Chunks edited at the same time.
+    """
+
+    chunk_key: str
+    separator: str = '\n\n'
+    max_concurrency: int = 4
+
+    def _streaming(self, ctx: InvocationContext) -> InvocationContext:
+        run_config = (ctx.run_config or RunConfig()).model_copy(
+            update = {'streaming_mode': StreamingMode.SSE}
+        )
+        return ctx.model_copy(update = {'run_config': run_config})
+
+    async def _edit(self, editor: BaseAgent, ctx: InvocationContext, index: int,
+                    chunk: str, semaphore: asyncio.Semaphore) -> str:
+        """Runs the editor on one chunk in an isolated copy of the session.
+
+        The copy gets its own state and an empty event list: `model_copy` is
+        shallow, and the shared history would hand the editor the whole draft
+        as context for every paragraph. Its invocation id and branch are
+        suffixed with the chunk index, since plugin callbacks only see the
+        invocation id and agent name.
+        """
+        session = ctx.session.model_copy(
+            update = {'state': {**ctx.session.state, self.chunk_key: chunk}, 'events': []}
+        )
+        chunk_ctx = ctx.model_copy(update = {
+            'invocation_id': f'{ctx.invocation_id}.{self.name}.{index}',
+            'session': session,
+            'branch': f'{ctx.branch}.{self.name}.{index}' if ctx.branch else f'{self.name}.{index}',
+            'run_config': (ctx.run_config or RunConfig()).model_copy(
+                update = {'streaming_mode': StreamingMode.NONE}
+            ),
+        })
+        edited = ''
+        async with semaphore:
+            async with Aclosing(editor.run_async(chunk_ctx)) as agen:
+                async for event in agen:
+                    if event.is_final_response() and event.author == editor.name:
+                        edited = _text(event) or edited
+        return edited.strip() or chunk
+
+    def _chunk_event(self, ctx: InvocationContext, author: str, text: str) -> Event:
+        return Event(
+            invocation_id = ctx.invocation_id,
+            author = author,
+            branch = ctx.branch,
+            partial = True,
+            content = types.Content(role = 'model', parts = [types.Part(text = text)]),
+        )
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        if len(self.sub_agents) < 2:
+            raise ValueError(f'{self.name} needs a producer and an editor stage')
+        *stages, producer, editor = self.sub_agents
+        streaming_ctx = self._streaming(ctx)
+
+        for stage in stages:
+            async with Aclosing(stage.run_async(streaming_ctx)) as agen:
+                async for event in agen:
+                    yield event
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        edits: List[asyncio.Task] = []
+        emitted = 0
+        buffer = ''
+
+        def submit(chunk: str) -> None:
+            if chunk.strip():
+                edits.append(asyncio.create_task(
+                    self._edit(editor, ctx, len(edits), chunk.strip(), semaphore)
+                ))
+
+        try:
+            async with Aclosing(producer.run_async(streaming_ctx)) as agen:
+                async for event in agen:
+                    if event.partial:
+                        # The raw draft stays internal; the client gets edits.
+                        buffer += _text(event)
+                        *done, buffer = buffer.split(self.separator)
+                        for chunk in done:
+                            submit(chunk)
+                    else:
+                        if event.is_final_response() and event.author == producer.name:
+                            # Non-streaming models deliver the whole text here.
+                            if not edits and not buffer:
+                                buffer = _text(event)
+                        yield event
+                    while emitted < len(edits) and edits[emitted].done():
+                        yield self._chunk_event(ctx, editor.name,
+                                                edits[emitted].result() + self.separator)
+                        emitted += 1
+            for chunk in buffer.split(self.separator):
+                submit(chunk)
+            buffer = ''
+            while emitted < len(edits):
+                text = await edits[emitted]
+                yield self._chunk_event(ctx, editor.name, text + self.separator)
+                emitted += 1
+        finally:
+            for task in edits:
+                task.cancel()
+
+        final = self.separator.join(task.result() for task in edits)
+        output_key = getattr(editor, 'output_key', None)
+        yield Event(
+            invocation_id = ctx.invocation_id,
+            author = editor.name,
+            branch = ctx.branch,
+            content = types.Content(role = 'model', parts = [types.Part(text = final)]),
+            actions = EventActions(state_delta = {output_key: final} if output_key else {}),
+        )
+
+
+_PARAGRAPH = ('Remote teams thrive when routines are written down and shared early, '
+              'so new people can find their footing without waiting for a meeting. ') * 3
+
+
+def _pipeline(streaming: bool, paragraphs: int, seconds_per_word: float) -> BaseAgent:
+    """Outline, writer and editor on fake models whose latency grows with output."""
+    from shared.fake_llm import FakeGemini, FakeTurn
+
+    def reply(text: str) -> FakeTurn:
+        return FakeTurn(text = text, delay = 0.1 + seconds_per_word * len(text.split()))
+
+    def editor(llm_request: Any) -> FakeTurn:
+        instruction = str(llm_request.config.system_instruction)
+        return reply(instruction.split('Edit this draft:', 1)[-1].strip())
+
+    def fake(responder: Any) -> FakeGemini:
+        return FakeGemini(model = 'gemini-2.5-flash-lite', responder = responder,
+                          stream_chunks = 40)
+
+    outline = LlmAgent(name = 'OutlineAgent', output_key = 'blog_outline',
+                       instruction = 'Outline the topic.',
+                       model = fake(lambda request: reply('# Title\n\n- Hook\n- Sections')))
+    writer = LlmAgent(name = 'WriterAgent', output_key = 'blog_draft',
+                      instruction = 'Write from {blog_outline}',
+                      model = fake(lambda request: reply('\n\n'.join([_PARAGRAPH] * paragraphs))))
+    edit = LlmAgent(name = 'EditorAgent', output_key = 'final_blog',
+                    instruction = 'Edit this draft: {blog_draft}', include_contents = 'none',
+                    model = fake(editor))
+    if streaming:
+        return StreamingPipelineAgent(name = 'BlogPipeline', chunk_key = 'blog_draft',
+                                      sub_agents = [outline, writer, edit])
+    return SequentialAgent(name = 'BlogPipeline', sub_agents = [outline, writer, edit])
+
+
+async def _measure(agent: BaseAgent, runs: int) -> Dict[str, Optional[float]]:
+    from google.adk.runners import InMemoryRunner
+
+    runner = InMemoryRunner(agent = agent, app_name = 'sequential_blogger')
+    first_byte, first_edit, total = [], [], []
+    for _ in range(runs):
+        session = await runner.session_service.create_session(
+            app_name = 'sequential_blogger', user_id = 'bench'
+        )
+        message = types.Content(role = 'user', parts = [types.Part(text = 'Remote work')])
+        started = time.perf_counter()
+        seen_byte = seen_edit = None
+        async for event in runner.run_async(user_id = 'bench', session_id = session.id,
+                                            new_message = message):
+            if _text(event):
+                now = time.perf_counter() - started
+                seen_byte = seen_byte if seen_byte is not None else now
+                if event.author == 'EditorAgent' and seen_edit is None:
+                    seen_edit = now
+        first_byte.append(seen_byte)
+        first_edit.append(seen_edit)
+        total.append(time.perf_counter() - started)
+    return {
+        'first_byte_s': round(sum(first_byte) / runs, 3),
+        'first_edited_byte_s': round(sum(first_edit) / runs, 3),
+        'total_s': round(sum(total) / runs, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'SequentialAgent versus StreamingPipelineAgent')
+    parser.add_argument('--runs', type = int, default = 5)
+    parser.add_argument('--paragraphs', type = int, default = 5)
+    parser.add_argument('--seconds-per-word', type = float, default = 0.004)
+    args = parser.parse_args()
+
+    for streaming in (False, True):
+        agent = _pipeline(streaming, args.paragraphs, args.seconds_per_word)
+        result = asyncio.run(_measure(agent, args.runs))
+        print({'pipeline': type(agent).__name__, **result})
+
+
+if __name__ == '__main__':
+    main()
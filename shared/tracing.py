@@ -0,0 +1,328 @@
+"""Low-overhead span tracing for ADK runners, installed as a plugin.
+
+`LoggingPlugin` formats every callback and prints it synchronously, which
+costs time on the hot path and leaves nothing to analyse afterwards.
+`TracingPlugin` records one span per invocation, agent run, model call and
+tool call as a small dict in a preallocated ring buffer. A background thread
+appends the buffer to a JSONL file every `flush_interval` seconds, so no
+callback formats or writes anything. If the writer falls a full ring behind,
+the oldest spans are dropped and counted.
+
+Spans whose after_* callback never runs, such as a branch cancelled by
+`DeadlineParallelAgent`, are ended with status 'cancelled' when their
+invocation ends, together with those of runs nested under it with an
+invocation id of the form `<invocation_id>.<suffix>`, such as
+`StreamingPipelineAgent` chunk edits. Invocations whose runner generator was
+closed early are ended the same way on `close`.
+
+Model spans split wall time into queue wait (time spent waiting for the
+shared governor's rate limit and concurrency slot) and model time, and carry
+token counts from `usage_metadata` and payload sizes.
+
+Summarize a trace file per agent with:
+
+    python -m shared.tracing traces.jsonl
+"""
+
+import argparse
+import atexit
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from shared.benchmark import percentile
+from shared.governor import current_call
+
+DEFAULT_TRACE_PATH = 'traces.jsonl'
+
+
+def _text_bytes(contents: Any) -> int:
+    """Characters in the text parts of a content list; a cheap stand-in for bytes."""
+    total = 0
+    for content in contents or ():
+        for part in content.parts or ():
+            if part.text:
+                total += len(part.text)
+    return total
+
+
+class TracingPlugin(BasePlugin):
+    """Records invocation, agent, model and tool spans to a JSONL file.
+
+    Example:
+        >>> runner = InMemoryRunner(agent = root_agent, plugins = [TracingPlugin()])
+
+    Args:
+        path: JSONL file the spans are appended to.
+        capacity: Spans the ring buffer holds between flushes.
+        flush_interval: Seconds between background flushes.
+    """
+
+    def __init__(
+            self,
+            name: str = 'tracing',
+            path: str = DEFAULT_TRACE_PATH,
+            capacity: int = 65_536,
+            flush_interval: float = 1.0,
+    ):
+        super().__init__(name)
+        self.path = path
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self._ring: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._written = 0
+        self._flushed = 0
+        self._open: Dict[Tuple[str, ...], Tuple[float, float, Any]] = {}
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._stats = {'spans': 0, 'dropped': 0, 'flushes': 0, 'overhead_s': 0.0}
+        atexit.register(self.close)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+    # ---- recording ----
+
+    def _begin(self, key: Tuple[str, ...], extra: Any = None) -> None:
+        self._open[key] = (time.time(), time.perf_counter(), extra)
+
+    def _end(self, key: Tuple[str, ...], kind: str, agent: str, name: str,
+             **attributes: Any) -> Optional[Any]:
+        opened = self._open.pop(key, None)
+        if opened is None:
+            return None
+        wall_start, started, extra = opened
+        span = {
+            'kind': kind,
+            'invocation_id': key[0],
+            'agent': agent,
+            'name': name,
+            'start': wall_start,
+            'duration_s': time.perf_counter() - started,
+            **attributes,
+        }
+        self._ring[self._written % self.capacity] = span
+        self._written += 1
+        self._stats['spans'] += 1
+        if self._writer is None:
+            self._writer = threading.Thread(target = self._run_writer, daemon = True,
+                                            name = 'trace-writer')
+            self._writer.start()
+        return span
+
+    def _cancel_open(self, invocation_id: Optional[str] = None) -> None:
+        """Ends the open spans of an invocation and its nested runs, or all spans, as 'cancelled'."""
+        nested = f'{invocation_id}.'
+        for key in [k for k in self._open
+                    if invocation_id is None or k[0] == invocation_id or k[0].startswith(nested)]:
+            extra = self._open[key][2]
+            if len(key) == 1:
+                kind, (agent, name) = 'invocation', extra
+            elif key[1] == 'tool':
+                kind, (agent, name) = 'tool', extra
+            elif key[-1] == 'model':
+                kind, agent, name = 'model', key[1], extra.get('model') or ''
+            else:
+                kind, agent, name = 'agent', key[1], key[1]
+            self._end(key, kind, agent, name, status = 'cancelled')
+
+    # ---- flushing ----
+
+    def _run_writer(self) -> None:
+        while not self._wake.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        """Appends buffered spans to the trace file; returns how many."""
+        with self._flush_lock:
+            end = self._written
+            start = self._flushed
+            if end - start > self.capacity:
+                self._stats['dropped'] += end - start - self.capacity
+                start = end - self.capacity
+            if start == end:
+                return 0
+            lines = [
+                json.dumps(self._ring[i % self.capacity], default = str, separators = (',', ':'))
+                for i in range(start, end)
+            ]
+            with open(self.path, 'a', encoding = 'utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            self._flushed = end
+            self._stats['flushes'] += 1
+            return end - start
+
+    def close(self) -> None:
+        """Ends spans still open as 'cancelled', stops the writer and flushes what is left."""
+        self._cancel_open()
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        self.flush()
+        self._wake.clear()
+
+    # ---- callbacks ----
+
+    async def before_run_callback(self, *, invocation_context: InvocationContext) -> None:
+        t0 = time.perf_counter()
+        self._begin((invocation_context.invocation_id,),
+                    (invocation_context.agent.name, invocation_context.app_name))
+        self._stats['overhead_s'] += time.perf_counter() - t0
+
+    async def after_run_callback(self, *, invocation_context: InvocationContext) -> None:
+        t0 = time.perf_counter()
+        self._end((invocation_context.invocation_id,), 'invocation',
+                  invocation_context.agent.name, invocation_context.app_name,
+                  user_id = invocation_context.user_id)
+        self._cancel_open(invocation_context.invocation_id)
+        self._stats['overhead_s'] += time.perf_counter() - t0
+
+    async def before_agent_callback(self, *, agent: BaseAgent,
+                                    callback_context: CallbackContext) -> None:
+        t0 = time.perf_counter()
+        self._begin((callback_context.invocation_id, agent.name))
+        self._stats['overhead_s'] += time.perf_counter() - t0
+
+    async def after_agent_callback(self, *, agent: BaseAgent,
+                                   callback_context: CallbackContext) -> None:
+        t0 = time.perf_counter()
+        invocation_id = callback_context.invocation_id
+        self._end((invocation_id, agent.name), 'agent', agent.name, agent.name)
+        # A model call answered by another plugin (e.g. a response cache)
+        # never reaches after_model_callback.
+        self._open.pop((invocation_id, agent.name, 'model'), None)
+        self._stats['overhead_s'] += time.perf_counter() - t0
+
+    async def before_model_callback(self, *, callback_context: CallbackContext,
+                                    llm_request: LlmRequest) -> None:
+        t0 = time.perf_counter()
+        call = {'request_bytes': _text_bytes(llm_request.contents), 'model': llm_request.model}
+        current_call.set(call)
+        self._begin((callback_context.invocation_id, callback_context.agent_name, 'model'), call)
+        self._stats['overhead_s'] += time.perf_counter() - t0
+
+    def _end_model(self, callback_context: CallbackContext,
+                   llm_response: Optional[LlmResponse], error: Optional[Exception]) -> None:
+        key = (callback_context.invocation_id, callback_context.agent_name, 'model')
+        call = (self._open.get(key) or (None, None, None))[2] or {}
+        current_call.set(None)
+        usage = llm_response.usage_metadata if llm_response is not None else None
+        content = llm_response.content if llm_response is not None else None
+        span = self._end(
+            key, 'model', callback_context.agent_name, call.get('model') or '',
+            queue_wait_s = call.get('queue_wait_s', 0.0),
+            attempts = call.get('attempts', 1),
+            prompt_tokens = usage.prompt_token_count if usage else None,
+            output_tokens = usage.candidates_token_count if usage else None,
+            cached_tokens = usage.cached_content_token_count if usage else None,
+            request_bytes = call.get('request_bytes', 0),
+            response_bytes = _text_bytes([content] if content else None),
+            error = repr(error) if error is not None else None,
+        )
+        if span is not None:
+            span['model_s'] = span['duration_s'] - span['queue_wait_s']
+
+    async def after_model_callback(self, *, callback_context: CallbackContext,
+                                   llm_response: LlmResponse) -> None:
+        if llm_response.partial:
+            return None
+        t0 = time.perf_counter()
+        self._end_model(callback_context, llm_response, None)
+        self._stats['overhead_s'] += time.perf_counter() - t0
+
+    async def on_model_error_callback(self, *, callback_context: CallbackContext,
+                                      llm_request: LlmRequest, error: Exception) -> None:
+        t0 = time.perf_counter()
+        self._end_model(callback_context, None, error)
+        self._stats['overhead_s'] += time.perf_counter() - t0
+
+    async def before_tool_callback(self, *, tool: BaseTool, tool_args: Dict[str, Any],
+                                   tool_context: ToolContext) -> None:
+        t0 = time.perf_counter()
+        self._begin((tool_context.invocation_id, 'tool', tool_context.function_call_id or tool.name),
+                    (tool_context.agent_name, tool.name))
+        self._stats['overhead_s'] += time.perf_counter() - t0
+
+    async def after_tool_callback(self, *, tool: BaseTool, tool_args: Dict[str, Any],
+                                  tool_context: ToolContext, result: Dict) -> None:
+        t0 = time.perf_counter()
+        self._end((tool_context.invocation_id, 'tool', tool_context.function_call_id or tool.name),
+                  'tool', tool_context.agent_name, tool.name,
+                  result_bytes = len(result) if isinstance(result, (str, bytes)) else len(str(result)))
+        self._stats['overhead_s'] += time.perf_counter() - t0
+
+    async def on_tool_error_callback(self, *, tool: BaseTool, tool_args: Dict[str, Any],
+                                     tool_context: ToolContext, error: Exception) -> None:
+        t0 = time.perf_counter()
+        self._end((tool_context.invocation_id, 'tool', tool_context.function_call_id or tool.name),
+                  'tool', tool_context.agent_name, tool.name, error = repr(error))
+        self._stats['overhead_s'] += time.perf_counter() - t0
+
+
+def summarize(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per-agent latency breakdown of a list of spans."""
+    by_agent: Dict[str, Dict[str, List[Dict[str, Any]]]] = defaultdict(lambda: defaultdict(list))
+    for span in spans:
+        by_agent[span['agent']][span['kind']].append(span)
+
+    def ms(values: List[float], q: float) -> float:
+        return round(percentile(values, q) * 1000, 1)
+
+    report = {}
+    for agent, kinds in sorted(by_agent.items()):
+        runs = [s['duration_s'] for s in kinds['agent'] or kinds['invocation']]
+        models = kinds['model']
+        tools = kinds['tool']
+        report[agent] = {
+            'runs': len(runs),
+            'cancelled': sum(1 for s in kinds['agent'] + models + tools if s.get('status') == 'cancelled'),
+            'p50_ms': ms(runs, 50),
+            'p95_ms': ms(runs, 95),
+            'model_calls': len(models),
+            'model_p50_ms': ms([s.get('model_s', s['duration_s']) for s in models], 50),
+            'model_p95_ms': ms([s.get('model_s', s['duration_s']) for s in models], 95),
+            'queue_wait_p95_ms': ms([s.get('queue_wait_s') or 0.0 for s in models], 95),
+            'model_errors': sum(1 for s in models if s.get('error')),
+            'tool_calls': len(tools),
+            'tool_p95_ms': ms([s['duration_s'] for s in tools], 95),
+            'prompt_tokens': sum(s.get('prompt_tokens') or 0 for s in models),
+            'output_tokens': sum(s.get('output_tokens') or 0 for s in models),
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Per-agent latency breakdown of a trace file')
+    parser.add_argument('path', nargs = '?', default = DEFAULT_TRACE_PATH)
+    parser.add_argument('--json', action = 'store_true', help = 'Print the report as JSON')
+    args = parser.parse_args()
+
+    with open(args.path, encoding = 'utf-8') as f:
+        spans = [json.loads(line) for line in f if line.strip()]
+    report = summarize(spans)
+    if args.json:
+        print(json.dumps(report, indent = 2))
+        return
+    columns = ('runs', 'p50_ms', 'p95_ms', 'model_calls', 'model_p95_ms',
+               'queue_wait_p95_ms', 'tool_calls', 'tool_p95_ms', 'prompt_tokens', 'output_tokens')
+    print(f"{'agent':<28}" + ''.join(f'{c:>18}' for c in columns))
+    for agent, row in report.items():
+        print(f'{agent:<28}' + ''.join(f'{row[c]:>18}' for c in columns))
+
+
+if __name__ == '__main__':
+    main()
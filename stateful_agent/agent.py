@@ -2,19 +2,14 @@ from typing import Any, Dict
 
 from google.adk.agents import Agent, LlmAgent
 from google.adk.apps.app import App, EventsCompactionConfig
-from google.adk.models.google_llm import Gemini
-from google.adk.sessions import DatabaseSessionService
+from shared.governor import GovernedGemini
 from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
 from google.adk.tools.tool_context import ToolContext
 from google.genai import types
 
-retry_config = types.HttpRetryOptions(
-    exp_base = 7,
-    http_status_codes = [429, 500, 503, 504],
-    initial_delay = 1,
-    attempts = 5,
-)
+from .compaction import BackgroundCompactionRunner
+from shared.session_store import SqliteSessionService
 
 APP_NAME = 'default'
 USER_ID = 'default'
@@ -50,9 +45,8 @@ def retrieve_user_info(tool_context: ToolContext) -> Dict[str, Any]:
 
 root_agent = LlmAgent(
     name = 'text_chat_bot',
-    model = Gemini(
+    model = GovernedGemini(
         model = 'gemini-2.5-flash-lite',
-        retry_options = retry_config
     ),
     description = """A chatbot wih persistent memory for recipes. * To record username and country when provided use `save_userinfo` tool. 
     * To fetch username and country when required use `retrieve_userinfo` tool.""",
@@ -68,11 +62,18 @@ research_app_compacting = App(
 
 #session_service = InMemorySessionService()
 
-db_url = 'sqlite:///my_agent_data.db'
-session_service = DatabaseSessionService(db_url = db_url)
+#db_url = 'sqlite:///my_agent_data.db'
+#session_service = DatabaseSessionService(db_url = db_url)
+
+# Sessions used to live in my_agent_data.db (DatabaseSessionService above). Copy
+# them over once with:
+#   python -m shared.session_store sqlite:///my_agent_data.db my_agent_sessions.db \
+#       --app research_app_compacting --app default
+session_service = SqliteSessionService(db_path = 'my_agent_sessions.db')
 
 #runner = Runner(agent = root_agent, app_name = APP_NAME, session_service = session_service)
 
-research_runner_compacting = Runner(
+# Summaries are produced after each turn is streamed, off the request path.
+research_runner_compacting = BackgroundCompactionRunner(
     app =research_app_compacting, session_service = session_service
 )
\ No newline at end of file
@@ -0,0 +1,269 @@
+"""Background event compaction for `research_app_compacting`.
+
+The stock Runner fires compaction as an unowned task on the session object of
+the turn that just finished. If the next turn starts before the summary is
+ready, both append to the same session and the summary lands on a stale copy
+(or trips the stale-session check of a database-backed service).
+
+`BackgroundCompactionRunner` owns the compaction instead:
+
+- it runs once the turn's last event has been streamed to the caller,
+- at most one compaction per session is in flight,
+- the summary is appended as a single event to a freshly loaded session, so
+  the next turn sees either no summary or the whole one,
+- if a turn is running on the session when the summary is ready, the summary
+  is dropped rather than racing that turn's appends; the interval is still
+  met, so compaction is retried after the next turn.
+
+Compare tail latency of inline versus background compaction offline with:
+
+    python -m stateful_agent.compaction --turns 30 --summary-latency 0.5
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Dict, List, Set, Tuple
+
+from google.genai import types
+
+from google.adk.apps.app import App, EventsCompactionConfig
+from google.adk.apps.llm_event_summarizer import LlmEventSummarizer
+from google.adk.events.event import Event
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.sessions.session import Session
+
+from shared.benchmark import DEFAULT_TOOL_ARGS, percentile
+from shared.fake_llm import FakeGemini, use_fake_model
+
+logger = logging.getLogger(__name__)
+
+SessionKey = Tuple[str, str, str]
+
+# Recent compactions kept for the lag and duration metrics.
+_METRICS_WINDOW = 1024
+
+
+def _is_compaction(event: Event) -> bool:
+    return bool(event.actions and event.actions.compaction)
+
+
+def events_to_compact(events: List[Event], config: EventsCompactionConfig) -> List[Event]:
+    """Events of the next sliding window, or [] if compaction is not due yet.
+
+    Compaction is due once `compaction_interval` invocations have finished
+    since the end of the last summary. The window covers those invocations
+    plus the `overlap_size` invocations before them, without earlier
+    summaries. This is the same selection the stock Runner makes.
+    """
+    last_end = 0.0
+    for event in reversed(events):
+        if _is_compaction(event) and event.actions.compaction.end_timestamp:
+            last_end = event.actions.compaction.end_timestamp
+            break
+
+    # Invocation ids in order of first appearance, with their last timestamp.
+    latest: Dict[str, float] = {}
+    for event in events:
+        if event.invocation_id and not _is_compaction(event):
+            latest[event.invocation_id] = max(latest.get(event.invocation_id, 0.0),
+                                              event.timestamp)
+    invocations = list(latest)
+    new = [inv for inv in invocations if latest[inv] > last_end]
+    if len(new) < config.compaction_interval:
+        return []
+
+    window = set(invocations[max(0, invocations.index(new[0]) - config.overlap_size):
+                             invocations.index(new[-1]) + 1])
+    first = next(i for i, event in enumerate(events) if event.invocation_id in window)
+    last = max(i for i, event in enumerate(events) if event.invocation_id == new[-1])
+    return [event for event in events[first:last + 1] if not _is_compaction(event)]
+
+
+class _GuardedAppend:
+    """Session service view that appends the summary only between turns."""
+
+    def __init__(self, runner: 'BackgroundCompactionRunner', key: SessionKey):
+        self._runner = runner
+        self._key = key
+        self.appended = False
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if self._runner._turn_running(self._key):
+            self._runner.metrics['skipped'] += 1
+            return event
+        # Turns may have completed while summarizing; append to the latest copy.
+        app_name, user_id, session_id = self._key
+        service = self._runner.session_service
+        latest = await service.get_session(
+            app_name = app_name, user_id = user_id, session_id = session_id
+        )
+        if latest is None or self._runner._turn_running(self._key):
+            self._runner.metrics['skipped'] += 1
+            return event
+        event = await service.append_event(session = latest, event = event)
+        self.appended = True
+        return event
+
+
+class BackgroundCompactionRunner(Runner):
+    """Runner that compacts session events off the request path.
+
+    Args:
+        app: App whose `events_compaction_config` drives compaction.
+        background: Run compaction after the turn is streamed (default). When
+            False the summary is produced before the turn's generator ends,
+            which reproduces inline compaction for comparison.
+        **kwargs: Passed through to `Runner`.
+    """
+
+    def __init__(self, *, app: App, background: bool = True, **kwargs: Any):
+        self.compaction_app = app
+        self.background = background
+        # The base Runner must not schedule its own compaction task.
+        super().__init__(
+            app = app.model_copy(update = {'events_compaction_config': None}), **kwargs
+        )
+        # Turns in progress per session; a session's key is dropped at zero.
+        self._active: Dict[SessionKey, int] = {}
+        self._compacting: Dict[SessionKey, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.metrics: Dict[str, Any] = {
+            'runs': 0, 'compacted': 0, 'skipped': 0, 'failed': 0,
+            'lag_s': deque(maxlen = _METRICS_WINDOW),
+            'duration_s': deque(maxlen = _METRICS_WINDOW),
+        }
+
+    def _turn_running(self, key: SessionKey) -> bool:
+        return key in self._active
+
+    async def run_async(
+            self, *, user_id: str, session_id: str, **kwargs: Any
+    ) -> AsyncGenerator[Event, None]:
+        key = (self.app_name, user_id, session_id)
+        self._active[key] = self._active.get(key, 0) + 1
+        try:
+            async for event in super().run_async(
+                user_id = user_id, session_id = session_id, **kwargs
+            ):
+                yield event
+        finally:
+            if self._active[key] == 1:
+                del self._active[key]
+            else:
+                self._active[key] -= 1
+
+        if not self.compaction_app.events_compaction_config or key in self._compacting:
+            return
+        task = asyncio.create_task(self._compact(key, time.perf_counter()))
+        self._compacting[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if not self.background:
+            await task
+
+    async def _compact(self, key: SessionKey, turn_ended: float) -> None:
+        app_name, user_id, session_id = key
+        started = time.perf_counter()
+        self.metrics['runs'] += 1
+        try:
+            session = await self.session_service.get_session(
+                app_name = app_name, user_id = user_id, session_id = session_id
+            )
+            if session is None:
+                return
+            config = self.compaction_app.events_compaction_config
+            events = events_to_compact(session.events, config)
+            if not events:
+                return
+            summarizer = config.summarizer or LlmEventSummarizer(
+                llm = self.compaction_app.root_agent.canonical_model
+            )
+            summary = await summarizer.maybe_summarize_events(events = events)
+            if summary is None:
+                return
+            guard = _GuardedAppend(self, key)
+            await guard.append_event(session, summary)
+            if guard.appended:
+                finished = time.perf_counter()
+                self.metrics['compacted'] += 1
+                self.metrics['lag_s'].append(finished - turn_ended)
+                self.metrics['duration_s'].append(finished - started)
+        except Exception:
+            self.metrics['failed'] += 1
+            logger.exception('Background compaction failed for session %s', session_id)
+        finally:
+            self._compacting.pop(key, None)
+
+    async def drain(self) -> None:
+        """Waits for all in-flight compactions, e.g. before shutdown."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions = True)
+
+    def compaction_metrics(self) -> Dict[str, Any]:
+        """Counters plus mean and max lag after the turn ended, over recent compactions."""
+        lag = self.metrics['lag_s']
+        return {
+            **{k: v for k, v in self.metrics.items() if not isinstance(v, deque)},
+            'lag_mean_s': round(sum(lag) / len(lag), 4) if lag else 0.0,
+            'lag_max_s': round(max(lag), 4) if lag else 0.0,
+        }
+
+
+async def _measure(background: bool, turns: int, model_latency: float,
+                   summary_latency: float, think_time: float) -> Dict[str, Any]:
+    # Imported here because agent.py builds its runner from this module.
+    from .agent import research_app_compacting
+
+    config = research_app_compacting.events_compaction_config.model_copy(update = {
+        'summarizer': LlmEventSummarizer(
+            llm = FakeGemini(model = 'gemini-2.5-flash-lite', latency = summary_latency,
+                             reply_text = 'Summary of the conversation so far.')
+        ),
+    })
+    app = research_app_compacting.model_copy(update = {'events_compaction_config': config})
+    with use_fake_model(app.root_agent, latency = model_latency, tool_args = DEFAULT_TOOL_ARGS):
+        runner = BackgroundCompactionRunner(
+            app = app, session_service = InMemorySessionService(), background = background
+        )
+        session = await runner.session_service.create_session(app_name = app.name, user_id = 'bench')
+        latencies = []
+        for turn in range(turns):
+            message = types.Content(role = 'user', parts = [types.Part(text = f'Turn {turn}')])
+            started = time.perf_counter()
+            async for _ in runner.run_async(
+                user_id = 'bench', session_id = session.id, new_message = message
+            ):
+                pass
+            latencies.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(think_time)
+        await runner.drain()
+    return {
+        'mode': 'background' if background else 'inline',
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        **runner.compaction_metrics(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Inline versus background compaction latency')
+    parser.add_argument('--turns', type = int, default = 30)
+    parser.add_argument('--model-latency', type = float, default = 0.05)
+    parser.add_argument('--summary-latency', type = float, default = 0.5)
+    parser.add_argument('--think-time', type = float, default = 1.0,
+                        help = 'Pause between user turns in seconds')
+    args = parser.parse_args()
+    for background in (False, True):
+        print(asyncio.run(_measure(
+            background, args.turns, args.model_latency, args.summary_latency,
+            args.think_time,
+        )))
+
+
+if __name__ == '__main__':
+    main()
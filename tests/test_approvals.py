@@ -0,0 +1,41 @@
+"""Tests for long_running_operations.approvals."""
+
+import time
+
+from long_running_operations.approvals import ApprovalStore
+
+
+def _stores(tmp_path, lease = 60.0):
+    path = str(tmp_path / 'approvals.db')
+    first = ApprovalStore(path, lease = lease, owner = 'first')
+    second = ApprovalStore(path, lease = lease, owner = 'second')
+    first._conn.execute(
+        'INSERT INTO approvals (approval_id, invocation_id, app_name, user_id, session_id,'
+        " payload, created_at) VALUES ('a-1', 'e-1', 'app', 'user', 'session', '{}', ?)",
+        (time.time(),),
+    )
+    return first, second
+
+
+def test_live_claim_is_not_requeued_or_taken_over(tmp_path):
+    first, second = _stores(tmp_path)
+    assert [a.approval_id for a in first.claim(['a-1'], True)] == ['a-1']
+
+    assert second.requeue_claimed() == 0
+    assert second.list_pending() == []
+    assert second.claim(['a-1'], True) == []
+    assert not second.finish('a-1', True)
+    assert first.finish('a-1', True)
+    assert first.counts() == {'approved': 1}
+
+
+def test_expired_claim_is_taken_over(tmp_path):
+    first, second = _stores(tmp_path, lease = 0.05)
+    first.claim(['a-1'], True)
+    time.sleep(0.1)
+
+    assert [a.approval_id for a in second.list_pending()] == ['a-1']
+    assert [a.claimed_by for a in second.claim(['a-1'], False)] == ['second']
+    assert not first.finish('a-1', True)
+    assert second.finish('a-1', False)
+    assert second.counts() == {'rejected': 1}
@@ -0,0 +1,36 @@
+"""Tests for stateful_agent.compaction."""
+
+import asyncio
+
+from google.genai import types
+
+from google.adk.sessions import InMemorySessionService
+
+from shared.benchmark import DEFAULT_TOOL_ARGS
+from shared.fake_llm import use_fake_model
+from stateful_agent.agent import research_app_compacting
+from stateful_agent.compaction import BackgroundCompactionRunner
+
+
+def test_finished_sessions_leave_no_active_turn_counts():
+    app = research_app_compacting.model_copy(update = {'events_compaction_config': None})
+    runner = BackgroundCompactionRunner(app = app, session_service = InMemorySessionService())
+
+    async def turn(session_id: str) -> None:
+        message = types.Content(role = 'user', parts = [types.Part(text = 'Hello')])
+        async for _ in runner.run_async(user_id = 'user', session_id = session_id,
+                                        new_message = message):
+            pass
+
+    async def run() -> None:
+        ids = []
+        for _ in range(5):
+            session = await runner.session_service.create_session(app_name = app.name,
+                                                                  user_id = 'user')
+            ids.append(session.id)
+        # Two concurrent turns on each session.
+        await asyncio.gather(*(turn(session_id) for session_id in ids * 2))
+
+    with use_fake_model(app.root_agent, latency = 0.01, tool_args = DEFAULT_TOOL_ARGS):
+        asyncio.run(run())
+    assert runner._active == {}
@@ -0,0 +1,41 @@
+"""Tests for persistent_mechanic.memory_store."""
+
+import math
+import random
+
+import numpy as np
+
+from persistent_mechanic.memory_store import MemoryRecord, _UserIndex
+
+
+def _exhaustive_scores(index: _UserIndex, terms):
+    n = len(index.records)
+    doc_len = index.doc_len.view()
+    avg_len = index.total_len / n
+    scores = np.zeros(n)
+    for term in set(terms) & index.postings.keys():
+        ids, tf = index.postings[term][0].view(), index.postings[term][1].view()
+        idf = math.log(1 + (n - ids.size + 0.5) / (ids.size + 0.5))
+        norm = tf + index.K1 * (1 - index.B + index.B * doc_len[ids] / avg_len)
+        scores[ids] += idf * tf * (index.K1 + 1) / norm
+    return scores
+
+
+def test_bm25_early_termination_returns_the_exact_top_k():
+    rng = random.Random(7)
+    common = ['car', 'engine', 'brake']
+    vocabulary = [f'part{i}' for i in range(300)]
+    index = _UserIndex(None)
+    for i in range(3000):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(1, 20))]
+        words += [word for word in common for _ in range(rng.randint(0, 2)) if rng.random() < 0.4]
+        index.add(MemoryRecord(str(i), 'session', None, ' '.join(words)))
+
+    for _ in range(200):
+        terms = rng.sample(common, rng.randint(0, 3)) + rng.sample(vocabulary, rng.randint(0, 3))
+        limit = rng.choice([1, 8, 32])
+        scores = _exhaustive_scores(index, terms)
+        expected = np.sort(scores[scores > 0])[::-1][:limit]
+        found = index.bm25(terms, limit)
+        assert len(found) == len(expected)
+        assert np.allclose(scores[found], expected, rtol = 1e-5)
@@ -0,0 +1,65 @@
+"""Tests for shared.response_cache."""
+
+import asyncio
+from types import SimpleNamespace
+
+from google.genai import types
+
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+from shared.response_cache import ResponseCachePlugin
+
+
+def _request(text: str) -> LlmRequest:
+    return LlmRequest(model = 'gemini-2.5-flash-lite',
+                      contents = [types.Content(role = 'user', parts = [types.Part(text = text)])])
+
+
+def _reply(text: str) -> LlmResponse:
+    return LlmResponse(content = types.Content(role = 'model', parts = [types.Part(text = text)]))
+
+
+def _text(response: LlmResponse) -> str:
+    return response.content.parts[0].text
+
+
+def test_concurrent_calls_by_one_agent_store_their_own_replies():
+    plugin = ResponseCachePlugin(db_path = None)
+    # Same agent and invocation, as in parallel paragraph edits.
+    context = SimpleNamespace(agent_name = 'EditorAgent', invocation_id = 'e-1')
+
+    async def call(text: str, delay: float) -> None:
+        assert await plugin.before_model_callback(
+            callback_context = context, llm_request = _request(text)) is None
+        # The slower call finishes last, after the other call has started.
+        await asyncio.sleep(delay)
+        await plugin.after_model_callback(callback_context = context,
+                                          llm_response = _reply(f'edited {text}'))
+
+    async def main() -> None:
+        await asyncio.gather(*(call(f'paragraph {i}', 0.01 * (5 - i)) for i in range(5)))
+        for i in range(5):
+            hit = await plugin.before_model_callback(
+                callback_context = context, llm_request = _request(f'paragraph {i}'))
+            assert hit is not None and _text(hit) == f'edited paragraph {i}'
+
+    asyncio.run(main())
+    assert plugin.stats()['stores'] == 5
+
+
+def test_failed_call_does_not_store_the_next_reply():
+    plugin = ResponseCachePlugin(db_path = None)
+    context = SimpleNamespace(agent_name = 'WriterAgent', invocation_id = 'e-1')
+
+    async def main() -> None:
+        await plugin.before_model_callback(callback_context = context,
+                                           llm_request = _request('draft'))
+        await plugin.on_model_error_callback(callback_context = context,
+                                             llm_request = _request('draft'),
+                                             error = RuntimeError('429'))
+        await plugin.after_model_callback(callback_context = context,
+                                          llm_response = _reply('unrelated'))
+
+    asyncio.run(main())
+    assert plugin.stats()['stores'] == 0
@@ -0,0 +1,71 @@
+"""Tests for shared.session_store."""
+
+import asyncio
+
+import pytest
+from google.genai import types
+
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.adk.sessions import InMemorySessionService
+
+from shared.session_store import SessionWriteError, SqliteSessionService
+
+
+def _event(text: str, **state) -> Event:
+    return Event(author = 'user', invocation_id = 'e-1',
+                 content = types.Content(role = 'user', parts = [types.Part(text = text)]),
+                 actions = EventActions(state_delta = state))
+
+
+def test_failed_commit_is_raised_by_the_next_flush_and_append(tmp_path, monkeypatch):
+    store = SqliteSessionService(db_path = str(tmp_path / 'sessions.db'))
+
+    def fail(batch):
+        raise OSError('disk I/O error')
+
+    async def run():
+        session = await store.create_session(app_name = 'app', user_id = 'user')
+        monkeypatch.setattr(store, '_commit', fail)
+        await store.append_event(session, _event('lost'))
+        with pytest.raises(SessionWriteError, match = 'disk I/O error'):
+            await store.flush()
+        await store.flush()
+
+        await store.append_event(session, _event('lost too'))
+        await asyncio.to_thread(store._queue.join)
+        with pytest.raises(SessionWriteError):
+            await store.append_event(session, _event('rejected'))
+        monkeypatch.undo()
+        await store.append_event(session, _event('kept'))
+        await store.flush()
+        return await store.get_session(app_name = 'app', user_id = 'user', session_id = session.id)
+
+    try:
+        session = asyncio.run(run())
+    finally:
+        store.close()
+    assert [event.content.parts[0].text for event in session.events] == ['kept']
+    assert store.stats['events_lost'] == 2
+
+
+def test_import_sessions_copies_events_and_state_once(tmp_path):
+    source = InMemorySessionService()
+    store = SqliteSessionService(db_path = str(tmp_path / 'sessions.db'))
+
+    async def run():
+        session = await source.create_session(app_name = 'app', user_id = 'user',
+                                               state = {'user:name': 'Sam', 'topic': 'jazz'})
+        await source.append_event(session, _event('hi', **{'app:greeting': 'hello'}))
+        copied = [await store.import_sessions(source, 'app') for _ in range(2)]
+        imported = await store.get_session(app_name = 'app', user_id = 'user',
+                                           session_id = session.id)
+        return copied, imported
+
+    try:
+        copied, imported = asyncio.run(run())
+    finally:
+        store.close()
+    assert copied == [1, 0]
+    assert imported.state == {'user:name': 'Sam', 'topic': 'jazz', 'app:greeting': 'hello'}
+    assert [event.content.parts[0].text for event in imported.events] == ['hi']
@@ -0,0 +1,70 @@
+"""Tests for shared.streaming_pipeline."""
+
+import asyncio
+
+from google.genai import types
+
+from google.adk.agents import LlmAgent
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.runners import InMemoryRunner
+
+from shared.fake_llm import FakeGemini, FakeTurn
+from shared.response_cache import ResponseCachePlugin
+from shared.streaming_pipeline import StreamingPipelineAgent
+
+PARAGRAPHS = [f'Paragraph {i} is about topic {i}.' for i in range(6)]
+
+
+def _pipeline() -> StreamingPipelineAgent:
+    def edit(llm_request):
+        instruction = str(llm_request.config.system_instruction)
+        chunk = instruction.split('Edit this draft:', 1)[-1].split('\n\n', 1)[0].strip()
+        index = PARAGRAPHS.index(chunk)
+        # Later paragraphs finish first, so replies arrive out of order.
+        return FakeTurn(text = f'Edited: {chunk}', delay = 0.01 * (len(PARAGRAPHS) - index))
+
+    writer = LlmAgent(name = 'WriterAgent', output_key = 'draft', instruction = 'Write.',
+                      model = FakeGemini(model = 'gemini-2.5-flash-lite', stream_chunks = 10,
+                                         responder = lambda request: FakeTurn(
+                                             text = '\n\n'.join(PARAGRAPHS))))
+    editor = LlmAgent(name = 'EditorAgent', output_key = 'final', include_contents = 'none',
+                      instruction = 'Edit this draft: {draft}',
+                      model = FakeGemini(model = 'gemini-2.5-flash-lite', responder = edit))
+    return StreamingPipelineAgent(name = 'Pipeline', chunk_key = 'draft',
+                                  max_concurrency = len(PARAGRAPHS), sub_agents = [writer, editor])
+
+
+class _EditorCalls(BasePlugin):
+    def __init__(self):
+        super().__init__('editor_calls')
+        self.invocation_ids = []
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        if callback_context.agent_name == 'EditorAgent':
+            self.invocation_ids.append(callback_context.invocation_id)
+
+
+def test_concurrent_chunk_edits_keep_their_own_replies_with_a_response_cache():
+    calls = _EditorCalls()
+    cache = ResponseCachePlugin(db_path = None)
+    runner = InMemoryRunner(agent = _pipeline(), app_name = 'pipeline', plugins = [calls, cache])
+
+    async def run_once() -> str:
+        session = await runner.session_service.create_session(app_name = 'pipeline',
+                                                               user_id = 'user')
+        message = types.Content(role = 'user', parts = [types.Part(text = 'Write')])
+        async for _ in runner.run_async(user_id = 'user', session_id = session.id,
+                                        new_message = message):
+            pass
+        session = await runner.session_service.get_session(
+            app_name = 'pipeline', user_id = 'user', session_id = session.id
+        )
+        return session.state['final']
+
+    expected = '\n\n'.join(f'Edited: {paragraph}' for paragraph in PARAGRAPHS)
+    assert asyncio.run(run_once()) == expected
+    # Plugins can tell the chunk runs apart.
+    assert len(set(calls.invocation_ids)) == len(PARAGRAPHS)
+    # The second run is served from the cache, one entry per chunk.
+    assert asyncio.run(run_once()) == expected
+    assert cache.stats()['memory_hits'] == len(PARAGRAPHS) + 1
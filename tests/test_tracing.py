@@ -0,0 +1,44 @@
+"""Tests for shared.tracing."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from google.genai import types
+
+from google.adk.models.llm_request import LlmRequest
+
+from shared.tracing import TracingPlugin
+
+
+def test_spans_left_open_by_a_cancelled_branch_end_with_the_invocation(tmp_path):
+    tracing = TracingPlugin(path = str(tmp_path / 'traces.jsonl'))
+    invocation = SimpleNamespace(invocation_id = 'e-1', agent = SimpleNamespace(name = 'Root'),
+                                 app_name = 'app', user_id = 'user')
+    branch = SimpleNamespace(invocation_id = 'e-1', agent_name = 'SlowAgent')
+    tool_context = SimpleNamespace(invocation_id = 'e-1', agent_name = 'SlowAgent',
+                                   function_call_id = 'call-1')
+    request = LlmRequest(model = 'gemini-2.5-flash-lite',
+                         contents = [types.Content(role = 'user', parts = [types.Part(text = 'hi')])])
+
+    async def run():
+        await tracing.before_run_callback(invocation_context = invocation)
+        await tracing.before_agent_callback(agent = SimpleNamespace(name = 'SlowAgent'),
+                                            callback_context = branch)
+        await tracing.before_model_callback(callback_context = branch, llm_request = request)
+        await tracing.before_tool_callback(tool = SimpleNamespace(name = 'search'), tool_args = {},
+                                           tool_context = tool_context)
+        # The branch is cancelled here, so none of its after_* callbacks run.
+        await tracing.after_run_callback(invocation_context = invocation)
+
+    asyncio.run(run())
+    tracing.close()
+
+    with open(tmp_path / 'traces.jsonl', encoding = 'utf-8') as f:
+        spans = {span['kind']: span for span in map(json.loads, f)}
+    assert tracing._open == {}
+    assert set(spans) == {'invocation', 'agent', 'model', 'tool'}
+    assert 'status' not in spans['invocation']
+    assert spans['agent']['status'] == 'cancelled'
+    assert (spans['model']['agent'], spans['model']['name']) == ('SlowAgent', 'gemini-2.5-flash-lite')
+    assert (spans['tool']['agent'], spans['tool']['name']) == ('SlowAgent', 'search')
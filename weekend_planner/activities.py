@@ -0,0 +1,177 @@
+"""Columnar activity table and local ranking for the weekend planner.
+
+The FactCheckerAgent returns activities as a list of dicts with a free-form
+`Price`. `ActivityTable` parses such a list once into NumPy columns (price,
+start hour, searchable text), so budget filtering is a vectorized mask and
+ranking never re-parses strings. Tables are cached by the content of the
+list, so filtering and ranking the same activities in one plan parse them
+once.
+
+`ActivityTable.rank` scores activities on budget fit, interests, novelty
+against past activities, and the time window. The planner then receives only
+the top-k candidates instead of the whole list.
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Non-numeric prices that pass every budget filter.
+OPEN_PRICES = ('free', 'tbd', 'n/a', 'contact for price')
+
+# Weights of the ranking criteria; each criterion scores in [0, 1].
+RANK_WEIGHTS = {
+    'budget': 1.0,
+    'interests': 2.0,
+    'novelty': 1.0,
+    'time_window': 1.0,
+}
+
+_TIME_RE = re.compile(r'\b(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?', re.IGNORECASE)
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def parse_price(price: Any) -> float:
+    """Parses a price like "$35" or "1,200 KES"; NaN if it is not numeric."""
+    try:
+        return float(str(price).replace('$', '').replace(',', '').split()[0])
+    except (ValueError, TypeError, IndexError):
+        return float('nan')
+
+
+def parse_start_hour(time_text: Any) -> float:
+    """Start hour of a time like "Sat 7:30 PM" as a float; NaN if absent."""
+    for match in _TIME_RE.finditer(str(time_text or '')):
+        hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+        if not meridiem and not match.group(2):
+            # A bare number is more likely a date than a time.
+            continue
+        if meridiem:
+            if hour > 12:
+                continue
+            hour = hour % 12 + (12 if meridiem.lower().startswith('p') else 0)
+        if hour < 24 and minute < 60:
+            return hour + minute / 60
+    return float('nan')
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+class ActivityTable:
+    """Activities as parallel columns with prices and start hours parsed once."""
+
+    def __init__(self, activities: Sequence[Dict[str, Any]]):
+        self.rows = list(activities)
+        self.price = np.array([parse_price(row.get('Price', 0)) for row in self.rows], dtype = float)
+        self.open_price = np.array(
+            [str(row.get('Price', 0)).lower() in OPEN_PRICES for row in self.rows], dtype = bool
+        )
+        self.start_hour = np.array(
+            [parse_start_hour(row.get('Time')) for row in self.rows], dtype = float
+        )
+        self.text = np.array([
+            ' '.join(_words(' '.join(str(value) for value in row.values())))
+            for row in self.rows
+        ], dtype = str)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def budget_mask(self, budget_preference: str, thresholds: Dict[str, Dict[str, float]]) -> Any:
+        """Rows within the budget band; open prices always pass.
+
+        An unknown preference applies no filtering.
+        """
+        band = thresholds.get(budget_preference.lower())
+        if not band:
+            return np.ones(len(self), dtype = bool)
+        with np.errstate(invalid = 'ignore'):
+            in_band = (self.price >= band.get('min_price', 0)) & (
+                self.price <= band.get('max_price', float('inf'))
+            )
+        return in_band | self.open_price
+
+    def filter(self, mask: Any) -> List[Dict[str, Any]]:
+        return [self.rows[i] for i in np.flatnonzero(mask)]
+
+    def _matches(self, phrases: Sequence[str]) -> Any:
+        """Fraction of `phrases` found in each row's text."""
+        if not phrases or not len(self):
+            return np.zeros(len(self))
+        hits = np.zeros(len(self))
+        for phrase in phrases:
+            needle = ' '.join(_words(phrase))
+            if needle:
+                hits += np.char.find(self.text, needle) >= 0
+        return hits / len(phrases)
+
+    def rank(
+            self,
+            preferences: Dict[str, Any],
+            thresholds: Dict[str, Dict[str, float]],
+            top_k: int = 8,
+            time_window: Optional[Sequence[float]] = None,
+            weights: Optional[Dict[str, float]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Returns the best `top_k` activities within budget, best first.
+
+        Each returned activity is a copy with its `Score` added.
+        """
+        weights = {**RANK_WEIGHTS, **(weights or {})}
+        budget = preferences.get('budget_preference') or ''
+        mask = self.budget_mask(budget, thresholds)
+        if not mask.any():
+            return []
+
+        band = thresholds.get(budget.lower(), {})
+        high = band.get('max_price', np.nanmax(self.price) if np.isfinite(self.price).any() else 1.0)
+        low = band.get('min_price', 0)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            # Cheaper within the band is better; open prices score mid-band.
+            budget_fit = np.where(
+                np.isnan(self.price), 0.5,
+                1.0 - np.clip((self.price - low) / max(high - low, 1.0), 0.0, 1.0),
+            )
+        interests = self._matches(preferences.get('interests') or [])
+        past = [
+            item.get('name', '') if isinstance(item, dict) else str(item)
+            for item in preferences.get('past_activities') or []
+        ]
+        novelty = 1.0 - np.minimum(self._matches(past) * max(len(past), 1), 1.0)
+        if time_window:
+            start, end = time_window
+            in_window = (self.start_hour >= start) & (self.start_hour <= end)
+            window_fit = np.where(np.isnan(self.start_hour), 0.5, in_window.astype(float))
+        else:
+            window_fit = np.ones(len(self))
+
+        score = (
+            weights['budget'] * budget_fit
+            + weights['interests'] * interests
+            + weights['novelty'] * novelty
+            + weights['time_window'] * window_fit
+        )
+        candidates = np.flatnonzero(mask)
+        order = candidates[np.argsort(-score[candidates], kind = 'stable')][:top_k]
+        return [{**self.rows[i], 'Score': round(float(score[i]), 3)} for i in order]
+
+
+_TABLES: 'OrderedDict[str, ActivityTable]' = OrderedDict()
+_MAX_TABLES = 64
+
+
+def activity_table(activities: Sequence[Dict[str, Any]]) -> ActivityTable:
+    """Returns the parsed table for `activities`, reusing a cached one."""
+    key = hashlib.sha1(repr(activities).encode('utf-8')).hexdigest()
+    table = _TABLES.get(key)
+    if table is None:
+        table = _TABLES[key] = ActivityTable(activities)
+        while len(_TABLES) > _MAX_TABLES:
+            _TABLES.popitem(last = False)
+    _TABLES.move_to_end(key)
+    return table
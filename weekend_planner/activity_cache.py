@@ -0,0 +1,226 @@
+"""Shared cache of sourced activities per location and date range.
+
+Sourcing a city's weekend runs the EventSourcingAgent (several searches) and
+the FactCheckerAgent, and many users plan the same city for the same weekend.
+`ActivityCache` keeps each result for `ttl` seconds. For `stale_ttl` seconds
+after that the stale result is still served while one background run
+refreshes it (stale-while-revalidate). Concurrent requests for a key that is
+being sourced wait for the same run instead of starting their own.
+
+`CachedAgentTool` puts the cache in front of an AgentTool, so a hit returns
+without running the wrapped agent or any agent it calls. Cached results are
+shared by every user, so the wrapped agent runs detached from the request
+that triggered it: in a session of its own, without that request's state or
+artifacts. A background refresh can outlive that request.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from google.genai import types
+from pydantic import BaseModel, Field
+
+from google.adk.agents import BaseAgent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import AgentTool, ToolContext
+
+from .routing import normalize_address
+
+ActivityKey = Tuple[str, str, str]
+
+_DATE_FORMATS = ('%Y/%m/%d', '%d/%m/%Y', '%B %d %Y', '%b %d %Y', '%d %B %Y', '%d %b %Y')
+
+
+class ActivitySearch(BaseModel):
+    """Input of the EventSourcingAgent when it is called as a tool."""
+    location: str = Field(description = 'City or area to find activities in')
+    start_date: str = Field(description = 'First day of the range, YYYY-MM-DD')
+    end_date: Optional[str] = Field(
+        default = None, description = 'Last day of the range, YYYY-MM-DD; defaults to start_date'
+    )
+
+
+def normalize_date(text: str) -> str:
+    """ISO date for common date spellings; otherwise the normalized text."""
+    text = ' '.join(str(text or '').replace(',', ' ').split())
+    try:
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        pass
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return text.lower()
+
+
+def activity_key(location: str, start_date: str, end_date: Optional[str] = None) -> ActivityKey:
+    start = normalize_date(start_date)
+    return normalize_address(location), start, normalize_date(end_date) if end_date else start
+
+
+def parse_activities(text: Any) -> Any:
+    """The JSON activity list in an agent reply; the reply itself if there is none."""
+    if not isinstance(text, str):
+        return text
+    candidates = [text.strip().removeprefix('```json').removeprefix('```').removesuffix('```')]
+    start, end = text.find('['), text.rfind(']')
+    if 0 <= start < end:
+        candidates.append(text[start:end + 1])
+    for candidate in candidates:
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(value, dict) and isinstance(value.get('activities'), list):
+            value = value['activities']
+        if isinstance(value, list):
+            return value
+    return text
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fetched_at: float
+
+
+class ActivityCache:
+    """TTL cache with stale-while-revalidate and request coalescing.
+
+    Args:
+        ttl: Seconds a result is served without refreshing.
+        stale_ttl: Further seconds a result is served while it is refreshed.
+        max_entries: Keys kept; the least recently used are evicted.
+    """
+
+    def __init__(self, ttl: float = 6 * 3600, stale_ttl: float = 18 * 3600,
+                 max_entries: int = 1024):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[ActivityKey, _Entry]' = OrderedDict()
+        self._inflight: Dict[ActivityKey, asyncio.Task] = {}
+        self.stats = {'hits': 0, 'stale': 0, 'misses': 0, 'coalesced': 0, 'refreshes': 0,
+                      'errors': 0}
+
+    async def get(self, key: ActivityKey,
+                  source: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """Returns (value, status), calling `source` only when needed.
+
+        Status is 'hit', 'stale', 'coalesced' or 'miss'. Errors from `source`
+        reach the callers waiting for that run; a stale value is kept if its
+        refresh fails.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                if age < self.ttl:
+                    self.stats['hits'] += 1
+                    return entry.value, 'hit'
+                self.stats['stale'] += 1
+                if key not in self._inflight:
+                    self._start(key, source)
+                return entry.value, 'stale'
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+            status = 'coalesced'
+        else:
+            self.stats['misses'] += 1
+            task, status = self._start(key, source), 'miss'
+        # A cancelled caller must not cancel the run others are waiting for.
+        return await asyncio.shield(task), status
+
+    def _start(self, key: ActivityKey, source: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = asyncio.ensure_future(self._source(key, source))
+        self._inflight[key] = task
+
+        def done(finished: asyncio.Task) -> None:
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            if not finished.cancelled() and finished.exception() is not None:
+                self.stats['errors'] += 1
+
+        task.add_done_callback(done)
+        return task
+
+    async def _source(self, key: ActivityKey, source: Callable[[], Awaitable[Any]]) -> Any:
+        value = await source()
+        self.stats['refreshes'] += 1
+        # Empty results are not cached, so the next request retries.
+        if value:
+            self._entries[key] = _Entry(value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last = False)
+        return value
+
+    def invalidate(self, location: str, start_date: str, end_date: Optional[str] = None) -> None:
+        self._entries.pop(activity_key(location, start_date, end_date), None)
+
+    def clear(self) -> None:
+        """Drops every cached result; runs in flight still complete."""
+        self._entries.clear()
+
+
+class CachedAgentTool(AgentTool):
+    """AgentTool for an agent with an `ActivitySearch` input, served from a cache.
+
+    Returns {'activities': ..., 'cache': status}, with the activities parsed
+    from the agent's JSON reply where possible. Only those activities reach
+    the caller; the wrapped agent's state changes and artifacts stay in its
+    detached session.
+    """
+
+    USER_ID = 'activity_cache'
+
+    def __init__(self, agent: BaseAgent, cache: ActivityCache, skip_summarization: bool = False):
+        super().__init__(agent = agent, skip_summarization = skip_summarization)
+        self.cache = cache
+        self._sessions = InMemorySessionService()
+        self._runner = Runner(app_name = agent.name, agent = agent,
+                              session_service = self._sessions)
+
+    async def _source(self, search: ActivitySearch) -> Any:
+        """Runs the wrapped agent in a new session and parses its last reply."""
+        session = await self._sessions.create_session(app_name = self._runner.app_name,
+                                                      user_id = self.USER_ID)
+        message = types.Content(role = 'user', parts = [
+            types.Part(text = search.model_dump_json(exclude_none = True))
+        ])
+        last_content = None
+        try:
+            async for event in self._runner.run_async(user_id = self.USER_ID,
+                                                      session_id = session.id,
+                                                      new_message = message):
+                if event.content:
+                    last_content = event.content
+        finally:
+            await self._sessions.delete_session(app_name = self._runner.app_name,
+                                                user_id = self.USER_ID, session_id = session.id)
+        if not last_content or not last_content.parts:
+            return ''
+        return parse_activities('\n'.join(p.text for p in last_content.parts if p.text))
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        search = ActivitySearch.model_validate(args)
+        if self.skip_summarization:
+            tool_context.actions.skip_summarization = True
+
+        activities, status = await self.cache.get(
+            activity_key(search.location, search.start_date, search.end_date),
+            lambda: self._source(search),
+        )
+        return {'activities': activities, 'cache': status}
@@ -1,20 +1,20 @@
 from google.adk.agents.llm_agent import Agent
-from google.adk.models.google_llm import Gemini
+from shared.governor import GovernedGemini
 from google.genai import types
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
-from google.adk.tools import AgentTool, FunctionTool, google_search, google_maps_grounding, ToolContext
-from typing import List, Dict, Any
+from google.adk.tools import AgentTool, FunctionTool, ToolContext, google_maps_grounding
+from typing import List, Dict, Any, Optional
 import json
 import os
 
-# HTTP Retry Configuration
-retry_config = types.HttpRetryOptions(
-    exp_base=7,
-    http_status_codes=[429, 500, 503, 504],
-    attempts=5,
-    initial_delay=1,
-)
+from shared.local_search import search_tool
+
+from .activities import activity_table
+from .activity_cache import ActivityCache, ActivitySearch, CachedAgentTool
+from .preferences import PreferenceStore
+from .routing import DistanceCache, optimize_route
+from .workflow import build_workflow
 
 # Budget thresholds for filtering
 BUDGET_THRESHOLDS = {
@@ -23,67 +23,78 @@ BUDGET_THRESHOLDS = {
     'high-end': {'min_price': 5001}
 }
 
-# Simple in-memory storage for user preferences (replace with actual database in production)
-USER_PREFERENCES_STORE = {}
+# Travel legs between addresses, persisted across runs
+route_cache = DistanceCache(db_path='route_cache.db')
+
+# User preferences, persisted across runs with an in-memory LRU in front
+preference_store = PreferenceStore(db_path='user_preferences.db')
+
+# Sourced activities per (location, date range), shared by all users
+activity_cache = ActivityCache()
 
 # ==================== TOOL FUNCTIONS ====================
 
-def filter_by_budget(ctx: ToolContext, activities: List[Dict], budget_preference: str) -> List[Dict]:
+def filter_by_budget(tool_context: ToolContext, activities: List[Dict[str, Any]], budget_preference: str) -> List[Dict[str, Any]]:
     """
     Filters a list of activities based on the user's budget preference 
     ('low budget', 'mid-range', 'high-end').
     
     Args:
-        ctx: Tool context
+        tool_context: Tool context
         activities: List of activity dictionaries
         budget_preference: Budget category as string
         
     Returns:
         Filtered list of activities matching the budget
     """
-    preference = budget_preference.lower()
-    thresholds = BUDGET_THRESHOLDS.get(preference)
-    
-    if not thresholds:
-        # Fail gracefully: If preference is unknown, no filtering is applied
-        return activities 
+    table = activity_table(activities)
+    # Unknown preferences and open prices ('Free', 'TBD') pass the filter.
+    return table.filter(table.budget_mask(budget_preference, BUDGET_THRESHOLDS))
+
 
-    filtered_activities = []
+def rank_activities(
+    tool_context: ToolContext,
+    activities: List[Dict[str, Any]],
+    user_preferences: Dict[str, Any],
+    top_k: int = 8,
+    earliest_hour: Optional[float] = None,
+    latest_hour: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Filters activities by budget and ranks them by budget fit, interests,
+    novelty against past activities and the time window.
     
-    for activity in activities:
-        price = activity.get('Price', 0) 
+    Args:
+        tool_context: Tool context
+        activities: List of activity dictionaries
+        user_preferences: Preferences with budget_preference, interests and past_activities
+        top_k: Number of activities to return
+        earliest_hour: Earliest start hour of the day to prefer (0-24), optional
+        latest_hour: Latest start hour of the day to prefer (0-24), optional
         
-        try:
-            # Safely parse the price string (e.g., "$35" -> 35.0)
-            price_str = str(price).replace('$', '').replace(',', '').split()[0]
-            price_value = float(price_str)
-        except (ValueError, TypeError, IndexError):
-            # Treat non-numeric (e.g., 'Free', 'TBD') as passing low/mid-range filters
-            if str(price).lower() in ['free', 'tbd', 'n/a', 'contact for price']:
-                filtered_activities.append(activity)
-            continue 
-
-        min_p = thresholds.get('min_price', 0)
-        max_p = thresholds.get('max_price', float('inf'))
-
-        if min_p <= price_value <= max_p:
-            filtered_activities.append(activity)
-            
-    return filtered_activities
+    Returns:
+        Up to top_k activities, best first, each with an added 'Score'
+    """
+    time_window = None
+    if earliest_hour is not None or latest_hour is not None:
+        time_window = (earliest_hour or 0, 24 if latest_hour is None else latest_hour)
+    return activity_table(activities).rank(
+        user_preferences, BUDGET_THRESHOLDS, top_k = top_k, time_window = time_window
+    )
 
 
-def retrieve_user_preferences(ctx: ToolContext, user_id: str) -> Dict[str, Any]:
+def retrieve_user_preferences(tool_context: ToolContext, user_id: str) -> Dict[str, Any]:
     """
     Retrieves stored user preferences from the memory store.
     
     Args:
-        ctx: Tool context
+        tool_context: Tool context
         user_id: Unique identifier for the user
         
     Returns:
         Dictionary containing user preferences or empty dict if not found
     """
-    preferences = USER_PREFERENCES_STORE.get(user_id, {})
+    preferences = preference_store.get(user_id)
     
     if not preferences:
         # Return default preferences if none exist
@@ -99,12 +110,12 @@ def retrieve_user_preferences(ctx: ToolContext, user_id: str) -> Dict[str, Any]:
     return preferences
 
 
-def save_user_preferences(ctx: ToolContext, user_id: str, preferences: Dict[str, Any]) -> Dict[str, str]:
+def save_user_preferences(tool_context: ToolContext, user_id: str, preferences: Dict[str, Any]) -> Dict[str, Any]:
     """
     Saves user preferences to the memory store.
     
     Args:
-        ctx: Tool context
+        tool_context: Tool context
         user_id: Unique identifier for the user
         preferences: Dictionary of user preferences to save
         
@@ -112,17 +123,13 @@ def save_user_preferences(ctx: ToolContext, user_id: str, preferences: Dict[str,
         Status message indicating success or failure
     """
     try:
-        # Merge with existing preferences
-        existing = USER_PREFERENCES_STORE.get(user_id, {})
-        existing.update(preferences)
-        existing['user_id'] = user_id
-        
-        USER_PREFERENCES_STORE[user_id] = existing
+        # Merge with existing preferences; only changed fields are written
+        saved = preference_store.merge(user_id, {**preferences, 'user_id': user_id})
         
         return {
             'status': 'success',
             'message': f'Preferences saved for user {user_id}',
-            'saved_preferences': existing
+            'saved_preferences': saved
         }
     except Exception as e:
         return {
@@ -131,12 +138,67 @@ def save_user_preferences(ctx: ToolContext, user_id: str, preferences: Dict[str,
         }
 
 
+def plan_day_route(
+    tool_context: ToolContext,
+    stops: List[Dict[str, Any]],
+    day_start_hour: float = 9.0,
+) -> Dict[str, Any]:
+    """
+    Orders one day's stops to minimize travel time while respecting time windows,
+    and returns the travel segments between consecutive stops.
+    
+    Args:
+        tool_context: Tool context
+        stops: List of stops, each with 'address' and optionally 'latitude', 'longitude',
+               'duration_minutes', 'earliest_hour' and 'latest_hour'. The first stop is
+               where the day starts.
+        day_start_hour: Hour of day (0-24) the first stop begins
+        
+    Returns:
+        Dictionary with 'ordered_stops' (address, arrival, departure), 'segments'
+        (start_address, end_address, travel_time_minutes, distance_km), totals and
+        'missing_legs', the address pairs with no known travel time or coordinates
+    """
+    return optimize_route(stops, route_cache, day_start_hour = day_start_hour)
+
+
+def record_travel_legs(
+    tool_context: ToolContext,
+    segments: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Stores measured travel segments so plan_day_route uses them instead of estimates.
+    
+    Args:
+        tool_context: Tool context
+        segments: Segments from the GeospatialAgent, each with 'start_address',
+                  'end_address', 'travel_time_minutes' and optionally 'distance_km'
+        
+    Returns:
+        Dictionary with the number of segments recorded and any that were skipped
+    """
+    recorded, skipped = 0, []
+    for segment in segments:
+        try:
+            distance = segment.get('distance_km')
+            route_cache.record_leg(
+                str(segment['start_address']),
+                str(segment['end_address']),
+                None if distance is None else float(distance),
+                float(segment['travel_time_minutes']),
+            )
+            recorded += 1
+        except (KeyError, TypeError, ValueError) as e:
+            skipped.append({'segment': segment, 'error': str(e)})
+    return {'status': 'success', 'recorded': recorded, 'skipped': skipped}
+
+
 # ==================== SPECIALIZED AGENTS ====================
 
 # Fact Checker Specialist Agent
 fact_checker_specialist = Agent(
     name="FactCheckerAgent",
-    model=Gemini(model="gemini-2.0-flash-exp"),
+    model=GovernedGemini(model="gemini-2.0-flash-exp"),
     instruction="""
     Your sole task is to take raw, unstructured event data (text) and convert it into a clean, 
     predictable JSON list. The required schema is a list of objects, each containing: 
@@ -145,42 +207,42 @@ fact_checker_specialist = Agent(
     - 'Price' (string or number): Cost in local currency or 'Free', 'TBD'
     - 'Time' (string): Date and time of the event
     - 'URL' (string): Web link to more information
+    - 'Latitude', 'Longitude' (number, optional): Coordinates of the address, if known
     
     If data is missing (e.g., Price), try to infer it from context or mark it as 'TBD' or 
     'Contact for Price'. Always prioritize accuracy over completeness.
     """,
-    tools=[google_search],
+    tools=[search_tool()],
     description="Specialist agent for fact-checking and structuring event data"
 )
 
-# Geospatial Agent for route optimization
+# Geospatial Agent, asked only for legs the route cache cannot answer
 geospatial_agent = Agent(
     name="GeospatialAgent",
-    model=Gemini(model='gemini-2.0-flash-exp'),
+    model=GovernedGemini(model='gemini-2.0-flash-exp'),
     instruction="""
-    Your sole task is to calculate the most efficient travel route, distance, and estimated 
-    time (in minutes) between a given list of sequential stops (addresses). 
+    Your sole task is to find the travel distance and estimated time (in minutes) between 
+    each given pair of addresses.
     
     Use the 'google_maps_grounding' tool to get accurate travel information.
     
     Return the result as a structured JSON list of segments, each including:
-    - 'start_address': Starting location
-    - 'end_address': Destination
+    - 'start_address': Starting location, exactly as given
+    - 'end_address': Destination, exactly as given
     - 'travel_time_minutes': Estimated travel time
     - 'distance_km': Distance in kilometers
     
-    If addresses are unclear, try to geocode them first. Optimize for minimal total travel time.
+    If addresses are unclear, try to geocode them first.
     """,
     tools=[google_maps_grounding],
-    description="Specialist for calculating optimal routes and travel times"
+    description="Specialist for measuring travel times and distances between addresses"
 )
 
 # ==================== MAIN WORKFLOW AGENTS ====================
 
 # Event Sourcing Agent
 event_sourcing_agent = Agent(
-    model=Gemini(
-        retry_options=retry_config,
+    model=GovernedGemini(
         model='gemini-2.0-flash-exp'
     ),
     name='EventSourcingAgent',
@@ -201,25 +263,36 @@ event_sourcing_agent = Agent(
     entertainment, workshops, sports, and local attractions.
     """,
     description='Specialist agent for gathering and structuring real-time event data from web sources',
-    tools=[google_search, AgentTool(agent=fact_checker_specialist)],
+    input_schema=ActivitySearch,
+    tools=[search_tool(), AgentTool(agent=fact_checker_specialist)],
 )
 
+# Cache hits skip both the EventSourcingAgent and the FactCheckerAgent
+cached_event_sourcing = CachedAgentTool(event_sourcing_agent, activity_cache)
+
 # Itinerary Planning Agent
 itinerary_planning_agent = Agent(
     name='ItineraryPlanningAgent',
     description='Creates personalized, logical itineraries by applying user preferences and calculating travel logistics',
-    model=Gemini(
+    model=GovernedGemini(
         model='gemini-2.0-flash-exp',
-        retry_options=retry_config
     ),
     instruction="""
     You are the expert logistician responsible for creating the perfect 2-day weekend itinerary.
     
     Your process:
     1. Review the user preferences provided (budget, interests, past activities)
-    2. Apply budget filtering using the filter_by_budget tool
-    3. Rank activities based on user interests and preferences
-    4. For top candidates, use the GeospatialAgent to calculate travel times
+    2. Call the rank_activities tool once with the full activity list and the user preferences.
+       It applies the budget filter and returns the top candidates ranked by budget fit,
+       interests, novelty and time window. Plan only with these candidates.
+    3. Use filter_by_budget only if you need every activity within the budget
+    4. For each day, call the plan_day_route tool with that day's chosen stops (address, and
+       optionally latitude, longitude, duration_minutes, earliest_hour, latest_hour). It orders
+       the stops to minimize travel time within their time windows and returns the travel
+       segments (start_address, end_address, travel_time_minutes, distance_km).
+       If it reports missing_legs, those travel times are placeholders: ask the GeospatialAgent
+       for exactly those address pairs, pass its segments to record_travel_legs, and call
+       plan_day_route again. Measured legs are remembered, so later plans skip this step
     5. Create a realistic schedule that:
        - Balances activity types (mix of relaxation and excitement)
        - Minimizes travel time between activities
@@ -237,7 +310,10 @@ itinerary_planning_agent = Agent(
     If there are ambiguities or conflicts, note them clearly in your output.
     """,
     tools=[
-        AgentTool(agent=geospatial_agent), 
+        FunctionTool(rank_activities),
+        FunctionTool(plan_day_route),
+        AgentTool(agent=geospatial_agent),
+        FunctionTool(record_travel_legs),
         FunctionTool(filter_by_budget)
     ],
 )
@@ -245,9 +321,8 @@ itinerary_planning_agent = Agent(
 # User Memory Agent
 user_memory_agent = Agent(
     name='UserMemoryAgent',
-    model=Gemini(
+    model=GovernedGemini(
         model='gemini-2.0-flash-exp',
-        retry_options=retry_config
     ),
     instruction="""
     You are the personalized memory expert for the user. Your responsibilities:
@@ -280,10 +355,9 @@ user_memory_agent = Agent(
 )
 
 # Root Coordinator Agent
-root_agent = Agent(
-    model=Gemini(
+coordinator_agent = Agent(
+    model=GovernedGemini(
         model='gemini-2.0-flash-exp',
-        retry_options=retry_config
     ),
     name='WeekendPlannerCoordinator',
     description='Top-level orchestrator that manages the entire itinerary creation workflow',
@@ -298,8 +372,9 @@ root_agent = Agent(
     - Use retrieve_user_preferences to get budget, interests, and history
     
     STEP 2 - DATA SOURCING:
-    - Call the EventSourcingAgent with location and date range
-    - Include user budget and interests in the search context
+    - Call the EventSourcingAgent with the location, start_date and end_date (YYYY-MM-DD)
+    - Results are shared between users planning the same place and dates, so do not
+      add user-specific details to the location
     - Ensure you get a comprehensive list of activities (aim for 15+ options)
     
     STEP 3 - ITINERARY SYNTHESIS:
@@ -319,11 +394,56 @@ root_agent = Agent(
     """,
     tools=[
         AgentTool(agent=user_memory_agent),
-        AgentTool(agent=event_sourcing_agent),
+        cached_event_sourcing,
         AgentTool(agent=itinerary_planning_agent)
     ]
 )
 
+# ==================== WORKFLOW MODE ====================
+
+# The same specialists wired as a dependency graph: preferences and events do
+# not depend on each other and run concurrently, and the itinerary step reads
+# both from session state. No coordinator model calls are made.
+workflow_agent = build_workflow(
+    'WeekendPlannerWorkflow',
+    [
+        (user_memory_agent.clone(update={
+            'output_key': 'user_preferences',
+            'tools': [FunctionTool(retrieve_user_preferences)],
+            'instruction': """
+    Extract the user_id from the request (or use 'default_user' if none is given) and call
+    retrieve_user_preferences. Reply with the preferences as JSON only.
+    """,
+        }), []),
+        (Agent(
+            name='ActivitySourcingAgent',
+            model=GovernedGemini(model='gemini-2.0-flash-exp'),
+            instruction="""
+    Extract the location and the date range (YYYY-MM-DD) from the request and call the
+    EventSourcingAgent once with them. Reply with its activities as a JSON list only.
+    """,
+            output_key='activities',
+            tools=[cached_event_sourcing],
+        ), []),
+        (itinerary_planning_agent.clone(update={
+            'output_key': 'itinerary',
+            'instruction': """
+    User preferences:
+    {user_preferences?}
+    
+    Activities found for the requested location and dates:
+    {activities?}
+    """ + itinerary_planning_agent.instruction,
+        }), ['user_preferences', 'activities']),
+    ],
+    description='Runs preference retrieval and event sourcing concurrently, then plans the itinerary',
+)
+
+# 'coordinator' (default) or 'workflow'
+PLANNER_MODE = os.environ.get('WEEKEND_PLANNER_MODE', 'coordinator')
+
+root_agent = workflow_agent if PLANNER_MODE == 'workflow' else coordinator_agent
+
 # ==================== RUNNER INITIALIZATION ====================
 
 # Initialize session service (required for Runner)
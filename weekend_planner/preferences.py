@@ -0,0 +1,133 @@
+"""Persistent user preference store for the weekend planner.
+
+Preferences are stored one row per (user_id, field) in a SQLite table, so a
+save only writes the fields that changed instead of rewriting the whole
+document. Reads are served from a bounded LRU of immutable snapshots. An
+update builds a new snapshot and swaps it in (copy-on-write), so a reader
+never sees a half-applied merge, and callers always receive their own copy.
+
+Updates to the same user are serialized by a lock taken from a fixed pool of
+striped locks, which keeps memory flat at millions of users. Both lookups and
+merges touch one user's rows through the primary key.
+"""
+
+import copy
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS preferences (
+    user_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, field)
+) WITHOUT ROWID;
+"""
+
+
+class PreferenceStore:
+    """SQLite-backed preference documents with an LRU read cache.
+
+    Args:
+        db_path: SQLite file, or ':memory:' for a process-local store.
+        cache_size: Users whose snapshots are kept in memory.
+        lock_stripes: Number of locks shared by all users.
+    """
+
+    def __init__(self, db_path: str = 'user_preferences.db', cache_size: int = 10_000,
+                 lock_stripes: int = 256):
+        self.cache_size = cache_size
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread = False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._cache: 'OrderedDict[str, Mapping[str, Any]]' = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._user_locks = [threading.Lock() for _ in range(lock_stripes)]
+        self.stats = {'hits': 0, 'misses': 0, 'fields_written': 0, 'evictions': 0}
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        return self._user_locks[zlib.crc32(user_id.encode('utf-8')) % len(self._user_locks)]
+
+    def _cached(self, user_id: str) -> Optional[Mapping[str, Any]]:
+        with self._cache_lock:
+            snapshot = self._cache.get(user_id)
+            if snapshot is not None:
+                self._cache.move_to_end(user_id)
+            return snapshot
+
+    def _publish(self, user_id: str, snapshot: Mapping[str, Any]) -> None:
+        with self._cache_lock:
+            self._cache[user_id] = snapshot
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last = False)
+                self.stats['evictions'] += 1
+
+    def _load(self, user_id: str) -> Mapping[str, Any]:
+        """Reads the user's rows into the cache; the caller holds the user lock."""
+        snapshot = self._cached(user_id)
+        if snapshot is not None:
+            return snapshot
+        self.stats['misses'] += 1
+        with self._db_lock:
+            rows = self._conn.execute(
+                'SELECT field, value FROM preferences WHERE user_id = ?', (user_id,)
+            ).fetchall()
+        snapshot = MappingProxyType({field: json.loads(value) for field, value in rows})
+        self._publish(user_id, snapshot)
+        return snapshot
+
+    def _snapshot(self, user_id: str) -> Mapping[str, Any]:
+        snapshot = self._cached(user_id)
+        if snapshot is not None:
+            self.stats['hits'] += 1
+            return snapshot
+        # Loading under the user lock keeps a concurrent merge from being
+        # overwritten by an older copy read from disk.
+        with self._user_lock(user_id):
+            return self._load(user_id)
+
+    def get(self, user_id: str) -> Dict[str, Any]:
+        """Returns a copy of the user's preferences; empty if none are stored."""
+        return copy.deepcopy(dict(self._snapshot(user_id)))
+
+    def merge(self, user_id: str, fields: Mapping[str, Any]) -> Dict[str, Any]:
+        """Sets the given fields, leaving all others untouched.
+
+        Returns:
+            A copy of the merged preferences.
+        """
+        with self._user_lock(user_id):
+            current = self._load(user_id)
+            changed = {
+                field: value for field, value in fields.items()
+                if field not in current or current[field] != value
+            }
+            if changed:
+                now = time.time()
+                with self._db_lock:
+                    with self._conn:
+                        self._conn.executemany(
+                            'INSERT INTO preferences VALUES (?, ?, ?, ?)'
+                            ' ON CONFLICT (user_id, field) DO UPDATE'
+                            ' SET value = excluded.value, updated_at = excluded.updated_at',
+                            [(user_id, field, json.dumps(value), now)
+                             for field, value in changed.items()],
+                        )
+                self.stats['fields_written'] += len(changed)
+                current = MappingProxyType({**current, **copy.deepcopy(dict(changed))})
+                self._publish(user_id, current)
+            return copy.deepcopy(dict(current))
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._conn.close()
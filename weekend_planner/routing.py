@@ -0,0 +1,324 @@
+"""Local route optimizer for a day of weekend activities.
+
+Travel legs come from a persistent distance/time cache keyed by normalized
+address pairs. Measured legs, e.g. from the GeospatialAgent's maps lookups,
+are stored with `record_leg` and always win. On a cache miss the leg is
+estimated from the haversine distance between the stops' coordinates (given
+with the stop or remembered from an earlier request), scaled by a detour
+factor and an average city speed, and the estimate is cached as well.
+
+Pairs with neither a measured leg nor coordinates get the same default leg
+time, so they cannot influence the order; `optimize_route` lists them under
+`missing_legs` for the caller to measure and record before ordering again.
+
+The visiting order is found with nearest neighbour followed by 2-opt, with
+each stop's time window and visit duration simulated, so an order that makes
+the user wait or arrive late costs more than one that fits the windows.
+Results use the segment shape the GeospatialAgent returned:
+`start_address`, `end_address`, `travel_time_minutes`, `distance_km`.
+"""
+
+import math
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+# Road distance over straight-line distance in a typical city.
+DETOUR_FACTOR = 1.3
+AVERAGE_SPEED_KMH = 25.0
+DEFAULT_LEG_MINUTES = 20.0
+DEFAULT_VISIT_MINUTES = 90.0
+# Minutes of travel one minute of lateness is worth.
+LATENESS_PENALTY = 10.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS legs (
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    distance_km REAL,
+    travel_time_minutes REAL NOT NULL,
+    source TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (origin, destination)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS places (
+    address TEXT PRIMARY KEY,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def normalize_address(address: str) -> str:
+    """Lowercases and strips punctuation and repeated whitespace."""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', address.lower()).split())
+
+
+def haversine_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+@dataclass
+class Leg:
+    distance_km: Optional[float]
+    travel_time_minutes: float
+    source: str
+
+
+class DistanceCache:
+    """Travel legs and coordinates in SQLite, fronted by an in-process dict.
+
+    Legs are undirected: A to B and B to A share an entry.
+
+    Args:
+        db_path: SQLite file, or ':memory:' for a process-local cache.
+    """
+
+    def __init__(self, db_path: str = 'route_cache.db'):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread = False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._legs: Dict[Tuple[str, str], Leg] = {}
+        self._places: Dict[str, Tuple[float, float]] = {}
+        self.stats = {'hits': 0, 'estimated': 0, 'defaulted': 0}
+
+    @staticmethod
+    def _key(a: str, b: str) -> Tuple[str, str]:
+        a, b = normalize_address(a), normalize_address(b)
+        return (a, b) if a <= b else (b, a)
+
+    def remember_place(self, address: str, latitude: float, longitude: float) -> None:
+        key = normalize_address(address)
+        if self._places.get(key) == (latitude, longitude):
+            return
+        self._places[key] = (latitude, longitude)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO places VALUES (?, ?, ?)', (key, latitude, longitude)
+            )
+            self._conn.commit()
+
+    def place(self, address: str) -> Optional[Tuple[float, float]]:
+        key = normalize_address(address)
+        coords = self._places.get(key)
+        if coords is None:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT latitude, longitude FROM places WHERE address = ?', (key,)
+                ).fetchone()
+            if row:
+                coords = self._places[key] = (row[0], row[1])
+        return coords
+
+    def record_leg(self, a: str, b: str, distance_km: Optional[float],
+                   travel_time_minutes: float, source: str = 'maps') -> None:
+        """Stores a measured leg, e.g. from a maps provider."""
+        key = self._key(a, b)
+        self._legs[key] = Leg(distance_km, travel_time_minutes, source)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO legs VALUES (?, ?, ?, ?, ?, ?)',
+                (*key, distance_km, travel_time_minutes, source, time.time()),
+            )
+            self._conn.commit()
+
+    def leg(self, a: str, b: str) -> Leg:
+        """Returns the cached leg, or estimates and caches one."""
+        key = self._key(a, b)
+        if key[0] == key[1]:
+            return Leg(0.0, 0.0, 'same')
+        leg = self._legs.get(key)
+        if leg is None:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT distance_km, travel_time_minutes, source FROM legs'
+                    ' WHERE origin = ? AND destination = ?', key,
+                ).fetchone()
+            if row:
+                leg = self._legs[key] = Leg(*row)
+        if leg is not None:
+            self.stats['hits'] += 1
+            return leg
+
+        start, end = self.place(a), self.place(b)
+        if start is None or end is None:
+            # Not cached: coordinates may become known later.
+            self.stats['defaulted'] += 1
+            return Leg(None, DEFAULT_LEG_MINUTES, 'default')
+        distance = haversine_km(start, end) * DETOUR_FACTOR
+        self.stats['estimated'] += 1
+        self.record_leg(a, b, round(distance, 2),
+                        round(distance / AVERAGE_SPEED_KMH * 60, 1), 'haversine')
+        return self._legs[key]
+
+
+_TIME_RE = re.compile(r'^(\d{1,2})(?:[:.h](\d{2}))?\s*([ap])?\.?\s*m?\.?$', re.IGNORECASE)
+
+
+def time_of_day(value: Any) -> Optional[float]:
+    """Minutes after midnight for an hour (10, 10.5) or a time ('10:30', '8 PM').
+
+    Returns None for missing or unrecognized values, so the stop has no window.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) * 60
+    match = _TIME_RE.match(str(value).strip())
+    if not match:
+        try:
+            return float(value) * 60
+        except ValueError:
+            return None
+    hour, minute, meridiem = int(match[1]), int(match[2] or 0), (match[3] or '').lower()
+    if minute >= 60 or hour > (12 if meridiem else 24):
+        return None
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem == 'p' else 0)
+    return float(hour * 60 + minute)
+
+
+@dataclass
+class Stop:
+    address: str
+    duration: float = DEFAULT_VISIT_MINUTES
+    earliest: Optional[float] = None
+    latest: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Stop':
+        return cls(
+            address = str(data.get('address') or data.get('Address') or ''),
+            duration = float(data.get('duration_minutes') or DEFAULT_VISIT_MINUTES),
+            earliest = time_of_day(data.get('earliest_hour')),
+            latest = time_of_day(data.get('latest_hour')),
+        )
+
+
+def _schedule(order: Sequence[int], stops: Sequence[Stop], travel: List[List[float]],
+              day_start: float) -> Tuple[float, float, List[Tuple[float, float]]]:
+    """Simulates the day; returns (cost, lateness, [(arrival, departure)])."""
+    clock = day_start
+    cost = lateness = 0.0
+    times = []
+    previous = None
+    for i in order:
+        if previous is not None:
+            clock += travel[previous][i]
+            cost += travel[previous][i]
+        stop = stops[i]
+        arrival = clock
+        if stop.earliest is not None and clock < stop.earliest:
+            cost += stop.earliest - clock
+            clock = stop.earliest
+        if stop.latest is not None and clock > stop.latest:
+            lateness += clock - stop.latest
+        clock += stop.duration
+        times.append((arrival, clock))
+        previous = i
+    return cost + LATENESS_PENALTY * lateness, lateness, times
+
+
+def _nearest_neighbour(n: int, travel: List[List[float]], first: int) -> List[int]:
+    order, remaining = [first], set(range(n)) - {first}
+    while remaining:
+        last = order[-1]
+        nearest = min(remaining, key = lambda j: travel[last][j])
+        order.append(nearest)
+        remaining.remove(nearest)
+    return order
+
+
+def _two_opt(order: List[int], cost_of) -> Tuple[List[int], float]:
+    best, best_cost = order, cost_of(order)
+    improved = True
+    while improved:
+        improved = False
+        # The first stop stays fixed as the day's starting point.
+        for i in range(1, len(best) - 1):
+            for j in range(i + 1, len(best)):
+                candidate = best[:i] + best[i:j + 1][::-1] + best[j + 1:]
+                cost = cost_of(candidate)
+                if cost < best_cost - 1e-9:
+                    best, best_cost, improved = candidate, cost, True
+    return best, best_cost
+
+
+def _clock(minutes: float) -> str:
+    minutes = int(round(minutes))
+    return f'{minutes // 60 % 24:02d}:{minutes % 60:02d}'
+
+
+def optimize_route(stops: Sequence[Dict[str, Any]], cache: DistanceCache,
+                   day_start_hour: float = 9.0, fixed_start: bool = True) -> Dict[str, Any]:
+    """Orders one day's stops and returns the segments between them.
+
+    Args:
+        stops: Dicts with 'address' and optionally 'latitude', 'longitude',
+            'duration_minutes', 'earliest_hour' and 'latest_hour'. Activity
+            dicts with 'Address', 'Latitude' and 'Longitude' work as well.
+            Hours are numbers or times such as '10:30' or '8 PM'.
+        cache: Distance cache used for every leg.
+        day_start_hour: Hour the day starts at the first stop.
+        fixed_start: Keep the first stop first; otherwise try every start.
+    """
+    for data in stops:
+        latitude = data.get('latitude', data.get('Latitude'))
+        longitude = data.get('longitude', data.get('Longitude'))
+        if latitude is not None and longitude is not None:
+            cache.remember_place(str(data.get('address') or data.get('Address')),
+                                 float(latitude), float(longitude))
+    parsed = [Stop.from_dict(data) for data in stops]
+    n = len(parsed)
+    if n == 0:
+        return {'status': 'error', 'error_message': 'No stops given'}
+
+    legs = [[cache.leg(a.address, b.address) if a is not b else Leg(0.0, 0.0, 'same')
+             for b in parsed] for a in parsed]
+    travel = [[leg.travel_time_minutes for leg in row] for row in legs]
+    day_start = day_start_hour * 60
+
+    def cost_of(order: Sequence[int]) -> float:
+        return _schedule(order, parsed, travel, day_start)[0]
+
+    starts = [0] if fixed_start else range(n)
+    order, _ = min(
+        (_two_opt(_nearest_neighbour(n, travel, first), cost_of) for first in starts),
+        key = lambda result: result[1],
+    )
+    _, lateness, times = _schedule(order, parsed, travel, day_start)
+
+    segments = []
+    for a, b in zip(order, order[1:]):
+        leg = legs[a][b]
+        segments.append({
+            'start_address': parsed[a].address,
+            'end_address': parsed[b].address,
+            'travel_time_minutes': leg.travel_time_minutes,
+            'distance_km': leg.distance_km,
+        })
+    return {
+        'status': 'success',
+        'ordered_stops': [
+            {'address': parsed[i].address, 'arrival': _clock(arrival), 'departure': _clock(departure)}
+            for i, (arrival, departure) in zip(order, times)
+        ],
+        'segments': segments,
+        'total_travel_time_minutes': round(sum(s['travel_time_minutes'] for s in segments), 1),
+        'total_distance_km': round(sum(s['distance_km'] or 0.0 for s in segments), 2),
+        'unknown_legs': sum(legs[a][b].source == 'default' for a, b in zip(order, order[1:])),
+        'missing_legs': [
+            [parsed[a].address, parsed[b].address]
+            for a in range(n) for b in range(a + 1, n) if legs[a][b].source == 'default'
+        ],
+        'late_minutes': round(lateness, 1),
+    }
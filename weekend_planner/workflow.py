@@ -0,0 +1,133 @@
+"""Dependency-aware workflow mode for the weekend planner.
+
+`WeekendPlannerCoordinator` is an LLM that calls each specialist in turn, so
+every step costs an extra coordinator turn and independent steps (preference
+retrieval and event sourcing) run one after another. `build_workflow` takes
+the steps with the state keys they depend on, groups them into stages by
+topological order, and runs each stage as a `ParallelAgent` inside a
+`SequentialAgent`. Steps exchange results through their `output_key`s; no
+coordinator model call is needed.
+
+Both modes share the planner's `activity_cache`, so each is measured with a
+cold cache (cleared before every plan) and a warm one (primed by an untimed
+plan). Compare the two modes offline with:
+
+    python -m weekend_planner.workflow --latency 0.2
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from google.genai import types
+
+from google.adk.agents import BaseAgent, LlmAgent, ParallelAgent, SequentialAgent
+from google.adk.runners import InMemoryRunner
+
+from shared.benchmark import DEFAULT_TOOL_ARGS
+from shared.fake_llm import use_fake_model
+
+from .activity_cache import ActivityCache
+
+WorkflowStep = Tuple[LlmAgent, Sequence[str]]
+
+
+def workflow_stages(steps: Sequence[WorkflowStep]) -> List[List[LlmAgent]]:
+    """Groups steps into stages; every step runs after the steps it depends on.
+
+    Each step is (agent, dependencies), where the agent's `output_key` names
+    the step and dependencies are the output keys it reads.
+
+    Raises:
+        ValueError: On a missing output_key, unknown dependency or a cycle.
+    """
+    by_key: Dict[str, LlmAgent] = {}
+    for agent, _ in steps:
+        if not agent.output_key:
+            raise ValueError(f"Workflow step {agent.name} needs an output_key")
+        by_key[agent.output_key] = agent
+    pending = {agent.output_key: set(deps) for agent, deps in steps}
+    for key, deps in pending.items():
+        unknown = deps - by_key.keys()
+        if unknown:
+            raise ValueError(f"Step {key} depends on unknown steps {sorted(unknown)}")
+
+    stages, done = [], set()
+    while pending:
+        ready = [key for key, deps in pending.items() if deps <= done]
+        if not ready:
+            raise ValueError(f"Workflow steps form a cycle: {sorted(pending)}")
+        stages.append([by_key[key] for key in ready])
+        done.update(ready)
+        for key in ready:
+            del pending[key]
+    return stages
+
+
+def build_workflow(name: str, steps: Sequence[WorkflowStep], description: str = '') -> BaseAgent:
+    """Builds a SequentialAgent of stages, running each stage's steps in parallel."""
+    stages = []
+    for i, stage in enumerate(workflow_stages(steps), start = 1):
+        if len(stage) == 1:
+            stages.append(stage[0])
+        else:
+            stages.append(ParallelAgent(name = f'{name}Stage{i}', sub_agents = stage))
+    return SequentialAgent(name = name, description = description, sub_agents = stages)
+
+
+async def _measure(agent: BaseAgent, latency: float, runs: int, query: str,
+                   cache: Optional[ActivityCache] = None, warm: bool = False) -> Dict[str, Any]:
+    with use_fake_model(agent, latency = latency, tool_args = DEFAULT_TOOL_ARGS) as fakes:
+        runner = InMemoryRunner(agent = agent, app_name = 'weekend_planner')
+
+        async def plan() -> float:
+            session = await runner.session_service.create_session(
+                app_name = 'weekend_planner', user_id = 'bench'
+            )
+            message = types.Content(role = 'user', parts = [types.Part(text = query)])
+            started = time.perf_counter()
+            async for _ in runner.run_async(
+                user_id = 'bench', session_id = session.id, new_message = message
+            ):
+                pass
+            return time.perf_counter() - started
+
+        if cache is not None:
+            cache.clear()
+        if warm:
+            await plan()
+        primed = sum(fake.calls for fake in fakes.values())
+        durations = []
+        for _ in range(runs):
+            if cache is not None and not warm:
+                cache.clear()
+            durations.append(await plan())
+        calls = sum(fake.calls for fake in fakes.values()) - primed
+    return {
+        'agent': agent.name,
+        'cache': 'warm' if warm else 'cold',
+        'mean_s': round(sum(durations) / runs, 3),
+        'model_calls_per_plan': calls / runs,
+        'critical_path_model_calls': round(sum(durations) / runs / latency, 1) if latency else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Coordinator versus workflow planner latency')
+    parser.add_argument('--latency', type = float, default = 0.2,
+                        help = 'Simulated model latency in seconds')
+    parser.add_argument('--runs', type = int, default = 3)
+    parser.add_argument('--query', default = 'Plan my weekend in Nairobi, I love jazz and hiking')
+    args = parser.parse_args()
+
+    from .agent import activity_cache, coordinator_agent, workflow_agent
+
+    for agent in (coordinator_agent, workflow_agent):
+        for warm in (False, True):
+            print(asyncio.run(_measure(agent, args.latency, args.runs, args.query,
+                                       cache = activity_cache, warm = warm)))
+
+
+if __name__ == '__main__':
+    main()